@@ -1,4 +1,4 @@
 from .core.body import Body
 from .core.entity import Entity
-from .core.modeler import Modeler
+from .core.modeler import Modeler, generate_many
 from .core.port import Port
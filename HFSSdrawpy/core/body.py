@@ -2,8 +2,10 @@ from functools import wraps
 
 import numpy as np
 
-from ..parameters import DEFAULT, MASK, MESH, PORT, RLC
+from ..parameters import AIRBRIDGE, DEFAULT, GAP, MASK, MESH, PORT, RLC, TRACK
 from ..path_finding.path_finder import Path
+from ..path_finding.router import Obstacles, Router
+from ..profiling import profiled
 from ..utils import (
     Vector,
     check_name,
@@ -11,12 +13,13 @@ from ..utils import (
     find_corresponding_list,
     find_last_list,
     find_penultimate_list,
+    free_symbols,
     parse_entry,
     val,
     way,
 )
-from .entity import Entity
-from .modeler import Modeler
+from .entity import Entity, EntityList, EntityTable, add_symbols
+from .modeler import Modeler, evaluated
 from .port import Port
 
 
@@ -51,8 +54,7 @@ class BodyMover:
             self.body.translate(list_entities_new, vector=[pos[0], pos[1], pos[2]])
 
         if len(list_ports_new) > 0:
-            Port.rotate_ports(list_ports_new, angle)
-            Port.translate_ports(list_ports_new, vector=[pos[0], pos[1], pos[2]])
+            Port.move_ports(list_ports_new, angle, vector=[pos[0], pos[1], pos[2]])
 
         # 6 We empty a part of the 'to_move' lists
         penultimate_entity_list = find_penultimate_list(self.body.entities_to_move)
@@ -76,9 +78,6 @@ class BodyMover:
 
 
 class Body(Modeler):
-
-    dict_instances = {}
-
     def __init__(self, pm=None, name=None, rel_coor=None, ref_name="Global"):  # network
         # Note: for now coordinate systems are not reactualized at each run
         if rel_coor is None:
@@ -95,13 +94,19 @@ class Body(Modeler):
         self.interface = pm.interface
         self.mode = pm.mode  # 'hfss' or 'gds'
         self.dict_instances[name] = self
-        self.entities = {DEFAULT: []}  # entities sorted by layer
+        self.entities = EntityTable({DEFAULT: EntityList()})  # entities sorted by layer
         self.cursors = []  # tuple to escape list parsing
         self.ports_to_move = None
         self.entities_to_move = None
+        self.cables = {}  # lengths of the drawn cables, see cable_lengths
 
         pm.bodies.append(self)
 
+    @property
+    def dict_instances(self):
+        # the bodies of the modeler, see Modeler.reset
+        return self.pm.body_instances
+
     def __call__(self, pos, ori):
         pos, ori = parse_entry(pos, ori)
         if len(pos) == 2:
@@ -170,9 +175,14 @@ class Body(Modeler):
             args[0].interface.set_coor_sys(args[0].name)
             if not "layer" in kwargs:
                 kwargs["layer"] = DEFAULT
-            return func(*args, **kwargs)
+            result = func(*args, **kwargs)
+            # the entities drawn depend on the variables of the arguments
+            symbols = free_symbols(args[1:], list(kwargs.values()))
+            if symbols:
+                add_symbols(result, symbols)
+            return result
 
-        return updated
+        return profiled(evaluated(updated))
 
     ### Basic drawings
 
@@ -192,7 +202,7 @@ class Body(Modeler):
         box: Corresponding 3D Model Entity
         """
         pos, size = parse_entry(pos, size)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         self.interface.box(pos, size, **kwargs)
         return Entity(3, self, **kwargs)
@@ -219,7 +229,7 @@ class Body(Modeler):
     @set_body
     def cylinder(self, pos, radius, height, axis, segments=0, name="cylinder_0", **kwargs):
         pos, radius, height = parse_entry(pos, radius, height)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         self.interface.cylinder(pos, radius, height, axis, segments, **kwargs)
         return Entity(3, self, **kwargs)
@@ -227,7 +237,7 @@ class Body(Modeler):
     @set_body
     def cone(self, pos, radius1, radius2, height, axis, name="cone_0", **kwargs):
         pos, radius1, radius2, height = parse_entry(pos, radius1, radius2, height)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         self.interface.cone(pos, radius1, radius2, height, axis, **kwargs)
         return Entity(3, self, **kwargs)
@@ -235,7 +245,7 @@ class Body(Modeler):
     @set_body
     def sphere(self, pos, radius, name="sphere_0", **kwargs):
         pos, radius = parse_entry(pos, radius)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         self.interface.sphere(pos, radius, **kwargs)
         return Entity(3, self, **kwargs)
@@ -243,7 +253,7 @@ class Body(Modeler):
     @set_body
     def torus(self, pos, majorradius, minorradius, axis, name="torus_0", **kwargs):
         pos, majorradius, minorradius = parse_entry(pos, majorradius, minorradius)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         self.interface.torus(pos, majorradius, minorradius, axis, **kwargs)
         return Entity(3, self, **kwargs)
@@ -251,18 +261,15 @@ class Body(Modeler):
     @set_body
     def disk(self, pos, radius, axis, name="disk_0", **kwargs):
         pos, radius = parse_entry(pos, radius)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
-        if self.mode == "gds":
-            pos = val(pos)
-            radius = val(radius)
         self.interface.disk(pos, radius, axis, **kwargs)
         return Entity(2, self, **kwargs)
 
     @set_body
     def polyline(self, points, closed=True, name="polyline_0", **kwargs):
         points = parse_entry(points)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         i = 0
         while i < len(points[:-1]):
@@ -274,8 +281,6 @@ class Body(Modeler):
                 print("Warning: Delete two coinciding points on a polyline2D")
             else:
                 i += 1
-        if self.mode == "gds":
-            points = val(points)
         self.interface.polyline(points, closed, **kwargs)
         dim = closed + 1
         return Entity(dim, self, **kwargs)
@@ -283,11 +288,8 @@ class Body(Modeler):
     @set_body
     def rect(self, pos, size, name="rect_0", **kwargs):
         pos, size = parse_entry(pos, size)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
-        if self.mode == "gds":
-            pos = val(pos)
-            size = val(size)
         self.interface.rect(pos, size, **kwargs)
         return Entity(2, self, **kwargs)
 
@@ -298,22 +300,86 @@ class Body(Modeler):
         pos, size, spacing = parse_entry(pos, size, spacing)
 
         if self.mode == "gds":
-            name = check_name(Entity, name)
+            name = check_name(Entity, name, self.pm.entity_instances)
             kwargs["name"] = name
-            pos = val(pos)
-            size = val(size)
-            spacing = val(spacing)
             self.interface.rect_array(pos, size, columns, rows, spacing, **kwargs)
             return Entity(2, self, **kwargs)
         else:
             columns, rows = parse_entry(columns, rows)
             rect = self.rect(pos, size, name, **kwargs)
-            self.duplicate_along_line(
-                rect, [0, spacing[1], 0], n=rows)
-            self.duplicate_along_line(
-                rect, [spacing[0], 0, 0], n=columns)
+            # the clones are merged in rect: the column, then the columns
+            if rows > 1:
+                self.duplicate_along_line(rect, [0, spacing[1], 0], n=rows)
+            if columns > 1:
+                self.duplicate_along_line(rect, [spacing[0], 0, 0], n=columns)
             return rect
 
+    @profiled
+    @evaluated
+    def instance(self, component, positions, orientations=None, name="instance_0", **kwargs):
+        """
+        Draws component(body, **kwargs) at each position, with each
+        orientation ([1, 0] by default).
+
+        In gds mode, the component is drawn once in its own cells (one per
+        layer) which are placed with references: the geometry is stored
+        once whatever the number of instances. The returned entities (one
+        per instance and per layer) can be moved, copied, deleted or used
+        in booleans like the other ones; a fillet or a boolean flattens
+        them. The ports created by the component are not placed.
+        In hfss mode, the component is drawn at each position.
+
+        Returns the list of the entities created.
+        """
+        positions = parse_entry(positions)
+        if orientations is None:
+            orientations = [[1, 0]] * len(positions)
+        orientations = parse_entry(orientations)
+        if len(orientations) != len(positions):
+            raise ValueError("There should be one orientation per position")
+
+        if self.mode != "gds":
+            existing = set(entity for entities in self.entities.values() for entity in entities)
+            for pos, ori in zip(positions, orientations):
+                with self(pos, ori):
+                    component(self, **kwargs)
+            return [
+                entity
+                for entities in self.entities.values()
+                for entity in entities
+                if entity not in existing
+            ]
+
+        body = Body(self.pm, check_name(Body, name, self.pm.body_instances))
+        component(body, **kwargs)
+        self.interface.component(body)
+        layers = []
+        symbols = {}
+        for layer, entities in body.entities.items():
+            if entities:
+                layers.append(layer)
+                symbols[layer] = free_symbols(entities.copy())
+            # the objects now belong to the component cells
+            for entity in entities:
+                self.pm.entity_instances.pop(entity.name)
+        body.entities = EntityTable({DEFAULT: EntityList()})
+
+        self.interface.set_coor_sys(self.name)
+        instances = []
+        for ii, (pos, ori) in enumerate(zip(positions, orientations)):
+            ori = val(ori)
+            angle = np.arctan2(ori[1], ori[0]) / np.pi * 180
+            for layer in layers:
+                cell_name = "%s_layer%d" % (body.name, layer)
+                entity_name = check_name(
+                    Entity, "%s_%d" % (cell_name, ii), self.pm.entity_instances
+                )
+                self.interface.reference(cell_name, pos, angle, name=entity_name)
+                instance = Entity(2, self, name=entity_name, layer=layer)
+                instance.symbols = frozenset(symbols[layer] | free_symbols(pos))
+                instances.append(instance)
+        return instances
+
     @set_body
     def rect_center(self, pos, size, name="rect_0", **kwargs):
         pos, size = parse_entry(pos, size)
@@ -323,10 +389,9 @@ class Body(Modeler):
     @set_body
     def wirebond(self, pos, ori, ymax, ymin, name="wb_0", **kwargs):
         pos, ymax, ymin = parse_entry(pos, ymax, ymin)
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         if self.mode == "gds":
-            pos, ori, ymax, ymin = val(pos, ori, ymax, ymin)
             self.interface.wirebond(pos, ori, ymax, ymin, **kwargs)
             kwargs["name"] = name + "a"
             entity_a = Entity(2, self, **kwargs)
@@ -341,7 +406,7 @@ class Body(Modeler):
     # def airbridge(self, pos, ori, ymax, ymin, name="ab_0", **kwargs):
     #     #Note
     #     pos, ymax, ymin = parse_entry(pos, ymax, ymin)
-    #     name = check_name(Entity, name)
+    #     name = check_name(Entity, name, self.pm.entity_instances)
     #     kwargs["name"] = name
     #     self.rect
     #     if self.mode == "gds":
@@ -370,10 +435,8 @@ class Body(Modeler):
         """
         if self.mode == "gds":
             pos, size = parse_entry(pos, size)
-            name = check_name(Entity, name)
+            name = check_name(Entity, name, self.pm.entity_instances)
             kwargs["name"] = name
-            pos = val(pos)
-            size = val(size)
             self.interface.text(pos, size, text, angle, horizontal, **kwargs)
             return Entity(2, self, **kwargs)
         else:
@@ -382,28 +445,18 @@ class Body(Modeler):
     @set_body
     def path(self, points, port, fillet, name="path_0", **kwargs):
         # fillet should be either 0 or larger than half of the port width
-        name = check_name(Entity, name)
+        name = check_name(Entity, name, self.pm.entity_instances)
         kwargs["name"] = name
         model_entities = []
         if self.mode == "gds":
-            points = val(points)
-            fillet = val(fillet)
-            _port = port.val()
-
-            # TODO, this is a dirty fixe cause of Vector3D
-
-            # due to the 3D vector implementation
-            points_2D = []
-            for point in points:
-                points_2D.append([point[0], point[1]])
-
-            if fillet == 0:
+            # the interface evaluates the points and port itself
+            if val(fillet) == 0:
                 names, layers = self.interface.path(
-                    points_2D, _port, fillet, name=name, corner="natural"
+                    points, port, fillet, name=name, corner="natural"
                 )
             else:
                 names, layers = self.interface.path(
-                    points_2D, _port, fillet, name=name, corner="circular bend"
+                    points, port, fillet, name=name, corner="circular bend"
                 )
 
             for name, layer in zip(names, layers):
@@ -473,10 +526,11 @@ class Body(Modeler):
         @wraps(func)
         def moved(*args, **kwargs):
             new_args = [args[0]]  # args[0] = chip, args[1] = name
+            ports = args[0].pm.port_instances
             for i, argument in enumerate(args[1:]):
-                if isinstance(argument, str) and (argument in Port.dict_instances):
+                if isinstance(argument, str) and (argument in ports):
                     #  if argument is the sting representation of the port
-                    new_args.append(Port.dict_instances[argument])
+                    new_args.append(ports[argument])
                 elif isinstance(argument, Port):
                     #  it the argument is the port itself
                     new_args.append(argument)
@@ -484,8 +538,10 @@ class Body(Modeler):
                     new_args.append(argument)
             return func(*new_args, **kwargs)
 
-        return moved
+        return profiled(evaluated(moved))
 
+    @profiled
+    @evaluated
     def port(self, widths=None, subnames=None, layers=None, offsets=0, name="port_0"):
         """
         Creates a port and draws a small triangle for each element of the port
@@ -547,7 +603,7 @@ class Body(Modeler):
         pos = [0, 0]
         ori = [1, 0]
 
-        name = check_name(Port, name)
+        name = check_name(Port, name, self.pm.port_instances)
 
         if constraint_port:
             pos, ori = parse_entry(pos, ori)
@@ -590,11 +646,15 @@ class Body(Modeler):
         to_meander=None,
         meander_length=0,
         meander_offset=0,
+        target_length=None,
         reverse_adaptor=False,
         slope=0.5,
         name="cable_0",
         mesh_size=None,
-        slanted=False
+        slanted=False,
+        avoid=None,
+        clearance=0,
+        route=None,
     ):
         """ 
 
@@ -615,10 +675,22 @@ class Body(Modeler):
             DESCRIPTION. The default is 0.
         meander_offset : TYPE, optional
             DESCRIPTION. The default is 0.
+        target_length : float or str, optional
+            Length of the cable (adaptor included). If given, meander_length
+            is ignored and the amplitude of the meanders is solved to reach it
+            in a single pass. The default is None.
         is_mesh : TYPE, optional
             DESCRIPTION. The default is False.
         reverse_adaptor : TYPE, optional
             DESCRIPTION. The default is False.
+        avoid : list of layers and/or entities, optional
+            (gds only) if the path found between the ports crosses one of
+            these entities, the cable is routed around them. The default is None.
+        clearance : float or str, optional
+            Distance kept between the cable and the avoided entities. The default is 0.
+        route : list of points, optional
+            Points of the cable between two ports, as planned by draw_cables.
+            The default is None.
 
         Raises
         ------
@@ -634,8 +706,8 @@ class Body(Modeler):
 
         """
 
-        meander_length, meander_offset, fillet, mesh_size = parse_entry(
-            meander_length, meander_offset, fillet, mesh_size
+        meander_length, meander_offset, fillet, mesh_size, target_length = parse_entry(
+            meander_length, meander_offset, fillet, mesh_size, target_length
         )
         # to_meander should be a list of list
         # meander_length, meander_offset should be lists
@@ -647,8 +719,15 @@ class Body(Modeler):
             meander_length = [meander_length] * len(to_meander)
         if not isinstance(meander_offset, list):
             meander_offset = [meander_offset] * len(to_meander)
+        if not isinstance(target_length, list):
+            target_length = [target_length] * len(to_meander)
 
         ports = list(ports)
+        if route is not None and len(ports) != 2:
+            raise ValueError("A planned route connects exactly two ports")
+        router = None
+        if avoid is not None:
+            router = Router(self.obstacles(avoid), clearance)
 
         if self.is_mask:
             for port_ in ports:
@@ -723,9 +802,12 @@ class Body(Modeler):
                         to_meander=[to_meander[cable_portion]],
                         meander_length=[meander_length[cable_portion]],
                         meander_offset=[meander_offset[cable_portion]],
+                        target_length=[target_length[cable_portion]],
                         reverse_adaptor=reverse_adaptor,
                         mesh_size=mesh_size,
-                        name=name + "_%d" % cable_portion
+                        name=name + "_%d" % cable_portion,
+                        avoid=avoid,
+                        clearance=clearance,
                     )
                     cable_portion += 1
                     _ports = [port.r]
@@ -735,6 +817,7 @@ class Body(Modeler):
                 to_meander = [to_meander[cable_portion]]
                 meander_length = [meander_length[cable_portion]]
                 meander_offset = [meander_offset[cable_portion]]
+                target_length = [target_length[cable_portion]]
             _ports.append(ports[-1])
 
             # at this stage first and last port are not constraint_port and all
@@ -772,7 +855,16 @@ class Body(Modeler):
             # find all intermediate paths
             total_path = None
             for ii in range(len(ports) - 1):
-                path = Path(name, ports[ii], ports[ii + 1], fillet)
+                width = 0
+                if router is not None:
+                    y_max, y_min = ports[ii].bond_params()
+                    width = val(y_max - y_min)
+                if route is not None:
+                    # the adaptor may have moved the ports since the planning
+                    points = [Vector(ports[0].pos), *route[1:-1], Vector(ports[1].pos)]
+                    path = Path(name, ports[ii], ports[ii + 1], fillet, points=points)
+                else:
+                    path = Path(name, ports[ii], ports[ii + 1], fillet, router=router, width=width)
                 if total_path is None:
                     total_path = path
                 else:
@@ -783,7 +875,11 @@ class Body(Modeler):
 
             # do meandering (not supported for even partially slanted cables)
             if not total_path.is_slanted:
-                total_path.meander(to_meander[0], meander_length[0], meander_offset[0])
+                if target_length[0] is not None:
+                    target_length[0] = target_length[0] - length_adaptor
+                total_path.meander(
+                    to_meander[0], meander_length[0], meander_offset[0], target_length[0]
+                )
 
             total_path.clean()
             # plot cable
@@ -816,7 +912,11 @@ class Body(Modeler):
             #                            meander_offset=meander_offset, reverse_adaptor=reverse_adaptor,
             #                            slope=slope, name=name+'_mask')
 
-            length = total_path.length() + length_adaptor
+            length, straight, arcs = total_path.lengths()
+            length += length_adaptor
+            self.cables[name] = dict(
+                length=length, adaptor=length_adaptor, straight=straight, arcs=arcs
+            )
             print('Cable "%s" length = %.3f mm' % (name, length * 1000))
             return length
         else:
@@ -832,7 +932,163 @@ class Body(Modeler):
             if is_bond:
                 raise Exception("Bonding is not supported with slanted cables")
 
-    def draw_bond(self, to_bond, ymax, ymin, airbridge = True, min_dist="0.5mm", name="wb_0"):
+    @profiled
+    @evaluated
+    def draw_cables(
+        self, cables, fillet="0.3mm", avoid=None, clearance=0, iterations=4, name="cable", **kwargs
+    ):
+        """
+        Draws several cables whose routes are planned together, so that they
+        do not cross each other nor the avoided entities (see
+        Router.route_many): each cable keeps the path draw_cable would give it
+        unless it is in conflict. All the routes are planned before the first
+        cable is drawn.
+
+        cables : list of (port_in, port_out), ports or port names
+        avoid : list of layers and/or entities, optional (gds only)
+        clearance : distance kept between the cables and the obstacles
+        iterations : number of rerouting rounds of the planning
+        name : the cables are named name_0, name_1...
+        kwargs : passed to draw_cable (is_bond, to_meander, mesh_size...),
+            note that the meanders are not taken into account by the planning
+
+        Returns the list of the lengths of the cables.
+        """
+        if self.cursors:
+            raise ValueError("Cables should be planned outside of 'with body(...)' blocks")
+        fillet = parse_entry(fillet)
+        router = Router(self.obstacles(avoid) if avoid else None, clearance)
+
+        pairs, plans, preferred = [], [], []
+        for ports in cables:
+            port_in, port_out = [
+                self.pm.port_instances[port] if isinstance(port, str) else port for port in ports
+            ]
+            y_max, y_min = (port_out if port_in.constraint_port else port_in).bond_params()
+            width = val(y_max - y_min)
+            pairs.append((port_in, port_out))
+            plans.append((port_in.pos, port_in.ori, port_out.pos, port_out.ori, fillet, width))
+            preferred.append(Path(name, port_in, port_out, fillet).points)
+
+        routes = router.route_many(plans, preferred=preferred, iterations=iterations)
+        failed = ["%s_%d" % (name, ii) for ii, route in enumerate(routes) if route is None]
+        if failed:
+            raise ValueError("Could not route %s" % ", ".join(failed))
+
+        lengths = []
+        for ii, ((port_in, port_out), route) in enumerate(zip(pairs, routes)):
+            length = self.draw_cable(
+                port_in, port_out, fillet=fillet, name="%s_%d" % (name, ii), route=route, **kwargs
+            )
+            lengths.append(length)
+        return lengths
+
+    def cable_lengths(self, name=None):
+        """
+        Lengths of a cable drawn by draw_cable, as a dict:
+            length    total length (adaptor included)
+            adaptor   length of the adaptor
+            straight  array of the straight lengths of the segments
+            arcs      array of the lengths of the arcs of the corners
+        Returns {name: lengths} of all the cables if no name is given. The
+        portions of a cable with intermediate ports are named name_0, name_1...
+        """
+        if name is None:
+            return dict(self.cables)
+        if name not in self.cables:
+            raise ValueError("No cable named %s in %s" % (name, self.name))
+        return self.cables[name]
+
+    def obstacles(self, avoid):
+        """
+        Bounding boxes of entities of the body, to be avoided by the cables.
+        avoid: list of layers and/or entities
+        """
+        if self.mode != "gds":
+            raise ValueError("Obstacle avoidance is only available in gds mode")
+        if self.cursors:
+            raise ValueError(
+                "Cables avoiding obstacles should be drawn outside of 'with body(...)' blocks"
+            )
+        boxes = []
+        for item in avoid:
+            entities = [item] if isinstance(item, Entity) else self.entities.get(item, [])
+            for entity in entities:
+                box = self.interface.get_bounding_box(entity)
+                if box is not None:
+                    boxes.append(np.ravel(box))
+        return Obstacles(boxes)
+
+    @set_body
+    def cheese(
+        self,
+        region,
+        hole_size,
+        pitch,
+        keepout_layers=(TRACK, GAP, MASK),
+        keepout_margin=0,
+        name="cheese_0",
+        **kwargs
+    ):
+        """
+        (gds only) Holes of hole_size on a square lattice of pitch, aligned
+        on the origin of the body, filling the entity region (a ground plane)
+        and at least keepout_margin away from its border and from the
+        keepouts along x and y.
+        The lattice is computed with arrays and placed as arrays of
+        references, so millions of holes stay cheap. The holes can be kept on
+        their own layer or subtracted from region.
+
+        keepout_layers: list of layers and/or entities, region excluded
+        Returns the entity of all the holes.
+        """
+        if self.mode != "gds":
+            raise ValueError("Cheesing is only available in gds mode")
+        if self.cursors:
+            raise ValueError("Cheesing should be done outside of 'with body(...)' blocks")
+        keepouts = []
+        for item in keepout_layers:
+            entities = [item] if isinstance(item, Entity) else self.entities.get(item, [])
+            keepouts += [entity for entity in entities if entity is not region]
+        name = check_name(Entity, name, self.pm.entity_instances)
+        kwargs["name"] = name
+        self.interface.cheese(region, keepouts, hole_size, pitch, keepout_margin, **kwargs)
+        return Entity(2, self, **kwargs)
+
+    @set_body
+    def bonds(self, to_bond, n_bonds, ymax, ymin, airbridge=True, name="wb_0", **kwargs):
+        """
+        (gds only) Draws all the bonds along segments at once: one entity per
+        layer, whose polygons are computed with arrays.
+
+        Args:
+            to_bond (list): segments [A, B] along x or y.
+            n_bonds (list): number of bonds on each segment.
+            ymax, ymin: extent of the cable, for the wire bonds.
+            airbridge (bool): airbridges (bodies on DEFAULT, feet on RLC) or
+                wire bonds (on the given layer).
+        Returns the list of entities.
+        """
+        if self.mode != "gds":
+            raise ValueError("Batched bonds are only available in gds mode")
+        ymax, ymin = parse_entry(ymax, ymin)
+        if airbridge:
+            parts = [("bridge", "_bridge", DEFAULT), ("feet", "_feet", RLC)]
+        else:
+            parts = [("wire", "", kwargs["layer"])]
+        entities = []
+        for part, suffix, layer in parts:
+            kwargs["name"] = check_name(Entity, name + suffix, self.pm.entity_instances)
+            kwargs["layer"] = layer
+            self.interface.bonds(to_bond, n_bonds, ymax, ymin, part, **kwargs)
+            entities.append(Entity(2, self, **kwargs))
+        return entities
+
+    @profiled
+    @evaluated
+    def draw_bond(
+        self, to_bond, ymax, ymin, airbridge=True, min_dist="0.5mm", name="wb_0", individual=False
+    ):
         """
         Draws wire bonds between segments in the given list.
 
@@ -842,54 +1098,56 @@ class Body(Modeler):
             ymin (str): Minimum y-coordinate of the wire bond.
             min_dist (str, optional): Minimum distance between wire bonds. Defaults to "0.5mm".
             name (str, optional): Name of the wire bond. Defaults to "wb_0".
+            individual (bool, optional): In gds mode, the bonds are drawn at
+                once as one entity per layer (see bonds) unless individual is
+                True. In hfss mode each bond is an entity. Defaults to False.
         """
         # Parse input values
         ymax, ymin, min_dist = parse_entry(ymax, ymin, min_dist)
         min_dist = val(min_dist)
 
+        # Merge the connected segments
+        segments = []
         n_segments = len(to_bond)
         jj = 0
-        bond_number = 0
-
         while jj < n_segments:
-            elt = to_bond[jj]
-            A = elt[0]
-            B = elt[1]
-
+            A = to_bond[jj][0]
+            B = to_bond[jj][1]
             # Check if the next segment is connected to the current segment
             if jj + 1 < n_segments and to_bond[jj + 1][0] == B:
                 B = to_bond[jj + 1][1]
                 jj += 1
+            segments.append([A, B])
+            jj += 1
+
+        # Calculate the number of wire bonds needed based on the minimum distance
+        n_bonds = [int(Vector(val(B - A)).norm() / min_dist) + 1 for A, B in segments]
 
-            val_BA = val(B - A)
-            ori = way(val_BA)
-            length = Vector(val_BA).norm()
+        if self.mode == "gds" and not individual:
+            self.bonds(segments, n_bonds, ymax, ymin, airbridge=airbridge, name=name)
+            return
 
-            # Calculate the number of wire bonds needed based on the minimum distance
-            n_bond = int(length / val(min_dist)) + 1
+        bond_number = 0
+        for (A, B), n_bond in zip(segments, n_bonds):
+            ori = way(val(B - A))
             spacing = (B - A).norm() / n_bond
-            pos = A + ori * spacing /2
+            pos = A + ori * spacing / 2
 
             # Draw wire bonds along the segment
             for ii in range(n_bond):
-                # pos = pos + ori * spacing
                 if airbridge:
-                    width = 20e-6
-                    length = 100e-6
-                    track = 40e-6
-                    ab_gap = 5e-6
-                    ab_foot_w = 40e-6
-                    ab_foot_l = 40e-6
-                    foot1 = pos + ori.orth() * (ab_gap+(track + ab_foot_w)/2)
-                    foot2 = pos - ori.orth() * (ab_gap+(track + ab_foot_w)/2)
-                    self.rect_center(pos, ori*width + ori.orth()*length, name=name + "_1_%d" % (bond_number), layer=DEFAULT)                    
+                    width = AIRBRIDGE["width"]
+                    length = AIRBRIDGE["length"]
+                    track = AIRBRIDGE["track"]
+                    ab_gap = AIRBRIDGE["gap"]
+                    ab_foot_w = AIRBRIDGE["foot_width"]
+                    ab_foot_l = AIRBRIDGE["foot_length"]
+                    foot1 = pos + ori.orth() * (ab_gap + (track + ab_foot_w) / 2)
+                    foot2 = pos - ori.orth() * (ab_gap + (track + ab_foot_w) / 2)
+                    self.rect_center(pos, ori*width + ori.orth()*length, name=name + "_1_%d" % (bond_number), layer=DEFAULT)
                     self.rect_center(foot1, ori*ab_foot_l + ori.orth()*ab_foot_w, name=name + "_2_%d" % (bond_number), layer=RLC)
                     self.rect_center(foot2, ori*ab_foot_l + ori.orth()*ab_foot_w, name=name + "_3_%d" % (bond_number), layer=RLC)
-         
-                    # self.airbridge(pos, ori, ymax, ymin, name=name + "_%d" % (bond_number))
                 else:
                     self.wirebond(pos, ori, ymax, ymin, name=name + "_%d" % (bond_number))
                 bond_number += 1
                 pos = pos + ori * spacing
-
-            jj += 1
@@ -1,11 +1,14 @@
 import numpy as np
 
 from ..parameters import DEFAULT
+from ..profiling import count_entity, profiled
 from ..utils import (
     Vector,
     add_to_corresponding_list,
     check_name,
+    evaluated_with,
     find_last_list,
+    free_symbols,
     gen_name,
     general_remove,
     parse_entry,
@@ -13,38 +16,150 @@ from ..utils import (
 )
 
 
+class EntityList:
+    """
+    Entities of one layer of a body, in creation order. It behaves as a list
+    but is backed by an ordered dict so that append, remove and membership
+    are O(1). Indexing is O(1) too, through a list of the entities rebuilt
+    on the first access after a removal.
+    """
+
+    __slots__ = ("_entities", "_order")
+
+    def __init__(self, entities=()):
+        self._entities = dict.fromkeys(entities)
+        self._order = None  # list(self._entities), None when out of date
+
+    def append(self, entity):
+        if entity in self._entities:
+            return
+        self._entities[entity] = None
+        if self._order is not None:
+            self._order.append(entity)
+
+    def remove(self, entity):
+        try:
+            del self._entities[entity]
+        except KeyError:
+            raise ValueError("%s is not in the list" % entity)
+        self._order = None
+
+    def copy(self):
+        return list(self._entities)
+
+    def __contains__(self, entity):
+        return entity in self._entities
+
+    def __iter__(self):
+        return iter(self._entities)
+
+    def __reversed__(self):
+        return reversed(self._entities)
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __getitem__(self, index):
+        if self._order is None:
+            self._order = list(self._entities)
+        return self._order[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, EntityList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __repr__(self):
+        return repr(list(self._entities))
+
+
+class EntityTable(dict):
+    """
+    Entities of a body sorted by layer: {layer: EntityList}.
+    """
+
+    def add(self, entity):
+        if entity.layer not in self:
+            self[entity.layer] = EntityList()
+        self[entity.layer].append(entity)
+
+    def columns(self, layers=None):
+        """
+        The entities of layers (all by default) and their attributes as
+        arrays, for vectorized selections, e.g.
+            columns = body.entities.columns()
+            columns["entity"][columns["is_fillet"] & (columns["dimension"] == 2)]
+        """
+        entities = [
+            entity
+            for layer, layer_entities in self.items()
+            if layers is None or layer in layers
+            for entity in layer_entities
+        ]
+        columns = {"entity": np.empty(len(entities), dtype=object)}
+        columns["entity"][:] = entities
+        for attribute in ["name", "layer", "dimension", "is_boolean", "is_fillet"]:
+            columns[attribute] = np.array([getattr(entity, attribute) for entity in entities])
+        return columns
+
+
+def add_symbols(entities, symbols):
+    """Adds symbols to the variables of entities (an Entity or lists of them)."""
+    if isinstance(entities, Entity):
+        entities.symbols |= symbols
+    elif isinstance(entities, (list, tuple, EntityList)):
+        for entity in entities:
+            add_symbols(entity, symbols)
+
+
 class Entity:
     # this should be the objects we are handling on the python interface
     # each method of this class should act in return in HFSS/GDS when possible
-    dict_instances = {}
+    # slotted, as a chip can count 10^5 entities
+    __slots__ = (
+        "name",
+        "dimension",
+        "body",
+        "nonmodel",
+        "layer",
+        "is_boolean",
+        "is_fillet",
+        "symbols",
+    )
 
     def __init__(
         self, dimension, body, nonmodel=False, layer=DEFAULT, copy=None, name="entity_0", **kwargs
     ):
-        name = check_name(self.__class__, name)
+        self.body = body
+        name = check_name(self.__class__, name, self.dict_instances)
         self.name = name
         self.dimension = dimension
-        self.body = body
         self.nonmodel = nonmodel
         self.layer = layer
 
-        Entity.dict_instances[name] = self
-        if layer in self.body.entities.keys():
-            self.body.entities[layer].append(self)
-        else:
-            self.body.entities[layer] = [self]
+        self.dict_instances[name] = self
+        self.body.entities.add(self)
 
         if copy is None:
             if self.body.entities_to_move is not None:
                 find_last_list(self.body.entities_to_move).append(self)
             self.is_boolean = False  # did it suffer a bool operation already ?
             self.is_fillet = False  # did it suffer a fillet operation already ?
+            # variables the geometry depends on, see Modeler.affected_by
+            self.symbols = frozenset()
         else:
             # copy is indeed the original object
             # the new object should be put in the same list indent
             add_to_corresponding_list(copy, self.body.entities_to_move, self)
             self.is_boolean = copy.is_boolean
             self.is_fillet = copy.is_fillet
+            self.symbols = copy.symbols
+        count_entity()
 
     def __str__(self):
         return self.name
@@ -54,17 +169,10 @@ class Entity:
 
     ### General methods
 
-    @staticmethod
-    def reset():
-        raise NotImplementedError()
-        # self.body.entities = {}
-        # Entity.dict_instances = {}
-        # Entity.instances_to_move = []
-
-    @classmethod
-    def print_instances(cls):
-        for instance_name in cls.dict_instances:
-            print(instance_name)
+    @property
+    def dict_instances(self):
+        # the entities of the modeler, see Modeler.reset
+        return self.body.pm.entity_instances
 
     ### Modifying methods
 
@@ -177,16 +285,17 @@ class Entity:
         is_trigo = angle_p > angle_n
         return result_index, len(vertices), is_trigo
 
+    @profiled
+    @evaluated_with(lambda entity: entity.body.pm.variables)
     def fillet(self, radius, vertex_indices=None):
 
         assert not self.is_fillet, "Cannot fillet an already filleted entity"
+        self.symbols |= free_symbols(radius)
 
         if vertex_indices is None:
             # filleting all vertices
             msg = "Should provide a single radius when filleting all vertices"
             assert not isinstance(radius, list), msg
-            if self.body.mode == "gds":
-                radius = val(radius)
             self.body.interface.fillet(self, radius)
             self.is_fillet = True
             return None
@@ -225,7 +334,6 @@ class Entity:
         msg = "Vertex index is present more than once in fillet"
         assert len(flat_indices) == len(set(flat_indices)), msg
         if self.body.mode == "gds":
-            radius = val(radius)
             self.body.interface.fillet(self, radius, vertex_indices)
         else:
             # manipulate vertex_indices in a good way
@@ -319,6 +427,7 @@ class Entity:
         mesh_length = parse_entry(mesh_length)
         self.body.interface.assign_mesh_length(self, mesh_length)
 
+    @evaluated_with(lambda entity: entity.body.pm.variables)
     def assign_lumped_RLC(self, points, rlc):
 
         points = parse_entry(points)
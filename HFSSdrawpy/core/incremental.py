@@ -0,0 +1,357 @@
+import hashlib
+import json
+import os
+from copy import copy
+
+import numpy as np
+import sympy
+
+from ..utils import val
+
+# interface methods which do not touch the model objects, always executed
+PASSTHROUGH = {
+    "create_coor_sys",
+    "set_coor_sys",
+    "get_coor_sys",
+    "set_units",
+    "eval_expr",
+    "eval_var_str",
+    "delete_objects",
+    "delete_all_objects",
+}
+
+# interface methods whose answer depends on the actual state of the model
+QUERIES = {
+    "get_vertices",
+    "get_vertex_ids",
+    "get_faces",
+    "get_face_ids",
+    "get_edge_ids",
+    "get_matched_object_name",
+}
+
+# interface methods whose new objects are named by the modeler, these names
+# are read back from the model
+MODELER_NAMED = {
+    "copy",
+    "duplicate_along_line",
+    "connect_faces",
+    "create_object_from_face",
+}
+
+
+def fingerprint(obj):
+    """
+    Hashable and stable description of a drawing argument: entities and
+    ports are described by their name, sympy expressions by their string and
+    their resolved value so that changing a variable changes the fingerprint.
+    """
+    if hasattr(obj, "body") and hasattr(obj, "name"):  # Entity or Port
+        return (type(obj).__name__, obj.name)
+    if isinstance(obj, dict):
+        return tuple((key, fingerprint(obj[key])) for key in sorted(obj, key=str))
+    if isinstance(obj, (list, tuple, np.ndarray)):
+        return tuple(fingerprint(elt) for elt in obj)
+    if isinstance(obj, sympy.Basic):
+        try:
+            return (str(obj), repr(val(obj)))
+        except (TypeError, ValueError):
+            return str(obj)
+    if isinstance(obj, (float, np.floating)):
+        return repr(float(obj))
+    return repr(obj)
+
+
+def digest(method, args, kwargs, dependencies=()):
+    """
+    dependencies: (body name, state) of the other bodies whose entities are
+                  in the arguments, so that the operation changes with them
+    """
+    description = repr((method, fingerprint(args), fingerprint(kwargs), dependencies))
+    return hashlib.sha1(description.encode()).hexdigest()
+
+
+def _bodies(obj):
+    # names of the bodies owning the entities and ports of an argument
+    if hasattr(obj, "body") and hasattr(obj, "name"):
+        body = obj.body
+        return {body.name} if body is not None else set()
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        return set().union(*[_bodies(elt) for elt in obj])
+    return set()
+
+
+def _freeze(obj):
+    # snapshot of the arguments as they were when the operation was issued,
+    # entities are copied so that a later rename does not affect the replay
+    if hasattr(obj, "body") and hasattr(obj, "name"):
+        return copy(obj)
+    if isinstance(obj, list):
+        return [_freeze(elt) for elt in obj]
+    if isinstance(obj, tuple):
+        return tuple(_freeze(elt) for elt in obj)
+    if isinstance(obj, dict):
+        return {key: _freeze(value) for key, value in obj.items()}
+    return obj
+
+
+def _jsonable(obj):
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(elt) for elt in obj]
+    return None
+
+
+def _taken(lists, args, result):
+    """
+    Position [argument index, element index] of the returned object if the
+    call took it out of one of its list arguments (e.g. unite returns the
+    blank entity popped from its entities), None otherwise.
+    lists: {argument index: copy of the list argument before the call}
+    """
+    if result is None or isinstance(result, (str, int, float, bool)):
+        return None
+    for arg_index, before in lists.items():
+        for elt_index, elt in enumerate(before):
+            if elt is result and not any(other is result for other in args[arg_index]):
+                return [arg_index, elt_index]
+    return None
+
+
+def _alive(changes):
+    # object names left by a sequence of [created, removed] changes
+    objects = []
+    for created, removed in changes:
+        objects = [name for name in objects if name not in removed and name not in created]
+        objects += created
+    return objects
+
+
+def _argument(args, kwargs, index, key, default=None):
+    if len(args) > index:
+        return args[index]
+    return kwargs.get(key, default)
+
+
+def _removed_names(method, args, kwargs):
+    # objects an operation consumes, to be read before the call
+    if method in ("delete", "rename"):
+        return [args[0].name]
+    if method in ("unite", "intersect"):
+        if not _argument(args, kwargs, 1, "keep_originals", False):
+            return [entity.name for entity in args[0][1:]]
+    if method == "subtract":
+        if not _argument(args, kwargs, 2, "keep_originals", False):
+            return [entity.name for entity in args[1]]
+    return []
+
+
+def _owner(args, kwargs):
+    # name of the body owning the first entity or port found in the arguments
+    for arg in list(args) + list(kwargs.values()):
+        if isinstance(arg, (list, tuple)) and len(arg) > 0:
+            arg = arg[0]
+        body = getattr(arg, "body", None)
+        if body is not None and hasattr(arg, "name"):
+            return body.name
+    return None
+
+
+class BodyRecord:
+    def __init__(self, name, previous):
+        self.name = name
+        self.previous = previous  # what was stored at the last run or None
+        self.digests = []
+        self.returns = []
+        self.changes = []  # [created, removed] object names read from the model
+        self.log = []  # (coor_sys, method, frozen args, frozen kwargs)
+        self.dirty = False
+        self.state = ""  # digest of the operations so far, see IncrementalInterface._call
+
+
+class IncrementalInterface:
+    """
+    Wraps a modeler interface so that the drawing operations of a body are
+    only sent to the model if they differ from the ones of the previous run.
+
+    Each operation is digested (method + arguments + resolved variable
+    values). As long as the operations of a body match, one by one, the
+    operations stored at the last run, they are skipped since the model
+    already holds their result. At the first mismatch, the body becomes dirty:
+    its previous objects are deleted and its operations are replayed and then
+    executed normally. The digests are stored by commit in record_file.
+    """
+
+    def __init__(self, interface, record_file):
+        self._interface = interface
+        self.record_file = record_file
+        self.previous = {}
+        if os.path.exists(record_file):
+            with open(record_file) as f:
+                self.previous = json.load(f)
+            # a run that crashes before commit will trigger a full redraw
+            os.remove(record_file)
+        else:
+            interface.delete_all_objects()
+        self.previous_owners = {}
+        for body_name, record in self.previous.items():
+            for object_name in record["objects"]:
+                self.previous_owners[object_name] = body_name
+        self.records = {}
+        self.coor_sys = "Global"
+
+    def __getattr__(self, method):
+        attribute = getattr(self._interface, method)
+        if not callable(attribute):
+            return attribute
+
+        def operation(*args, **kwargs):
+            return self._call(method, attribute, args, kwargs)
+
+        return operation
+
+    def _record(self, body_name):
+        if body_name not in self.records:
+            self.records[body_name] = BodyRecord(body_name, self.previous.get(body_name))
+        return self.records[body_name]
+
+    def _call(self, method, function, args, kwargs):
+        if method in PASSTHROUGH:
+            if method == "set_coor_sys":
+                self.coor_sys = args[0] if args else kwargs["coor_sys"]
+            elif method == "create_coor_sys":
+                self.coor_sys = kwargs.get("ref_name", "Global")
+            return function(*args, **kwargs)
+
+        body_name = _owner(args, kwargs) or self.coor_sys
+        record = self._record(body_name)
+        if method in QUERIES:
+            if not record.dirty:
+                self._materialize(record)
+            return function(*args, **kwargs)
+
+        dependencies = tuple(
+            (name, self._record(name).state)
+            for name in sorted(_bodies(args) | _bodies(kwargs))
+            if name != body_name
+        )
+        op_digest = digest(method, args, kwargs, dependencies)
+        record.state = hashlib.sha1((record.state + op_digest).encode()).hexdigest()
+        frozen = (_freeze(args), _freeze(kwargs))  # the call may mutate them
+        index = len(record.digests)
+        previous = record.previous
+        skip = (
+            not record.dirty
+            and previous is not None
+            and index < len(previous["digests"])
+            and previous["digests"][index] == op_digest
+        )
+        if skip:
+            returned = previous["returns"][index]
+            if isinstance(returned, dict):  # taken out of a list argument
+                arg_index, elt_index = returned["taken"]
+                result = args[arg_index].pop(elt_index)
+            else:
+                result = returned
+            change = previous["changes"][index]
+        else:
+            if not record.dirty:
+                self._materialize(record)
+            for name in self._requested_names(method, args, kwargs):
+                self._claim(name, body_name)
+            lists = {ii: list(arg) for ii, arg in enumerate(args) if isinstance(arg, list)}
+            result, change = self._execute(method, function, args, kwargs)
+            taken = _taken(lists, args, result)
+            returned = _jsonable(result) if taken is None else {"taken": taken}
+
+        record.digests.append(op_digest)
+        record.returns.append(returned)
+        record.changes.append(change)
+        record.log.append((self.coor_sys, method) + frozen)
+        return result
+
+    def _execute(self, method, function, args, kwargs):
+        """
+        Runs an operation and returns its result with the [created, removed]
+        names of the objects it changed. The model is only listed for the
+        operations whose new objects are named by the modeler (pasted or
+        duplicated objects), the listing costs one call per object.
+        """
+        if method in MODELER_NAMED:
+            before = self._interface.get_objects()
+            result = function(*args, **kwargs)
+            after = self._interface.get_objects()
+            created = [name for name in after if name not in before]
+            removed = [name for name in before if name not in after]
+            return result, [created, removed]
+        removed = _removed_names(method, args, kwargs)
+        result = function(*args, **kwargs)
+        created = self._requested_names(method, args, kwargs)
+        if not created and isinstance(result, str):
+            created = [result]
+        return result, [created, removed]
+
+    @staticmethod
+    def _requested_names(method, args, kwargs):
+        # names imposed by the script, the other ones are chosen by the modeler
+        if method == "rename":
+            return [args[1] if len(args) > 1 else kwargs["name"]]
+        if "name" in kwargs and isinstance(kwargs["name"], str):
+            return [kwargs["name"]]
+        return []
+
+    def _claim(self, name, body_name):
+        # a stale object of another body could hold the name of a new object
+        owner = self.previous_owners.get(name)
+        if owner is not None and owner != body_name:
+            record = self._record(owner)
+            if not record.dirty:
+                self._materialize(record)
+
+    def _materialize(self, record):
+        """
+        Brings the model in the state the current run expects for this body:
+        deletes the objects of the previous run and replays the operations
+        skipped so far.
+        """
+        record.dirty = True
+        if record.previous is not None:
+            self._interface.delete_objects(record.previous["objects"])
+        if record.log:
+            current_coor_sys = self.coor_sys
+            for index, (coor_sys, method, args, kwargs) in enumerate(record.log):
+                self._interface.set_coor_sys(coor_sys)
+                function = getattr(self._interface, method)
+                _, record.changes[index] = self._execute(
+                    method, function, _freeze(args), _freeze(kwargs)
+                )
+            self._interface.set_coor_sys(current_coor_sys)
+
+    def commit(self):
+        """
+        Removes what the current run did not redraw and stores the digests
+        along with the names of the objects each body left in the model.
+        """
+        for body_name, previous in self.previous.items():
+            if body_name not in self.records:
+                self._interface.delete_objects(previous["objects"])
+        for record in self.records.values():
+            if not record.dirty:
+                if record.previous is None or len(record.digests) != len(
+                    record.previous["digests"]
+                ):
+                    self._materialize(record)
+
+        stored = {}
+        for body_name, record in self.records.items():
+            stored[body_name] = {
+                "digests": record.digests,
+                "returns": record.returns,
+                "changes": record.changes,
+                "objects": _alive(record.changes),
+            }
+        with open(self.record_file, "w") as f:
+            json.dump(stored, f)
@@ -1,15 +1,126 @@
+import ast
 import os
-from inspect import currentframe, getfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from inspect import currentframe
 
 import numpy as np
 import sympy
 from pint import UnitRegistry
 
-from ..utils import parse_entry, store_variable, val, variables
-from .entity import Entity
+from ..parameters import GAP, LAYERS, TRACK
+from ..profiling import profiled
+from ..utils import (
+    assigned_name,
+    check_name,
+    free_symbols,
+    parse_entry,
+    si_value,
+    Variables,
+    evaluated_with,
+    use_variables,
+    val,
+    variable_scope,
+)
+from .entity import Entity, EntityList, add_symbols
+from .incremental import IncrementalInterface
 
 sympy.init_printing(use_latex=False)
 
+# the drawing methods evaluate their expressions with the variables of their
+# modeler, whichever modeler the thread used last
+evaluated = evaluated_with(lambda modeler: modeler.pm.variables)
+
+# operators of the layer expressions and the gdspy boolean operations they stand for
+LAYER_OPERATIONS = {
+    ast.Add: "or",
+    ast.BitOr: "or",
+    ast.Sub: "not",
+    ast.BitAnd: "and",
+    ast.BitXor: "xor",
+}
+
+
+def parse_layer_expression(expr):
+    """
+    Tree of a layer expression: a layer or a tuple (operation, left, right)
+    where operation is a gdspy boolean operation.
+    expr: a layer or a string such as "DEFAULT - GAP + TRACK" made of the layer
+          names of parameters.LAYERS, layer numbers, parentheses and the
+          operators + or | (union), - (difference), & (intersection) and
+          ^ (symmetric difference), with the python precedence.
+    """
+    if isinstance(expr, int):
+        return expr
+    try:
+        node = ast.parse(expr, mode="eval").body
+    except SyntaxError:
+        raise ValueError("Invalid layer expression '%s'" % expr)
+    return _layer_tree(node, expr)
+
+
+def _layer_tree(node, expr):
+    if isinstance(node, ast.BinOp) and type(node.op) in LAYER_OPERATIONS:
+        return (
+            LAYER_OPERATIONS[type(node.op)],
+            _layer_tree(node.left, expr),
+            _layer_tree(node.right, expr),
+        )
+    if isinstance(node, ast.Name) and node.id in LAYERS:
+        return LAYERS[node.id]
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return node.value
+    raise ValueError(
+        "Invalid layer expression '%s': expected layers among %s combined with "
+        "+, -, &, | or ^" % (expr, ", ".join(LAYERS))
+    )
+
+
+def _tree_layers(tree):
+    if isinstance(tree, tuple):
+        return _tree_layers(tree[1]) | _tree_layers(tree[2])
+    return {tree}
+
+
+def generate_many(
+    build_fn, param_sets, folder, filename="chip", workers=None, processes=False, max_points=0
+):
+    """
+    Draws and writes several chips at once, each one with its own gds
+    Modeler. The chips share no state and are built in a thread pool, or a
+    process pool if processes is True: gdspy releasing the GIL in its
+    booleans only, processes are needed to use several cpus.
+    build_fn: build_fn(pm, **params) draws a chip with the modeler pm; with
+              processes, it should be defined at the top level of a module
+    param_sets: list of the {name: value} passed to build_fn
+    The files of the i-th chip are named filename_i_<cell name>.gds
+
+    Returns for each chip {"file": prefix of the files, "params": params,
+    "draw": duration of build_fn, "write": duration of generate_gds} (s).
+    """
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    jobs = [
+        (build_fn, params, folder, "%s_%d" % (filename, ii), max_points)
+        for ii, params in enumerate(param_sets)
+    ]
+    with executor(max_workers=workers) as pool:
+        return list(pool.map(_generate_one, *zip(*jobs)))
+
+
+def _generate_one(build_fn, params, folder, filename, max_points):
+    start = time.perf_counter()
+    pm = Modeler("gds")
+    build_fn(pm, **params)
+    drawn = time.perf_counter()
+    pm.generate_gds(folder, filename, max_points)
+    return {
+        "file": os.path.join(folder, filename),
+        "params": params,
+        "draw": drawn - start,
+        "write": time.perf_counter() - drawn,
+    }
+
 
 class Modeler:
     """
@@ -25,6 +136,16 @@ class Modeler:
     Inputs:
     -------
     mode: string in "gds" or "hfss"
+    incremental: (hfss only) if True, the model is not cleared at the beginning
+                 of the script: only the bodies whose drawing operations
+                 (arguments and resolved variable values) changed since the
+                 last run are deleted and redrawn. Call commit() at the end of
+                 the script to store the state of the run alongside the project.
+    numeric: (gds only) if True, set_variable returns the float value of the
+             variable instead of a sympy symbol so that the whole drawing is
+             computed with plain floats and sympy is never evaluated.
+    regenerate: (gds only) if True, changing the value of a variable with
+                set_variable redraws the entities depending on it, see redraw.
     """
 
     is_overdev = False
@@ -33,12 +154,35 @@ class Modeler:
     gap_mask = parse_entry("20um")
     overdev = parse_entry("0um")
 
-    def __init__(self, mode):
+    def __init__(self, mode, incremental=False, numeric=False, regenerate=False):
         """
         Creates a Modeler object based on the chosen interface.
         For now the interface cannot be changed during an execution, only at the beginning
         """
         self.mode = mode
+        self.incremental = incremental
+        self.numeric = numeric
+        self.regenerate = regenerate
+        # registries of the names of the bodies, entities and ports drawn by
+        # this modeler, reached through pm by the modeler and its bodies
+        self.pm = self
+        # the variables of the modeler. The drawing methods evaluate with them,
+        # val called by the script uses the ones of the modeler created or
+        # setting a variable last in the thread, see variable_scope
+        self.variables = Variables()
+        use_variables(self.variables)
+        self.body_instances = {}
+        self.entity_instances = {}
+        self.port_instances = {}
+        if incremental and mode != "hfss":
+            raise ValueError(
+                "Incremental redraw is only available in hfss mode, the gds "
+                "model is rebuilt in memory at each run"
+            )
+        if numeric and mode != "gds":
+            raise ValueError("Numeric mode is only available in gds mode")
+        if regenerate and (mode != "gds" or numeric):
+            raise ValueError("Regeneration is only available in gds mode, with symbolic variables")
         if mode == "hfss":
             from ..interfaces.hfss_modeler import get_desktop
 
@@ -48,9 +192,15 @@ class Modeler:
             self.design = design
             self.modeler = design.modeler
             self.modeler.set_units("mm")
-            self.modeler.delete_all_objects()
+            if incremental:
+                record_file = os.path.join(
+                    project.get_path(), "%s_%s.drawpy.json" % (project.name, design.name)
+                )
+                self.interface = IncrementalInterface(self.modeler, record_file)
+            else:
+                self.modeler.delete_all_objects()
+                self.interface = self.modeler
             desktop.clear_all_messages()
-            self.interface = self.modeler
         elif mode == "gds":
             from ..interfaces import gds_modeler
 
@@ -63,6 +213,23 @@ class Modeler:
 
     ### Utils methods
 
+    def reset(self):
+        """
+        Forgets the bodies, entities and ports of the modeler and clears the
+        drawing, so that another layout can be drawn with the same modeler.
+        In gds mode, the memory of the previous layout is released.
+        """
+        if self.incremental:
+            raise ValueError("An incremental model is cleared by commit(), not reset()")
+        self.body_instances.clear()
+        self.entity_instances.clear()
+        self.port_instances.clear()
+        self.bodies = []
+        if self.mode == "gds":
+            self.interface.reset()
+        else:
+            self.interface.delete_all_objects()
+
     def delete_all_objects(self, entities):
         for entity in entities:
             entity.delete()
@@ -77,34 +244,184 @@ class Modeler:
             # this auto-parsing is clearly a hack and not robust
             # but I find it convenient
             f = currentframe().f_back  # .f_back
-            filename = getfile(f)
-            code_line = open(filename).readlines()[f.f_lineno - 1]
-            name = code_line.split("=")[0].strip()
+            name = assigned_name(f.f_code.co_filename, f.f_lineno)
+            if name is None:
+                raise ValueError(
+                    "Could not infer the variable name from the source, "
+                    "please provide it with name="
+                )
 
         if self.mode == "hfss":
             self.design.set_variable(name, value)  # for HFSS
         symbol = sympy.symbols(name)
-        store_variable(symbol, value)
+        changed = self.pm.variables.store(symbol, value)
+        use_variables(self.pm.variables)
+        if changed and self.pm.regenerate:
+            self.pm.redraw(symbol)
+        if self.pm.numeric:
+            return self.pm.variables[symbol]
         return symbol
 
-    def generate_gds(self, folder, filename, max_points=0):
+    def variable_scope(self):
+        """
+        The drawing methods evaluate the expressions with the variables of
+        their modeler. Outside of them, val uses the variables of the modeler
+        created last in the thread. To evaluate with another modeler:
+            with pm.variable_scope():
+                ...
+        """
+        return variable_scope(self.pm.variables)
+
+    def affected_by(self, var_names):
+        """
+        Entities and ports depending on the variables var_names (a name, a
+        symbol or a list of them), directly or through the variables defined
+        from them. An entity depends on the variables of the arguments it was
+        drawn with, of its moves and fillets and of the entities it was
+        united with or subtracted.
+
+        Returns (list of entities, list of ports)
+        """
+        if not isinstance(var_names, (list, tuple, set)):
+            var_names = [var_names]
+        symbols = self.pm.variables.dependent_variables(
+            sympy.Symbol(name) if isinstance(name, str) else name for name in var_names
+        )
+        entities = [
+            entity
+            for entity in self.pm.entity_instances.values()
+            if not symbols.isdisjoint(entity.symbols)
+        ]
+        ports = [
+            port for port in self.pm.port_instances.values() if not symbols.isdisjoint(port.symbols)
+        ]
+        return entities, ports
+
+    @profiled
+    @evaluated
+    def redraw(self, var_names):
+        """
+        (gds only) Redraws the entities depending on the variables var_names
+        (see affected_by) for the current values of the variables, from their
+        recipes: the drawing script is not re-run and the other entities are
+        left untouched. The ports are evaluated on demand and need no redraw.
+        The topology of the drawing is the one it was drawn with, as for
+        sweep_gds.
+
+        Returns the list of the redrawn entities.
+        """
+        from ..interfaces.gds_recipes import Environment
+
+        if self.mode != "gds" or self.numeric:
+            raise ValueError("Redraws are only available in gds mode, with symbolic variables")
+        entities, _ = self.affected_by(var_names)
+        self.interface.redraw(entities, Environment({}, self.pm.variables, 1))
+        return entities
+
+    def commit(self):
+        """
+        In incremental mode, deletes the objects of the bodies which were not
+        redrawn and stores the digests of the run for the next one.
+        """
+        if self.incremental:
+            self.interface.commit()
+
+    @profiled
+    @evaluated
+    def generate_gds(self, folder, filename, max_points=0, subs=None):
+        """
+        subs: optional {variable (symbol or name): value}, the geometry is then
+              re-evaluated for these values (the other variables keeping
+              their current value) without modifying the drawing.
+        """
         file = os.path.join(folder, filename)
         if self.mode == "gds":
-            self.interface.generate_gds(file, max_points)
+            with self.processed_layers() as exclude:
+                if subs is None:
+                    self.interface.generate_gds(file, max_points, exclude)
+                else:
+                    sweep = {variable: [value] for variable, value in subs.items()}
+                    self._generate_evaluated_gds([file], sweep, max_points, exclude)
+
+    @profiled
+    @evaluated
+    def sweep_gds(self, folder, filename, sweep, max_points=0):
+        """
+        Writes the gds files of the chip for several values of the variables
+        without re-running the drawing script: the coordinates of every
+        entity are re-evaluated from their symbolic expressions, all sweep
+        points at once. The topology of the drawing (number of meanders,
+        choice of the cable paths...) is the one of the nominal values.
+
+        sweep: {variable (symbol or name): list of n values}
+        The files of the i-th point are named filename_i_<cell name>.gds
+
+        Returns the list of the n file prefixes.
+        """
+        if self.mode != "gds":
+            raise ValueError("Sweeps are only available in gds mode")
+        n_points = {len(values) for values in sweep.values()}
+        if len(n_points) != 1:
+            raise ValueError("All the swept variables should have the same number of values")
+        (n_points,) = n_points
+        files = [os.path.join(folder, filename + "_%d" % ii) for ii in range(n_points)]
+        with self.processed_layers() as exclude:
+            self._generate_evaluated_gds(files, sweep, max_points, exclude)
+        return files
+
+    def _generate_evaluated_gds(self, files, sweep, max_points, exclude):
+        from ..interfaces.gds_recipes import Environment
+
+        if self.numeric:
+            raise ValueError("The geometry of the numeric mode cannot be re-evaluated")
+        values = {}
+        for variable, variable_values in sweep.items():
+            if isinstance(variable, str):
+                variable = sympy.symbols(variable)
+            values[variable] = np.array([si_value(value) for value in variable_values], float)
+        env = Environment(values, self.pm.variables, len(files))
+        self.interface.generate_evaluated_gds(files, env, max_points, exclude)
+
+    @evaluated
+    def set_tiling(self, tile_size, processes=1, merge=False):
+        """
+        (gds only) The following booleans (unite, subtract, layer_boolean) cut
+        the plane in square tiles evaluated on the polygons they overlap only,
+        possibly in parallel, which bounds the size of each gdspy boolean for
+        large cells.
+        tile_size: side of the tiles, None to evaluate the booleans at once
+        processes: number of processes evaluating the tiles, None for one per
+                   cpu, 1 evaluates them in the current process
+        merge: if True, the polygons cut by the seams of the tiles are united,
+               otherwise the results are left split along the seams. Merging
+               a polygon spanning many tiles (e.g. a ground plane) costs as
+               much as the untiled boolean.
+        """
+        if self.mode != "gds":
+            raise ValueError("Tiled booleans are only available in gds mode")
+        if tile_size is None:
+            self.interface.tiling = None
+        else:
+            tile_size = val(parse_entry(tile_size))
+            self.interface.tiling = dict(tile_size=tile_size, processes=processes, merge=merge)
 
     def make_material(self, material_params, name):
         raise NotImplementedError()
 
     ### Methods acting on list of entities
 
+    @profiled
+    @evaluated
     def intersect(self, entities, keep_originals=False):
         raise NotImplementedError()
 
+    @profiled
+    @evaluated
     def unite(self, entities, main=None, keep_originals=False, new_name=None):
         # main: name or entity that should be returned/preserved/final union
         # if new_name (str) is provided, the original entities are kept and
         # the union is named new_name
-        if not isinstance(entities, list):
+        if not isinstance(entities, (list, EntityList)):
             entities = [entities]
         entities = entities.copy()
 
@@ -115,7 +432,7 @@ class Modeler:
 
         if main is not None:
             if isinstance(main, str):
-                main = Entity.dict_instances[main]
+                main = self.pm.entity_instances[main]
             if main in entities:
                 entities.remove(main)
             entities = [main] + entities
@@ -134,6 +451,7 @@ class Modeler:
                 union_entity.is_boolean = True
                 list_fillet = [entity.is_fillet for entity in entities]
                 union_entity.is_fillet = union_entity.is_fillet or any(list_fillet)
+                union_entity.symbols |= free_symbols(entities)
 
                 if not keep_originals:
                     ents = entities.copy()
@@ -147,16 +465,20 @@ class Modeler:
 
         return union_entity
 
+    @profiled
+    @evaluated
     def subtract(self, blank_entities, tool_entities, keep_originals=False):
         """
         tool_entities: a list of Entity or a Entity
         keep_originals: Boolean, True : the tool entities still exist after
                         boolean operation
         """
-        if not isinstance(blank_entities, list):
+        if not isinstance(blank_entities, (list, EntityList)):
             blank_entities = [blank_entities]
-        if not isinstance(tool_entities, list):
+        if not isinstance(tool_entities, (list, EntityList)):
             tool_entities = [tool_entities]
+        # the entities of a layer are copied as they may be deleted
+        blank_entities, tool_entities = list(blank_entities), list(tool_entities)
         if len(blank_entities) == 0 or len(tool_entities) == 0:
             pass
         else:
@@ -173,30 +495,167 @@ class Modeler:
                 self.interface.subtract(blank_entities, tool_entities, keep_originals=True)
                 # actualize the properties of the blank_entities
                 list_fillet_bool = any([entity.is_fillet for entity in tool_entities])
+                tool_symbols = free_symbols(tool_entities)
                 for entity in blank_entities:
                     entity.is_boolean = True
                     entity.is_fillet = entity.is_fillet or list_fillet_bool
+                    entity.symbols |= tool_symbols
                     # this is not optimal fillet wise but hard to do better
             if not keep_originals:
                 tools = tool_entities.copy()
                 for tool_entity in tools:
                     tool_entity.delete()
 
+    @profiled
+    @evaluated
+    def layer_boolean(self, out_layer, expr, keep_originals=False, tile_size=None, name="layer_0"):
+        """
+        (gds only) Evaluates a layer expression on whole layers, body by body,
+        e.g. pm.layer_boolean(TRACK, "TRACK - GAP") replaces the entities on
+        TRACK of each body by a single entity in which the gaps are cut.
+        Each operation is one boolean pass on all the polygons of the layers
+        instead of one per entity.
+
+        out_layer: layer of the resulting entities
+        expr: layer expression, see parse_layer_expression
+        keep_originals: if False, the entities on the layers of expr are deleted
+        tile_size: if given, the layers are evaluated in square tiles of this
+                   size, which bounds the number of polygons of each pass,
+                   otherwise the tiling of set_tiling is used
+        Returns the list of the new entities, one per body drawing on the
+        layers of expr.
+        """
+        if self.mode != "gds":
+            raise ValueError("Layer booleans are only available in gds mode")
+        tree = parse_layer_expression(expr)
+        layers = _tree_layers(tree)
+        if tile_size is not None:
+            tile_size = val(parse_entry(tile_size))
+        if any(body.cursors for body in self.bodies):
+            raise ValueError(
+                "Layer booleans should be computed outside of 'with body(...)' blocks"
+            )
+        results = []
+        for body in self.bodies:
+            entities = {layer: list(body.entities.get(layer, [])) for layer in layers}
+            if not any(entities.values()):
+                continue
+            entity_name = check_name(Entity, name, self.pm.entity_instances)
+            self.interface.set_coor_sys(body.name)
+            self.interface.layer_boolean(
+                tree, entities, tile_size, name=entity_name, layer=out_layer
+            )
+            result = Entity(2, body, name=entity_name, layer=out_layer)
+            result.is_boolean = True
+            result.is_fillet = any(
+                entity.is_fillet for operands in entities.values() for entity in operands
+            )
+            result.symbols = frozenset(free_symbols(list(entities.values())))
+            if not keep_originals:
+                for operands in entities.values():
+                    for entity in operands:
+                        entity.delete()
+            results.append(result)
+        return results
+
+    @profiled
+    @evaluated
+    def offset_layers(
+        self, layers, distance, out_layer=None, keep_originals=False, name="offset_0"
+    ):
+        """
+        (gds only) Grows (distance > 0) or shrinks (distance < 0) whole
+        layers, body by body: the polygons of all the entities of the layers
+        are united and offset at once.
+
+        layers: a layer or a list of layers
+        out_layer: layer of the resulting entities, by default the first of
+                   layers
+        keep_originals: if False, the entities of the layers are deleted
+        Returns the list of the new entities, one per body drawing on layers.
+        """
+        if self.mode != "gds":
+            raise ValueError("Layer offsets are only available in gds mode")
+        if not isinstance(layers, (list, tuple)):
+            layers = [layers]
+        if out_layer is None:
+            out_layer = layers[0]
+        if any(body.cursors for body in self.bodies):
+            raise ValueError("Layer offsets should be computed outside of 'with body(...)' blocks")
+        results = []
+        for body in self.bodies:
+            entities = [entity for layer in layers for entity in body.entities.get(layer, [])]
+            if not entities:
+                continue
+            entity_name = check_name(Entity, name, self.pm.entity_instances)
+            self.interface.set_coor_sys(body.name)
+            self.interface.offset_layers(entities, distance, name=entity_name, layer=out_layer)
+            result = Entity(2, body, name=entity_name, layer=out_layer)
+            result.is_boolean = True
+            result.symbols = frozenset(free_symbols(entities, distance))
+            if not keep_originals:
+                for entity in entities:
+                    entity.delete()
+            results.append(result)
+        return results
+
+    def process_layers(self):
+        """
+        (gds only) Post-processing of the drawn layers, for the gds files:
+            is_overdev: TRACK is grown and GAP shrunk by overdev
+        The drawn entities are kept, the processed layers being new entities.
+        The MASK layer is drawn along with the elements (see draw_cable) since
+        the gaps are usually subtracted and deleted before the export.
+        Returns (the new entities, the drawn entities they replace)
+        """
+        created, replaced = [], []
+        if self.is_overdev:
+            for layer, distance in [(TRACK, self.overdev), (GAP, -self.overdev)]:
+                replaced += [
+                    entity for body in self.bodies for entity in body.entities.get(layer, [])
+                ]
+                created += self.offset_layers(
+                    layer, distance, keep_originals=True, name="overdev_%d_0" % layer
+                )
+        return created, replaced
+
+    @contextmanager
+    def processed_layers(self):
+        """
+        (gds only) Processes the layers (see process_layers) for the time of
+        the block, which gets the names of the entities to leave out of the
+        files. The processed layers are deleted at the end of the block, so
+        that the drawing is unchanged and processed again at each export.
+        """
+        created, replaced = self.process_layers()
+        try:
+            yield [entity.name for entity in replaced]
+        finally:
+            for entity in created:
+                entity.delete()
+
+    @profiled
+    @evaluated
     def rotate(self, entities, angle=0):
         if isinstance(angle, (list, np.ndarray)):
             if len(angle) == 2:
-                angle = np.math.atan2(np.linalg.det([[1, 0], angle]), np.dot([1, 0], angle))
+                angle = np.arctan2(np.linalg.det([[1, 0], angle]), np.dot([1, 0], angle))
                 angle = angle / np.pi * 180
             else:
                 raise Exception("angle should be either a float or a 2-dim array")
         elif not isinstance(angle, (float, int)):
             raise Exception("angle should be either a float or a 2-dim array")
-        if self.mode == "gds":
-            angle = val(angle)
+        if isinstance(entities, EntityList):
+            entities = entities.copy()
         self.interface.rotate(entities, angle)  # angle in degrees
 
+    @profiled
+    @evaluated
     def translate(self, entities, vector=[0, 0, 0]):
         vector = parse_entry(vector)
-        if self.mode == "gds":
-            vector = val(vector)
+        if isinstance(entities, EntityList):
+            entities = entities.copy()
         self.interface.translate(entities, vector)
+        symbols = free_symbols(vector)
+        if symbols:
+            add_symbols(entities, symbols)
@@ -2,11 +2,30 @@ import math
 
 import numpy as np
 
+from .. import utils
+from ..parameters import GAP
 from ..utils import Vector, check_name, find_last_list, parse_entry, val
 
 
+def _geometry(name):
+    # attribute whose change invalidates the evaluated snapshot of the port
+    attribute = "_" + name
+
+    def getter(self):
+        return getattr(self, attribute)
+
+    def setter(self, value):
+        setattr(self, attribute, value)
+        self._snapshot = None
+
+    return property(getter, setter)
+
+
 class Port:
-    dict_instances = {}
+    pos = _geometry("pos")
+    ori = _geometry("ori")
+    widths = _geometry("widths")
+    offsets = _geometry("offsets")
 
     def __init__(
         self,
@@ -21,14 +40,14 @@ class Port:
         constraint_port,
         key="name",
     ):
+        self.body = body
         if not (isinstance(key, Port) or key is None):
-            name = check_name(self.__class__, name)
+            name = check_name(self.__class__, name, self.dict_instances)
         self.name = name
         self.pos = Vector(pos)
         self.ori = Vector(ori)
         self.constraint_port = constraint_port
         self.save = None
-        self.body = body
         if not constraint_port:
             self.widths = parse_entry(widths)
             self.subnames = subnames
@@ -42,7 +61,8 @@ class Port:
             self.offsets = offsets
             self.N = 0
 
-        if self.body.ports_to_move is not None:
+        # evaluated snapshots (key=None) are not moved with the body
+        if key is not None and self.body.ports_to_move is not None:
             find_last_list(self.body.ports_to_move).append(self)
         if key == "name":  # normal initialisation
             self.dict_instances[name] = self
@@ -80,18 +100,15 @@ class Port:
     def __repr__(self):
         return self.name
 
-    @staticmethod
-    def reset():
-        Port.dict_instances = {}
-
-    @classmethod
-    def print_instances(cls):
-        for instance_name in cls.dict_instances:
-            print(instance_name)  # , cls.dict_instances[instance_name])
+    @property
+    def dict_instances(self):
+        # the ports of the modeler, see Modeler.reset
+        return self.body.pm.port_instances
 
     def compare(self, other, pm, slope=0.5):
         points = []
 
+        evaluated, other_evaluated = self.val(), other.val()
         adapt_dist = pm.set_variable(1e-5, name=self.name + "_adapt")
         max_diff = 0
         for ii in range(self.N):
@@ -108,7 +125,10 @@ class Port:
 
             offset2 = -other.offsets[ii]
 
-            if val(width1) != val(width2) or val(offset1) != val(offset2):
+            width1_val, width2_val = evaluated.widths[ii], other_evaluated.widths[ii]
+            offset1_val, offset2_val = evaluated.offsets[ii], -other_evaluated.offsets[ii]
+
+            if width1_val != width2_val or offset1_val != offset2_val:
 
                 # need adaptor
                 points.append(
@@ -121,8 +141,8 @@ class Port:
                 )
             max_diff = max(
                 max_diff,
-                abs(val(offset1 + width1 / 2 - (offset2 + width2 / 2))),
-                abs(val(offset2 - width2 / 2 - (offset1 - width1 / 2))),
+                abs(offset1_val + width1_val / 2 - (offset2_val + width2_val / 2)),
+                abs(offset2_val - width2_val / 2 - (offset1_val - width1_val / 2)),
             )
         adapt_dist = pm.set_variable(max_diff / slope, name=self.name + "_adapt")
 
@@ -146,26 +166,52 @@ class Port:
             self.r.offsets = other.offsets
         return points, 2 * max_diff
 
+    @property
+    def symbols(self):
+        # variables the port depends on, see Modeler.affected_by
+        return utils.free_symbols(
+            self.pos, self.ori, (self.widths or [])[: self.N], (self.offsets or [])[: self.N]
+        )
+
+    @utils.evaluated_with(lambda port: port.body.pm.variables)
     def val(self):
+        """
+        Port with evaluated position, orientation, widths and offsets. It is
+        computed once and kept until one of them is set, an element is added
+        or removed or a variable they use changes value.
+        """
+        scope = self.body.pm.variables
+        key = (self.N, len(self.widths or []), len(self.offsets or []))
+        if self._snapshot is not None and self._snapshot[0] == key:
+            symbols, revision, port = self._snapshot[1:]
+            if scope.revision_of(symbols) == revision:
+                return port
+
+        symbols = set()  # the variables used by the port
+
+        def evaluate(coor):
+            symbols.update(getattr(coor, "free_symbols", ()))
+            return val(coor)
+
         _widths = []
         _offsets = []
         for ii in range(self.N):
             width = self.widths[ii]
             offset = self.offsets[ii]
-            _widths.append(val(width))
-            _offsets.append(val(offset))
+            _widths.append(evaluate(width))
+            _offsets.append(evaluate(offset))
 
         _pos = []
         for coor in self.pos:
-            _pos.append(val(coor))
+            _pos.append(evaluate(coor))
         _pos = Vector(_pos)
 
         _ori = []
         for coor in self.ori:
-            _ori.append(val(coor))
+            _ori.append(evaluate(coor))
         _ori = Vector(_ori)
 
-        return Port(
+        port = Port(
             self.body,
             self.name,
             _pos,
@@ -177,6 +223,8 @@ class Port:
             self.constraint_port,
             key=None,
         )
+        self._snapshot = (key, symbols, scope.revision_of(symbols), port)
+        return port
 
     def revert(self):
         if self.save is not None:
@@ -196,10 +244,11 @@ class Port:
         y_max_val = -np.infty
         y_min = np.infty
         y_min_val = np.infty
+        evaluated = self.val()
         for ii in range(self.N):
             # widths should not be negative
-            _y_max_val = val(self.offsets[ii] + self.widths[ii] / 2)
-            _y_min_val = val(self.offsets[ii] - self.widths[ii] / 2)
+            _y_max_val = evaluated.offsets[ii] + evaluated.widths[ii] / 2
+            _y_min_val = evaluated.offsets[ii] - evaluated.widths[ii] / 2
             if _y_max_val > y_max_val:
                 y_max = self.offsets[ii] + self.widths[ii] / 2
                 y_max_val = _y_max_val
@@ -210,26 +259,71 @@ class Port:
 
     @staticmethod
     def translate_ports(ports, vector):
-        for port in ports:
-            port.pos = port.pos + Vector(vector)
+        Port.move_ports(ports, vector=vector)
 
     @staticmethod
     def rotate_ports(ports, angle):
-        if isinstance(angle, list):
-            if len(angle) == 2:
-                new_angle = np.math.atan2(np.linalg.det([[1, 0], angle]), np.dot([1, 0], angle))
-                new_angle = new_angle / np.pi * 180
+        Port.move_ports(ports, angle=angle)
+
+    @staticmethod
+    def move_ports(ports, angle=None, vector=None):
+        """
+        Rotates the ports by angle (in degrees, or a direction [x, y]) around
+        the origin, then translates them by vector. The positions and
+        orientations of the ports are stacked in arrays and moved at once:
+        one array for the evaluated positions, one for the symbolic ones.
+        """
+        if len(ports) == 0:
+            return
+        rad = None
+        if angle is not None:
+            if isinstance(angle, list):
+                if len(angle) == 2:
+                    new_angle = math.atan2(np.linalg.det([[1, 0], angle]), np.dot([1, 0], angle))
+                    new_angle = new_angle / np.pi * 180
+                else:
+                    raise Exception("angle should be either a float or a 2-dim array")
             else:
-                raise Exception("angle should be either a float or a 2-dim array")
-        else:
-            new_angle = angle
-        rad = new_angle / 180 * np.pi
-        rotate_matrix = np.array([[np.cos(rad), np.sin(-rad)], [np.sin(rad), np.cos(rad)]])
-        for port in ports:
-            port.ori = rotate_matrix.dot(port.ori[0:2])
-            posx = port.pos[0] * math.cos(rad) + port.pos[1] * math.sin(-rad)
-            posy = port.pos[0] * math.sin(rad) + port.pos[1] * math.cos(rad)
-            port.pos = Vector([posx, posy])
+                new_angle = angle
+            rad = new_angle / 180 * np.pi
+        symbolic = [port.pos.dtype == object for port in ports]
+        for group in (False, True):
+            group_ports = [port for port, flag in zip(ports, symbolic) if flag == group]
+            if group_ports:
+                Port._move_group(group_ports, rad, vector)
+
+    @staticmethod
+    def _move_group(ports, rad, vector):
+        positions = np.array([port.pos for port in ports])
+        symbolic = positions.dtype == object
+        orientations = None
+        if rad is not None:
+            rotate_matrix = np.array([[np.cos(rad), np.sin(-rad)], [np.sin(rad), np.cos(rad)]])
+            ori = np.array([port.ori[0:2] for port in ports])
+            orientations = np.empty(ori.shape, dtype=np.result_type(ori, rotate_matrix))
+            orientations[:, 0] = rotate_matrix[0, 0] * ori[:, 0] + rotate_matrix[0, 1] * ori[:, 1]
+            orientations[:, 1] = rotate_matrix[1, 0] * ori[:, 0] + rotate_matrix[1, 1] * ori[:, 1]
+            # the positions are brought back in the plane
+            x, y = positions[:, 0], positions[:, 1]
+            rotated = np.zeros(positions.shape, dtype=positions.dtype if symbolic else float)
+            rotated[:, 0] = x * math.cos(rad) + y * math.sin(-rad)
+            rotated[:, 1] = x * math.sin(rad) + y * math.cos(rad)
+            if symbolic:
+                # as in Vector([x, y]), z is a float if x and y are numbers
+                numbers = [
+                    isinstance(x, (int, float)) and isinstance(y, (int, float))
+                    for x, y in rotated[:, :2]
+                ]
+                rotated[numbers, 2] = 0.0
+            positions = rotated
+        if vector is not None:
+            positions = positions + Vector(vector)
+        if not symbolic:
+            positions = positions.view(Vector)  # each row is a Vector
+        for ii, port in enumerate(ports):
+            port.pos = Vector(list(positions[ii])) if symbolic else positions[ii]
+            if orientations is not None:
+                port.ori = orientations[ii]
 
     def split(self, splitnames=None, gap=None):
         """
@@ -300,8 +394,8 @@ class Port:
             self.subnames = lo_subnames
             self.N        = len(lo_widths)
 
-            #we reset the r version and make a new one
-            self.r.reset()
+            #we forget the r version and make a new one
+            self.dict_instances.pop(self.r.name, None)
             reversed_ori = -self.ori
             reversed_offsets = None
             if self.offsets is not None:
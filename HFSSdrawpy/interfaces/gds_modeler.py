@@ -1,16 +1,98 @@
+from copy import copy as shallow_copy
+
 import gdspy
 import numpy as np
 
 from ..core.entity import gen_name
+from ..parameters import BOND_DIAMETER
+from ..profiling import profiled_interface
 from ..utils import Vector, parse_entry, val
+from .gds_recipes import (
+    TOLERANCE,
+    ArrayRecipe,
+    BondsRecipe,
+    BooleanRecipe,
+    CablePartRecipe,
+    CableRecipe,
+    CheeseRecipe,
+    ComponentRecipe,
+    FilletRecipe,
+    LayerBooleanRecipe,
+    OffsetRecipe,
+    PolygonRecipe,
+    ReferenceRecipe,
+    RotateRecipe,
+    RoundRecipe,
+    TextRecipe,
+    TranslateRecipe,
+    bond_polygons,
+    lattice_blocks,
+    lattice_inside,
+    layer_polygons,
+    offset_polygons,
+    rect_polygons,
+)
 
-TOLERANCE = 1e-9 # for arcs
 print("gdspy_version : ", gdspy.__version__)
 
-
+REFERENCES = (gdspy.CellReference, gdspy.CellArray)
+
+
+def cell_polygons(cell):
+    """Polygons of a cell, those of its references included."""
+    polygons = []
+    for obj in cell.polygons:
+        polygons += obj.polygons
+    for reference in cell.references:
+        polygons += reference_polygons(reference)
+    return polygons
+
+
+def reference_polygons(reference):
+    """
+    Polygons placed by a CellReference or a CellArray. The copies of an
+    array are computed with arrays, gdspy transforms them one by one.
+    """
+    if reference.magnification or reference.x_reflection:
+        return reference.get_polygons()
+    if isinstance(reference, gdspy.CellArray):
+        offsets = np.stack(
+            np.meshgrid(
+                np.arange(reference.columns) * reference.spacing[0],
+                np.arange(reference.rows) * reference.spacing[1],
+                indexing="ij",
+            ),
+            axis=-1,
+        ).reshape(-1, 1, 2)
+    else:
+        offsets = np.zeros((1, 1, 2))
+    angle = (reference.rotation or 0) / 180 * np.pi
+    rotation = np.array([[np.cos(angle), np.sin(angle)], [-np.sin(angle), np.cos(angle)]])
+    polygons = []
+    for polygon in cell_polygons(reference.ref_cell):
+        polygons += list((polygon + offsets) @ rotation + reference.origin)
+    return polygons
+
+
+def object_polygons(obj):
+    if isinstance(obj, REFERENCES):
+        return reference_polygons(obj)
+    if isinstance(obj, gdspy.PolygonSet):
+        return obj.polygons
+    return obj.get_polygons()
+
+
+def filtered_cell(cell, excluded):
+    # copy of cell without the objects whose id is in excluded
+    filtered = gdspy.Cell(cell.name, exclude_from_current=True)
+    filtered.add([obj for obj in cell.polygons + cell.paths if id(obj) not in excluded])
+    filtered.add([obj for obj in cell.references if id(obj) not in excluded])
+    filtered.add(cell.labels)
+    return filtered
+
+
+@profiled_interface
 class GdsModeler:
-    gds_object_instances = {}
-    gds_cells = {}
     dict_units = {"km": 1.0e3, "m": 1.0, "cm": 1.0e-2, "mm": 1.0e-3}
     # coor_systems = {'Global':[[0,0,0],[1,0]]}
     # coor_system = coor_systems['Global']
@@ -18,20 +100,43 @@ class GdsModeler:
     def __init__(self, unit=1.0e-6, precision=1.0e-9):
         self.unit = unit
         self.precision = precision
-        gdspy.current_library = gdspy.GdsLibrary()
-
-    @classmethod
-    def print_instances(cls):
-        for instance_name in cls.gds_object_instances:
+        # the cells are kept out of the gdspy global library, so that several
+        # modelers can draw at the same time
+        self.gds_object_instances = {}
+        self.gds_cells = {}
+        self.component_cells = {}  # cells only drawn through references
+        # {unit cell name of a rect_array: number of references placing it}
+        self.array_cells = {}
+        # symbolic description of each gds object and the cell it belongs to,
+        # used to re-evaluate the geometry for other variable values
+        self.recipes = {}
+        self.recipe_cells = {}
+        self.component_recipes = {}
+        # keyword arguments of layer_polygons when the booleans are tiled
+        self.tiling = None
+
+    def print_instances(self):
+        for instance_name in self.gds_object_instances:
             print(instance_name)
 
+    def reset(self):
+        # releases the drawing, see Modeler.reset
+        self.gds_object_instances.clear()
+        self.gds_cells.clear()
+        self.component_cells.clear()
+        self.array_cells.clear()
+        self.recipes.clear()
+        self.recipe_cells.clear()
+        self.component_recipes.clear()
+        self.cell = None
+
     def reset_cell(self):
         del self.cell
 
     def create_coor_sys(self, coor_sys="chip", rel_coor=None, ref_name="Global"):
         # this creates a cell, should not care about the rel_coor
-        if not (coor_sys in gdspy.current_library.cells.keys()):
-            cell = gdspy.Cell(coor_sys)
+        if not (coor_sys in self.gds_cells.keys()):
+            cell = gdspy.Cell(coor_sys, exclude_from_current=True)
             self.gds_cells[coor_sys] = cell
         else:
             cell = self.gds_cells[coor_sys]
@@ -44,30 +149,130 @@ class GdsModeler:
         else:
             raise ValueError("%s cell do not exist" % coor_sys)
 
+    def _add(self, name, obj, recipe):
+        self.gds_object_instances[name] = obj
+        self.recipes[name] = recipe
+        self.recipe_cells[name] = self.cell.name
+        self.cell.add(obj)
+        if isinstance(obj, REFERENCES) and obj.ref_cell.name in self.array_cells:
+            self.array_cells[obj.ref_cell.name] += 1
+
+    def _remove(self, obj):
+        # gdspy keeps the references and the paths apart from the polygons
+        if isinstance(obj, gdspy.FlexPath):
+            self.cell.paths.remove(obj)
+        elif isinstance(obj, REFERENCES):
+            self.cell.references.remove(obj)
+            cell_name = obj.ref_cell.name
+            if cell_name in self.array_cells:
+                # the unit cell of an array is released with its last reference
+                self.array_cells[cell_name] -= 1
+                if self.array_cells[cell_name] == 0:
+                    self.array_cells.pop(cell_name)
+                    self.component_cells.pop(cell_name)
+        else:
+            self.cell.polygons.remove(obj)
+
+    def _flatten(self, entity):
+        # a reference is replaced by the polygons it places
+        obj = self.gds_object_instances[entity.name]
+        if isinstance(obj, REFERENCES):
+            self.cell = self.gds_cells[entity.body.name]
+            self._remove(obj)
+            obj = gdspy.PolygonSet(reference_polygons(obj), layer=entity.layer)
+            self._add(entity.name, obj, self.recipes[entity.name])
+        return obj
+
+    def _polygons(self, entity):
+        return object_polygons(self.gds_object_instances[entity.name])
+
     def copy(self, entity):
-        new_polygon = gdspy.copy(self.gds_object_instances[entity.name], 0, 0)
+        obj = self.gds_object_instances[entity.name]
+        if isinstance(obj, REFERENCES):
+            # the referenced cell is shared, not copied
+            new_polygon = shallow_copy(obj)
+        else:
+            new_polygon = gdspy.copy(obj, 0, 0)
         new_name = gen_name(entity.name)
-        self.gds_object_instances[new_name] = new_polygon
-        self.cell.add(new_polygon)
+        self._add(new_name, new_polygon, self.recipes[entity.name])
 
     def rename(self, entity, name):
         obj = self.gds_object_instances.pop(entity.name)
         self.gds_object_instances[name] = obj
+        self.recipes[name] = self.recipes.pop(entity.name)
+        self.recipe_cells[name] = self.recipe_cells.pop(entity.name)
+
+    def generate_gds(self, file, max_points, exclude=()):
+        self.fracture(max_points)
+        self.write_gds(file, exclude)
 
-    def generate_gds(self, file, max_points):
+    def fracture(self, max_points):
         for instance in self.gds_object_instances.keys():
             obj = self.gds_object_instances[instance]
             if isinstance(obj, gdspy.Polygon) or isinstance(obj, gdspy.PolygonSet):
                 self.gds_object_instances[instance] = obj.fracture(
                     max_points=max_points, precision=1e-9
                 )
-
-        for cell_name in self.gds_cells.keys():
+        for cell in self.component_cells.values():
+            for obj in cell.polygons:
+                obj.fracture(max_points=max_points, precision=1e-9)
+
+    def write_gds(self, file, exclude=()):
+        """exclude: names of the objects left out of the files"""
+        excluded = {id(self.gds_object_instances[name]) for name in exclude}
+        for cell_name, cell in self.gds_cells.items():
             filename = file + "_%s.gds" % cell_name
-            gdspy.write_gds(filename, cells=[cell_name], unit=1.0, precision=1e-9)
+            if excluded:
+                cell = filtered_cell(cell, excluded)
+            # the referenced cells are written along
+            cells = [cell] + sorted(cell.get_dependencies(True), key=lambda cell: cell.name)
+            library = gdspy.GdsLibrary(unit=1.0, precision=1e-9)
+            library.write_gds(filename, cells=cells)
+
+    def generate_evaluated_gds(self, files, env, max_points, exclude=()):
+        """
+        Rebuilds the geometry from the recipes without touching the drawn
+        cells and writes one set of files per point.
+        files: list of n file prefixes
+        env: Environment of n values
+        exclude: names of the objects left out of the files
+        """
+        for index, file in enumerate(files):
+            library = gdspy.GdsLibrary(unit=1.0, precision=1e-9)
+            cells = {}
+            for cell_name in self.gds_cells.keys():
+                cells[cell_name] = gdspy.Cell(cell_name, exclude_from_current=True)
+                library.add(cells[cell_name])
+            for name, recipe in self.recipes.items():
+                if name in exclude:
+                    continue
+                obj = recipe.build(env, index)
+                if isinstance(obj, gdspy.PolygonSet):
+                    obj = obj.fracture(max_points=max_points, precision=1e-9)
+                cells[self.recipe_cells[name]].add(obj)
+            for cell_name, cell in cells.items():
+                filename = file + "_%s.gds" % cell_name
+                library.write_gds(filename, cells=[cell])
+
+    def redraw(self, entities, env):
+        """
+        Replaces the gds objects of entities by their recipes evaluated in env
+        (Environment of 1 value).
+        """
+        current_cell = self.cell
+        for entity in entities:
+            recipe = self.recipes[entity.name]
+            self.cell = self.gds_cells[self.recipe_cells[entity.name]]
+            self._remove(self.gds_object_instances[entity.name])
+            self._add(entity.name, recipe.build(env, 0), recipe)
+        self.cell = current_cell
+
+    def get_bounding_box(self, entity):
+        # [[xmin, ymin], [xmax, ymax]] or None for an empty entity
+        return self.gds_object_instances[entity.name].get_bounding_box()
 
     def get_vertices(self, entity):
-        polygon = self.gds_object_instances[entity.name]
+        polygon = self._flatten(entity)
         return polygon.polygons[0]
 
     def set_units(self, units="m"):
@@ -85,6 +290,8 @@ class GdsModeler:
         name = kwargs["name"]
         layer = kwargs["layer"]
         points = parse_entry(points)
+        recipe = PolygonRecipe(points, layer, closed=closed)
+        points = val(points)
 
         # TODO, this is a dirty fixe cause of Vector3D
 
@@ -97,8 +304,7 @@ class GdsModeler:
         else:
             poly1 = gdspy.FlexPath(points_2D, 1e-9, layer=layer)
 
-        self.gds_object_instances[name] = poly1
-        self.cell.add(poly1)
+        self._add(name, poly1, recipe)
 
     def rect(self, pos, size, **kwargs):
         pos, size = parse_entry(pos, size)
@@ -111,24 +317,25 @@ class GdsModeler:
             (pos[0] + size[0], pos[1] + size[1]),
             (pos[0], pos[1] + size[1]),
         ]
-        poly1 = gdspy.Polygon(points, layer)
+        recipe = PolygonRecipe(points, layer)
+        poly1 = gdspy.Polygon(val(points), layer)
 
-        self.gds_object_instances[name] = poly1
-        self.cell.add(poly1)
+        self._add(name, poly1, recipe)
 
     def text(self, pos, size, text, angle, horizontal, **kwargs):
         pos, size = parse_entry(pos, size)
         name = kwargs["name"]
         layer = kwargs["layer"]
+        recipe = TextRecipe(text, size, pos, horizontal, angle, layer)
+        pos, size = val(pos, size)
 
         poly1 = gdspy.Text(text, size, pos, horizontal=horizontal, angle=angle, layer=layer)
 
-        self.gds_object_instances[name] = poly1
-        self.cell.add(poly1)
+        self._add(name, poly1, recipe)
 
     def rect_center(self, pos, size, **kwargs):
         pos, size = parse_entry(pos, size)
-        corner_pos = [val(p) - val(s) / 2 for p, s in zip(pos, size)]
+        corner_pos = [p - s / 2 for p, s in zip(pos, size)]
         self.rect(corner_pos, size, **kwargs)
 
     def cylinder(self, pos, radius, height, axis, **kwargs):
@@ -139,6 +346,8 @@ class GdsModeler:
         name = kwargs["name"]
         layer = kwargs["layer"]
         assert axis == "Z", "axis must be 'Z' for the gdsModeler"
+        recipe = RoundRecipe(pos, radius, layer, number_of_points=number_of_points)
+        pos, radius = val(pos, radius)
         round1 = gdspy.Round(
             (pos[0], pos[1]),
             radius,
@@ -146,11 +355,10 @@ class GdsModeler:
             tolerance=TOLERANCE,
             number_of_points=number_of_points,
         )
-        self.gds_object_instances[name] = round1
-        self.cell.add(round1)
+        self._add(name, round1, recipe)
 
     def wirebond(self, pos, ori, ymax, ymin, height="0.1mm", **kwargs):  # ori should be normed
-        bond_diam = "20um"
+        bond_diam = BOND_DIAMETER
         pos, ori, ymax, ymin, heigth, bond_diam = parse_entry(
             (pos, ori, ymax, ymin, height, bond_diam)
         )
@@ -173,6 +381,18 @@ class GdsModeler:
             number_of_points=6,
         )
         
+    def bonds(self, ends, n_bonds, ymax, ymin, part, **kwargs):
+        """
+        All the bonds of a part (see bond_polygons) along the segments ends,
+        drawn as a single PolygonSet.
+        """
+        name = kwargs["name"]
+        layer = kwargs["layer"]
+        recipe = BondsRecipe(ends, n_bonds, ymax, ymin, part, layer)
+        values = [[val(end)[:2] for end in segment] for segment in ends]
+        polygons = bond_polygons(values, n_bonds, part, val(ymax), val(ymin))
+        self._add(name, gdspy.PolygonSet(list(polygons), layer), recipe)
+
     # def airbridge(self, pos, ori, ymax, ymin, height="0.1mm", **kwargs):  # ori should be normed
     #     ## NOT WORKING ##
     #     width = 20e-6
@@ -203,6 +423,10 @@ class GdsModeler:
 
 
     def path(self, points, port, fillet, name="", corner="circular bend"):
+        recipe = CableRecipe(points, port.widths, port.offsets, fillet, corner)
+        points = val(points)
+        fillet = val(fillet)
+        port = port.val()
 
         # TODO, this is a dirty fixe cause of Vector3D
 
@@ -233,50 +457,57 @@ class GdsModeler:
             current_name = name + "_" + port.subnames[ii]
             names.append(current_name)
             layers.append(port.layers[ii])
-            self.gds_object_instances[current_name] = poly
-            self.cell.add(poly)
+            self._add(current_name, poly, CablePartRecipe(recipe, ii, port.layers[ii]))
         return names, layers
 
     def connect_faces(self, entity1, entity2):
         pass
 
     def delete(self, entity):
-        self.cell.polygons.remove(self.gds_object_instances[entity.name])
+        self._remove(self.gds_object_instances[entity.name])
         self.gds_object_instances.pop(entity.name)
+        self.recipes.pop(entity.name)
+        self.recipe_cells.pop(entity.name)
 
     def rename_entity(self, entity, name):
         polygon = self.gds_object_instances.pop(entity.name)
         self.gds_object_instances[name] = polygon
 
+    def _boolean(self, blank, tools, operation, layer):
+        if self.tiling is None:
+            return gdspy.boolean(
+                blank, tools, operation, precision=TOLERANCE, max_points=0, layer=layer
+            )
+        polygons = {"blank": object_polygons(blank), "tools": tools.polygons}
+        result = layer_polygons((operation, "blank", "tools"), polygons, **self.tiling)
+        if not result:
+            return None
+        return gdspy.PolygonSet(result, layer=layer)
+
     def unite(self, entities, keep_originals=True):
 
         blank_entity = entities.pop(0)
         blank_polygon = self.gds_object_instances.pop(blank_entity.name)
         self.cell = self.gds_cells[blank_entity.body.name]
-        self.cell.polygons.remove(blank_polygon)
+        self._remove(blank_polygon)
 
         tool_polygons = []
         for tool_entity in entities:
-            tool_polygon = self.gds_object_instances[tool_entity.name]
-            if isinstance(tool_polygon, gdspy.PolygonSet):
-                for polygon in tool_polygon.polygons:
-                    tool_polygons.append(polygon)
-            else:
-                tool_polygons.append(tool_polygon)
+            # paths and references contribute the polygons they draw
+            tool_polygons += object_polygons(self.gds_object_instances[tool_entity.name])
 
         # 2 unite operation
         tool_polygon_set = gdspy.PolygonSet(tool_polygons, layer=blank_entity.layer)
-        united = gdspy.boolean(
-            blank_polygon,
-            tool_polygon_set,
+        united = self._boolean(blank_polygon, tool_polygon_set, "or", blank_entity.layer)
+
+        recipe = BooleanRecipe(
             "or",
-            precision=TOLERANCE,
-            max_points=0,
-            layer=blank_entity.layer,
+            self.recipes[blank_entity.name],
+            [self.recipes[tool_entity.name] for tool_entity in entities],
+            blank_entity.layer,
+            tiling=self.tiling,
         )
-
-        self.gds_object_instances[blank_entity.name] = united
-        self.cell.add(united)
+        self._add(blank_entity.name, united, recipe)
 
         return blank_entity
 
@@ -294,31 +525,26 @@ class GdsModeler:
             self.cell = self.gds_cells[
                 blank_entity.body.name
             ]  # assumes blank and tool are in same body
-            self.cell.polygons.remove(blank_polygon)
+            self._remove(blank_polygon)
 
             tool_polygons = []
             for tool_entity in tool_entities:
-                tool_polygon = self.gds_object_instances[tool_entity.name]
-                if isinstance(tool_polygon, gdspy.PolygonSet):
-                    for polygon in tool_polygon.polygons:
-                        tool_polygons.append(polygon)
-                else:
-                    tool_polygons.append(tool_polygon)
+                # paths and references contribute the polygons they draw
+                tool_polygons += object_polygons(self.gds_object_instances[tool_entity.name])
 
             # 2 subtract operation
             tool_polygon_set = gdspy.PolygonSet(tool_polygons, layer=blank_entity.layer)
-            subtracted = gdspy.boolean(
-                blank_polygon,
-                tool_polygon_set,
+            subtracted = self._boolean(blank_polygon, tool_polygon_set, "not", blank_entity.layer)
+            recipe = BooleanRecipe(
                 "not",
-                precision=TOLERANCE,
-                max_points=0,
-                layer=blank_entity.layer,
+                self.recipes[blank_entity.name],
+                [self.recipes[tool_entity.name] for tool_entity in tool_entities],
+                blank_entity.layer,
+                tiling=self.tiling,
             )
             if subtracted is not None:
                 # 3 At last we update the cell and the gds_object_instance
-                self.gds_object_instances[blank_entity.name] = subtracted
-                self.cell.add(subtracted)
+                self._add(blank_entity.name, subtracted, recipe)
             else:
                 print(
                     "Warning: the entity %s was fully \
@@ -326,10 +552,52 @@ class GdsModeler:
                     % blank_entity.name
                 )
                 dummy = gdspy.Polygon([[0, 0]])
-                self.gds_object_instances[blank_entity.name] = dummy
-                self.cell.add(dummy)
+                self._add(blank_entity.name, dummy, recipe)
                 blank_entity.delete()
 
+    def layer_boolean(self, tree, entities, tile_size, **kwargs):
+        """
+        Draws the result of a layer expression in the current cell.
+        tree: layer expression, see Modeler.layer_boolean
+        entities: {layer: [entities]} operands of the expression
+        """
+        name = kwargs["name"]
+        layer = kwargs["layer"]
+        polygons = {}
+        for operand_layer, operand_entities in entities.items():
+            polygons[operand_layer] = []
+            for entity in operand_entities:
+                polygons[operand_layer] += list(self._polygons(entity))
+        tiling = dict(self.tiling or {})
+        if tile_size is not None:
+            tiling["tile_size"] = tile_size
+        result = gdspy.PolygonSet(layer_polygons(tree, polygons, **tiling), layer=layer)
+        recipe = LayerBooleanRecipe(
+            tree,
+            {
+                operand_layer: [self.recipes[entity.name] for entity in operand_entities]
+                for operand_layer, operand_entities in entities.items()
+            },
+            tiling,
+            layer,
+        )
+        self._add(name, result, recipe)
+
+    def offset_layers(self, entities, distance, **kwargs):
+        """
+        Draws the union of the entities grown by distance (shrunk if
+        negative) in the current cell, with a single offset.
+        """
+        name = kwargs["name"]
+        layer = kwargs["layer"]
+        distance = parse_entry(distance)
+        polygons = []
+        for entity in entities:
+            polygons += list(self._polygons(entity))
+        result = gdspy.PolygonSet(offset_polygons(polygons, val(distance)), layer=layer)
+        recipe = OffsetRecipe([self.recipes[entity.name] for entity in entities], distance, layer)
+        self._add(name, result, recipe)
+
     def assign_material(self, *args, **kwargs):
         pass
 
@@ -358,7 +626,10 @@ class GdsModeler:
         pass
 
     def fillet(self, entity, radius, vertex_indices=None):
-        polygon = self.gds_object_instances[entity.name]
+        polygon = self._flatten(entity)
+        radius = parse_entry(radius)
+        self.recipes[entity.name] = FilletRecipe(self.recipes[entity.name], radius, vertex_indices)
+        radius = val(radius)
         if vertex_indices is None:
             polygon.fillet(radius, max_points=0)
         else:
@@ -411,11 +682,12 @@ class GdsModeler:
         """vector is 3-dimentional but with a z=0 component"""
         if not isinstance(entities, list):
             entities = [entities]
-        translation_vector = [vector[0], vector[1]]
+        translation_vector = val([vector[0], vector[1]])
         for entity in entities:
             # if entity!=None:
             gds_entity = self.gds_object_instances[entity.name]
             gds_entity.translate(*translation_vector)
+            self.recipes[entity.name] = TranslateRecipe(self.recipes[entity.name], vector)
 
     def rotate(self, entities, angle, center=None):
         if center is None:
@@ -426,12 +698,28 @@ class GdsModeler:
         for entity in entities:
             # if entity!=None:
             gds_entity = self.gds_object_instances[entity.name]
-            gds_entity.rotate(angle / 360 * 2 * np.pi, center=(val(center[0]), val(center[1])))
+            if isinstance(gds_entity, REFERENCES):
+                # the origin turns around center and the cell around the origin
+                radians = val(angle) / 360 * 2 * np.pi
+                x, y = val(center[0]), val(center[1])
+                dx, dy = gds_entity.origin[0] - x, gds_entity.origin[1] - y
+                gds_entity.origin = (
+                    x + dx * np.cos(radians) - dy * np.sin(radians),
+                    y + dx * np.sin(radians) + dy * np.cos(radians),
+                )
+                gds_entity.rotation = (gds_entity.rotation or 0) + val(angle)
+            else:
+                gds_entity.rotate(
+                    val(angle) / 360 * 2 * np.pi, center=(val(center[0]), val(center[1]))
+                )
+            self.recipes[entity.name] = RotateRecipe(self.recipes[entity.name], angle, center)
 
     def rect_array(self, pos, size, columns, rows, spacing, origin=(0, 0), **kwargs):
-        pos, size = parse_entry(pos, size)
+        pos, size, spacing = parse_entry(pos, size, spacing)
         name = kwargs["name"]
         layer = kwargs["layer"]
+        recipe = ArrayRecipe(pos, size, columns, rows, spacing, layer)
+        pos, size, spacing = val(pos, size, spacing)
         points = [
             (pos[0], pos[1]),
             (pos[0] + size[0], pos[1] + 0),
@@ -440,17 +728,102 @@ class GdsModeler:
         ]
         poly1 = gdspy.Polygon(points, layer)
 
-        self.gds_object_instances[name] = poly1
-
-        cell_to_copy = gdspy.Cell("cell_to_copy_"+name)
-        self.gds_cells["cell_to_copy_"+name] = cell_to_copy
+        cell_to_copy = gdspy.Cell("cell_to_copy_"+name, exclude_from_current=True)
+        self.component_cells[cell_to_copy.name] = cell_to_copy
+        self.array_cells[cell_to_copy.name] = 0
         cell_to_copy.add(poly1)
 
-        spacing = parse_entry(spacing)
-
+        # the array is kept as a reference, see component
         cell_array = gdspy.CellArray(cell_to_copy, columns, rows, spacing, origin)
-        polygon_list = cell_array.get_polygons()
-        poly2 = gdspy.PolygonSet(polygon_list, layer)
-        self.cell.add(poly2)
-
-        self.gds_object_instances[name] = poly2
+        self._add(name, cell_array, recipe)
+
+    def component(self, body):
+        """
+        Moves the objects drawn in the cell of body into one new cell per
+        layer, named body.name + "_layer%d", to be placed with reference.
+        """
+        self.gds_cells.pop(body.name)
+        for layer, entities in body.entities.items():
+            if not entities:
+                continue
+            cell = gdspy.Cell("%s_layer%d" % (body.name, layer), exclude_from_current=True)
+            recipes = []
+            for entity in entities:
+                cell.add(self.gds_object_instances.pop(entity.name))
+                self.recipe_cells.pop(entity.name)
+                recipes.append(self.recipes.pop(entity.name))
+            self.component_cells[cell.name] = cell
+            self.component_recipes[cell.name] = ComponentRecipe(recipes, layer)
+
+    def cheese(self, region, keepouts, hole_size, pitch, keepout_margin, **kwargs):
+        """
+        Holes of hole_size on the lattice of pitch (aligned on the origin)
+        inside region and keepout_margin away from its border and from the
+        keepouts entities.
+        The holes are placed by one CellArray per block of the lattice, in
+        a cell referenced once. Returns the number of holes.
+        """
+        name = kwargs["name"]
+        layer = kwargs["layer"]
+        hole_size, pitch, keepout_margin = parse_entry(hole_size, pitch, keepout_margin)
+        recipe_values = (hole_size, pitch)
+        hole_size, pitch, keepout_margin = val(hole_size, pitch, keepout_margin)
+
+        # the hole centers are inside region shrunk by, and outside of the
+        # keepouts grown by, keepout_margin and half a hole
+        inner = gdspy.offset(
+            self._polygons(region),
+            -keepout_margin - hole_size / 2,
+            join="miter",
+            precision=TOLERANCE,
+            max_points=0,
+        )
+        box = self.gds_object_instances[region.name].get_bounding_box()
+        if inner is None or box is None:
+            blocks = np.zeros((0, 4), dtype=int)
+        else:
+            first = np.ceil(box[0] / pitch).astype(int)
+            last = np.floor(box[1] / pitch).astype(int)
+            xs = np.arange(first[0], last[0] + 1) * pitch
+            ys = np.arange(first[1], last[1] + 1) * pitch
+            mask = lattice_inside(inner.polygons, xs, ys)
+            polygons = []
+            for entity in keepouts:
+                polygons += self._polygons(entity)
+            outer = gdspy.offset(
+                polygons,
+                keepout_margin + hole_size / 2,
+                join="miter",
+                precision=TOLERANCE,
+                max_points=0,
+            )
+            if outer is not None:
+                mask &= ~lattice_inside(outer.polygons, xs, ys)
+            blocks = lattice_blocks(mask)
+            blocks[:, :2] += first[::-1]  # lattice indices (row, column) of the origin
+
+        hole_cell = gdspy.Cell(name + "_hole", exclude_from_current=True)
+        hole = rect_polygons(np.zeros((1, 2)), np.full((1, 2), hole_size))[0]
+        hole_cell.add(gdspy.Polygon(hole, layer))
+        cell = gdspy.Cell(name + "_holes", exclude_from_current=True)
+        for row, column, n_rows, n_columns in blocks:
+            cell.add(
+                gdspy.CellArray(
+                    hole_cell, n_columns, n_rows, (pitch, pitch), (column * pitch, row * pitch)
+                )
+            )
+        self.component_cells[hole_cell.name] = hole_cell
+        self.component_cells[cell.name] = cell
+        recipe = CheeseRecipe(blocks, recipe_values[0], recipe_values[1], layer)
+        self._add(name, gdspy.CellReference(cell), recipe)
+        return int(np.sum(blocks[:, 2] * blocks[:, 3]))
+
+    def reference(self, cell_name, pos, angle, **kwargs):
+        """Places the component cell cell_name at pos, rotated by angle (degrees)."""
+        name = kwargs["name"]
+        recipe = ReferenceRecipe(self.component_recipes[cell_name], pos, angle)
+        pos, angle = val(pos, angle)
+        reference = gdspy.CellReference(
+            self.component_cells[cell_name], (pos[0], pos[1]), rotation=angle
+        )
+        self._add(name, reference, recipe)
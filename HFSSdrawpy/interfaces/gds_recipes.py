@@ -0,0 +1,640 @@
+"""
+Symbolic description of the gds geometry.
+
+Each entity drawn by the GdsModeler keeps a recipe: the tree of operations
+(primitives, translations, rotations, booleans, fillets) that produced its
+polygons, with the sympy expressions of its arguments. Coordinates are
+lambdified once per primitive, so that the geometry can be re-evaluated for
+new variable values without re-running the drawing script. The values given
+to the recipes are numpy arrays (one value per sweep point) and each
+primitive evaluates all of its coordinates for all points in a single call.
+
+Note that the decisions taken on the nominal values while drawing (number of
+meanders, path corners...) are frozen: only the coordinates are re-evaluated.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import gdspy
+import numpy as np
+import sympy
+
+from ..parameters import AIRBRIDGE, BOND_DIAMETER
+
+TOLERANCE = 1e-9  # for arcs
+
+
+class Environment(dict):
+    """
+    {symbol: array of n values}. The variables that are not given are taken
+    from variables, resolving those defined as expressions of other ones.
+    """
+
+    def __init__(self, values, variables, n):
+        super().__init__(values)
+        self.variables = variables
+        self.n = n
+
+    def __missing__(self, symbol):
+        if symbol not in self.variables:
+            raise ValueError("No value for the variable %s" % symbol)
+        value = self.variables[symbol]
+        if isinstance(value, sympy.Basic) and value.free_symbols:
+            symbols = sorted(value.free_symbols, key=str)
+            value = sympy.lambdify(symbols, value, "numpy")(*[self[symbol] for symbol in symbols])
+        self[symbol] = np.broadcast_to(np.asarray(value, dtype=float), (self.n,))
+        return self[symbol]
+
+
+class Coordinates:
+    """
+    Array (of any shape) of sympy expressions or floats evaluated numerically
+    by a single lambdified function.
+    """
+
+    def __init__(self, exprs):
+        exprs = np.array(exprs, dtype=object)
+        self.shape = exprs.shape
+        flat = [sympy.sympify(expr) for expr in exprs.ravel()]
+        self.symbols = sorted(set().union(*[expr.free_symbols for expr in flat]), key=str)
+        if self.symbols:
+            self.function = sympy.lambdify(self.symbols, flat, "numpy")
+        else:
+            self.constant = np.array([float(expr) for expr in flat]).reshape(self.shape)
+        self._memo = (None, None)
+
+    def __call__(self, env):
+        """
+        env: Environment
+        returns an array of shape self.shape + (env.n,)
+        """
+        if self._memo[0] is env:
+            return self._memo[1]
+        n = env.n
+        if self.symbols:
+            values = self.function(*[env[symbol] for symbol in self.symbols])
+            result = np.empty((len(values), n))
+            for ii, value in enumerate(values):
+                result[ii] = value
+            result = result.reshape(self.shape + (n,))
+        else:
+            result = np.repeat(self.constant[..., np.newaxis], n, axis=-1)
+        self._memo = (env, result)
+        return result
+
+
+def _coordinates(exprs):
+    # points given as Vectors (3D) are brought back to 2D
+    return Coordinates([[point[0], point[1]] for point in exprs])
+
+
+class Recipe:
+    def __init__(self, layer):
+        self.layer = layer
+
+    def build(self, env, index):
+        """Returns a new gdspy object for the index-th values of env."""
+        raise NotImplementedError()
+
+
+class PolygonRecipe(Recipe):
+    def __init__(self, points, layer, closed=True):
+        super().__init__(layer)
+        self.points = _coordinates(points)
+        self.closed = closed
+
+    def build(self, env, index):
+        points = self.points(env)[..., index]
+        if self.closed:
+            return gdspy.Polygon(points, layer=self.layer)
+        return gdspy.FlexPath(points, 1e-9, layer=self.layer)
+
+
+def built_polygons(recipe, env, index):
+    """
+    Polygons of the object built by recipe: an open polyline is a
+    gdspy.FlexPath, which gives its polygons through to_polygonset.
+    """
+    built = recipe.build(env, index)
+    if isinstance(built, gdspy.FlexPath):
+        built = built.to_polygonset()
+        if built is None:
+            return []
+    return built.polygons
+
+
+class RoundRecipe(Recipe):
+    def __init__(self, center, radius, layer, number_of_points=None):
+        super().__init__(layer)
+        self.values = Coordinates([center[0], center[1], radius])
+        self.number_of_points = number_of_points
+
+    def build(self, env, index):
+        x, y, radius = self.values(env)[..., index]
+        return gdspy.Round(
+            (x, y),
+            radius,
+            layer=self.layer,
+            tolerance=TOLERANCE,
+            number_of_points=self.number_of_points,
+        )
+
+
+class TextRecipe(Recipe):
+    def __init__(self, text, size, pos, horizontal, angle, layer):
+        super().__init__(layer)
+        self.text = text
+        self.values = Coordinates([size, pos[0], pos[1]])
+        self.horizontal = horizontal
+        self.angle = angle
+
+    def build(self, env, index):
+        size, x, y = self.values(env)[..., index]
+        return gdspy.Text(
+            self.text, size, (x, y), horizontal=self.horizontal, angle=self.angle, layer=self.layer
+        )
+
+
+class ArrayRecipe(Recipe):
+    def __init__(self, pos, size, columns, rows, spacing, layer):
+        super().__init__(layer)
+        self.values = Coordinates([pos[0], pos[1], size[0], size[1], spacing[0], spacing[1]])
+        self.columns = columns
+        self.rows = rows
+
+    def build(self, env, index):
+        x, y, size_x, size_y, spacing_x, spacing_y = self.values(env)[..., index]
+        corners = np.array([[x, y], [x + size_x, y], [x + size_x, y + size_y], [x, y + size_y]])
+        offsets = np.stack(
+            np.meshgrid(np.arange(self.columns) * spacing_x, np.arange(self.rows) * spacing_y),
+            axis=-1,
+        ).reshape(-1, 1, 2)
+        return gdspy.PolygonSet(list(corners + offsets), layer=self.layer)
+
+
+def bond_positions(ends, n_bonds):
+    """
+    ends: array (n_segments, 2, 2) of the ends of the segments to bond
+    n_bonds: number of bonds on each segment
+    Returns the positions and the directions, arrays (n, 2), of the bonds
+    evenly spaced along the segments (half a spacing at both ends).
+    """
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2, 2)
+    n_bonds = np.asarray(n_bonds, dtype=int)
+    starts = ends[:, 0]
+    vectors = ends[:, 1] - starts
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    # the segments are along x or y
+    along_x = np.abs(vectors[:, 0]) >= np.abs(vectors[:, 1])
+    oris = np.where(along_x[:, np.newaxis], [1.0, 0.0], [0.0, 1.0]) * np.sign(vectors)
+    segments = np.repeat(np.arange(len(n_bonds)), n_bonds)
+    ranks = np.arange(len(segments)) - np.repeat(np.cumsum(n_bonds) - n_bonds, n_bonds)
+    distances = (ranks + 0.5) * (lengths / np.maximum(n_bonds, 1))[segments]
+    return starts[segments] + oris[segments] * distances[:, np.newaxis], oris[segments]
+
+
+def rect_polygons(centers, sizes):
+    """Array (n, 4, 2) of the rectangles, with the corners in the order of GdsModeler.rect."""
+    corners = centers - sizes / 2
+    zeros = np.zeros(len(sizes))
+    steps = np.stack(
+        [
+            np.zeros_like(sizes),
+            np.stack([sizes[:, 0], zeros], axis=-1),
+            sizes,
+            np.stack([zeros, sizes[:, 1]], axis=-1),
+        ],
+        axis=1,
+    )
+    return corners[:, np.newaxis] + steps
+
+
+def bond_polygons(ends, n_bonds, part, ymax=0, ymin=0):
+    """
+    Polygons, array (n, k, 2), of all the bonds along the segments.
+    part: "bridge" (airbridge body), "feet" (airbridge feet) or "wire" (wire
+    bond pads, hexagons as drawn by GdsModeler.wirebond)
+    """
+    positions, oris = bond_positions(ends, n_bonds)
+    orths = np.stack([-oris[:, 1], oris[:, 0]], axis=-1)
+    if part == "bridge":
+        return rect_polygons(positions, oris * AIRBRIDGE["width"] + orths * AIRBRIDGE["length"])
+    if part == "feet":
+        shift = orths * (AIRBRIDGE["gap"] + (AIRBRIDGE["track"] + AIRBRIDGE["foot_width"]) / 2)
+        size = oris * AIRBRIDGE["foot_length"] + orths * AIRBRIDGE["foot_width"]
+        feet = [rect_polygons(positions + shift, size), rect_polygons(positions - shift, size)]
+    elif part == "wire":
+        angles = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+        hexagon = BOND_DIAMETER / 2 * np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+        feet = [
+            (positions + orths * (ymax + 2 * BOND_DIAMETER))[:, np.newaxis] + hexagon,
+            (positions + orths * (ymin - 2 * BOND_DIAMETER))[:, np.newaxis] + hexagon,
+        ]
+    else:
+        raise ValueError("Unknown bond part %s, should be bridge, feet or wire" % part)
+    # both feet of a bond follow each other
+    return np.stack(feet, axis=1).reshape(-1, feet[0].shape[1], 2)
+
+
+class BondsRecipe(Recipe):
+    """
+    All the bonds of one layer along a cable: only the ends of the segments
+    and ymax, ymin are re-evaluated, the number of bonds is frozen.
+    """
+
+    def __init__(self, ends, n_bonds, ymax, ymin, part, layer):
+        super().__init__(layer)
+        self.ends = Coordinates([[end[0], end[1]] for segment in ends for end in segment])
+        self.values = Coordinates([ymax, ymin])
+        self.n_bonds = n_bonds
+        self.part = part
+
+    def build(self, env, index):
+        ends = self.ends(env)[..., index]
+        ymax, ymin = self.values(env)[..., index]
+        polygons = bond_polygons(ends, self.n_bonds, self.part, ymax, ymin)
+        return gdspy.PolygonSet(list(polygons), layer=self.layer)
+
+
+def lattice_inside(polygons, xs, ys):
+    """
+    Boolean array (len(ys), len(xs)): whether the points of the lattice
+    xs x ys (sorted) are inside the polygons, with the even-odd rule. Each
+    edge toggles the lattice rows it crosses, right of the crossing.
+    """
+    toggles = np.zeros((len(ys), len(xs) + 1), dtype=np.int8)
+    if len(polygons) == 0 or len(xs) == 0 or len(ys) == 0:
+        return toggles[:, :-1].astype(bool)
+    polygons = [np.asarray(polygon, dtype=float) for polygon in polygons]
+    starts = np.concatenate(polygons)
+    ends = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in polygons])
+    low = np.minimum(starts[:, 1], ends[:, 1])
+    high = np.maximum(starts[:, 1], ends[:, 1])
+    # rows crossed by each edge: low <= y < high
+    first = np.searchsorted(ys, low, side="left")
+    last = np.searchsorted(ys, high, side="left")
+    counts = last - first
+    edges = np.repeat(np.arange(len(starts)), counts)
+    rows = np.arange(len(edges)) - np.repeat(np.cumsum(counts) - counts, counts) + first[edges]
+    x0, y0 = starts[edges, 0], starts[edges, 1]
+    x1, y1 = ends[edges, 0], ends[edges, 1]
+    crossings = x0 + (ys[rows] - y0) * (x1 - x0) / (y1 - y0)
+    columns = np.searchsorted(xs, crossings, side="left")
+    np.add.at(toggles, (rows, columns), 1)
+    return (np.cumsum(toggles[:, :-1], axis=1) % 2).astype(bool)
+
+
+def lattice_blocks(mask):
+    """
+    Covers the True cells of mask (rows, columns) with rectangular blocks,
+    array (n, 4) of first row, first column, number of rows and of columns:
+    the runs of each row, merged with the identical runs of the next rows.
+    """
+    steps = np.diff(np.pad(mask.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    rows, starts = np.nonzero(steps == 1)
+    ends = np.nonzero(steps == -1)[1]
+    order = np.lexsort((rows, ends, starts))
+    rows, starts, ends = rows[order], starts[order], ends[order]
+    new = np.ones(len(rows), dtype=bool)
+    new[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1]) | (rows[1:] != rows[:-1] + 1)
+    first = np.nonzero(new)[0]
+    n_rows = np.diff(np.append(first, len(rows)))
+    return np.stack([rows[first], starts[first], n_rows, ends[first] - starts[first]], axis=-1)
+
+
+class CheeseRecipe(Recipe):
+    """
+    Holes on the lattice of pitch, the blocks of holes (see lattice_blocks,
+    with the lattice indices of their first hole) are frozen.
+    """
+
+    def __init__(self, blocks, hole_size, pitch, layer):
+        super().__init__(layer)
+        self.blocks = blocks
+        self.values = Coordinates([hole_size, pitch])
+
+    def build(self, env, index):
+        hole_size, pitch = self.values(env)[..., index]
+        if len(self.blocks) == 0:
+            return gdspy.PolygonSet([], layer=self.layer)
+        rows, columns = [], []
+        for row, column, n_rows, n_columns in self.blocks:
+            grid = np.meshgrid(np.arange(row, row + n_rows), np.arange(column, column + n_columns))
+            rows.append(grid[0].ravel())
+            columns.append(grid[1].ravel())
+        centers = np.stack([np.concatenate(columns), np.concatenate(rows)], axis=-1) * pitch
+        sizes = np.full(centers.shape, hole_size)
+        return gdspy.PolygonSet(list(rect_polygons(centers, sizes)), layer=self.layer)
+
+
+class CableRecipe:
+    """Shared by the entities (one per port subname) of a cable."""
+
+    def __init__(self, points, widths, offsets, fillet, corner):
+        self.points = _coordinates(points)
+        self.values = Coordinates(list(widths) + list(offsets) + [fillet])
+        self.n_widths = len(widths)
+        self.corner = corner
+        self._memo = (None, None, None)
+
+    def polygons(self, env, index):
+        if self._memo[0] is env and self._memo[1] == index:
+            return self._memo[2]
+        points = self.points(env)[..., index]
+        values = self.values(env)[..., index]
+        widths = values[: self.n_widths]
+        offsets = values[self.n_widths : 2 * self.n_widths]
+        cable = gdspy.FlexPath(
+            points,
+            list(widths),
+            offset=list(offsets),
+            corners=self.corner,
+            bend_radius=values[-1],
+            gdsii_path=False,
+            tolerance=TOLERANCE,
+            layer=list(range(self.n_widths)),
+            max_points=0,
+        )
+        polygons = cable.get_polygons()
+        self._memo = (env, index, polygons)
+        return polygons
+
+
+class CablePartRecipe(Recipe):
+    def __init__(self, cable, part, layer):
+        super().__init__(layer)
+        self.cable = cable
+        self.part = part
+
+    def build(self, env, index):
+        polygon = gdspy.Polygon(self.cable.polygons(env, index)[self.part])
+        polygon.layers = [self.layer]
+        return polygon
+
+
+class ComponentRecipe:
+    """Recipes of the objects of a component cell, shared by its references."""
+
+    def __init__(self, recipes, layer):
+        self.recipes = recipes
+        self.layer = layer
+        self._memo = (None, None, None)
+
+    def polygons(self, env, index):
+        if self._memo[0] is env and self._memo[1] == index:
+            return self._memo[2]
+        polygons = []
+        for recipe in self.recipes:
+            polygons += built_polygons(recipe, env, index)
+        self._memo = (env, index, polygons)
+        return polygons
+
+
+class ReferenceRecipe(Recipe):
+    """A reference to a component cell, rebuilt as flat polygons."""
+
+    def __init__(self, component, pos, angle):
+        super().__init__(component.layer)
+        self.component = component
+        self.values = Coordinates([pos[0], pos[1], angle])
+
+    def build(self, env, index):
+        x, y, angle = self.values(env)[..., index]
+        polygons = gdspy.PolygonSet(self.component.polygons(env, index), layer=self.layer)
+        return polygons.rotate(angle / 360 * 2 * np.pi).translate(x, y)
+
+
+class TranslateRecipe(Recipe):
+    def __init__(self, recipe, vector):
+        super().__init__(recipe.layer)
+        self.recipe = recipe
+        self.vector = Coordinates([vector[0], vector[1]])
+
+    def build(self, env, index):
+        return self.recipe.build(env, index).translate(*self.vector(env)[..., index])
+
+
+class RotateRecipe(Recipe):
+    def __init__(self, recipe, angle, center):
+        super().__init__(recipe.layer)
+        self.recipe = recipe
+        self.values = Coordinates([angle, center[0], center[1]])
+
+    def build(self, env, index):
+        angle, x, y = self.values(env)[..., index]
+        return self.recipe.build(env, index).rotate(angle / 360 * 2 * np.pi, center=(x, y))
+
+
+class BooleanRecipe(Recipe):
+    def __init__(self, operation, blank, tools, layer, tiling=None):
+        super().__init__(layer)
+        self.operation = operation
+        self.blank = blank
+        self.tools = tools
+        self.tiling = tiling  # keyword arguments of layer_polygons
+
+    def build(self, env, index):
+        tool_polygons = []
+        for tool in self.tools:
+            tool_polygons += built_polygons(tool, env, index)
+        blank = built_polygons(self.blank, env, index)
+        if self.tiling is not None:
+            polygons = {"blank": blank, "tools": tool_polygons}
+            result = layer_polygons((self.operation, "blank", "tools"), polygons, **self.tiling)
+            return gdspy.PolygonSet(result, layer=self.layer)
+        result = gdspy.boolean(
+            gdspy.PolygonSet(blank, layer=self.layer),
+            gdspy.PolygonSet(tool_polygons, layer=self.layer),
+            self.operation,
+            precision=TOLERANCE,
+            max_points=0,
+            layer=self.layer,
+        )
+        if result is None:
+            return gdspy.PolygonSet([], layer=self.layer)
+        return result
+
+
+def _evaluate(tree, polygons):
+    # tree: a key of polygons or a tuple (operation, left, right)
+    if not isinstance(tree, tuple):
+        return polygons.get(tree, [])
+    operation, left, right = tree
+    result = gdspy.boolean(
+        _evaluate(left, polygons),
+        _evaluate(right, polygons),
+        operation,
+        precision=TOLERANCE,
+        max_points=0,
+    )
+    return [] if result is None else result.polygons
+
+
+def _evaluate_tile(tree, polygons, low, high):
+    # evaluation clipped to the tile [low, high], run by the worker processes
+    result = _evaluate(tree, polygons)
+    if not result:
+        return []
+    clipped = gdspy.boolean(
+        result, gdspy.Rectangle(low, high), "and", precision=TOLERANCE, max_points=0
+    )
+    return [] if clipped is None else clipped.polygons
+
+
+def _tiles(polygons, tile_size):
+    # (polygons overlapping the tile, low, high) for the tiles covering the
+    # bounding box of all polygons, and the coordinates of the seams
+    boxes = {}
+    for key, key_polygons in polygons.items():
+        if len(key_polygons) > 0:
+            boxes[key] = (
+                np.array([polygon.min(axis=0) for polygon in key_polygons]),
+                np.array([polygon.max(axis=0) for polygon in key_polygons]),
+            )
+    if not boxes:
+        return [], ([], [])
+    lows = np.min([mins.min(axis=0) for mins, _ in boxes.values()], axis=0)
+    highs = np.max([maxs.max(axis=0) for _, maxs in boxes.values()], axis=0)
+    n_tiles = np.maximum(np.ceil((highs - lows) / tile_size), 1).astype(int)
+    tiles = []
+    for ii in range(n_tiles[0]):
+        for jj in range(n_tiles[1]):
+            low = lows + tile_size * np.array([ii, jj])
+            high = low + tile_size
+            tile_polygons = {}
+            for key, (mins, maxs) in boxes.items():
+                overlap = np.all((mins <= high) & (maxs >= low), axis=1)
+                tile_polygons[key] = [polygons[key][kk] for kk in np.flatnonzero(overlap)]
+            tiles.append((tile_polygons, low, high))
+    seams = [lows[axis] + tile_size * np.arange(1, n_tiles[axis]) for axis in range(2)]
+    return tiles, seams
+
+
+def _merge_seams(polygons, seams):
+    # unites the polygons touching a seam, the others are left untouched
+    if not polygons:
+        return polygons
+    mins = np.array([polygon.min(axis=0) for polygon in polygons]) - TOLERANCE
+    maxs = np.array([polygon.max(axis=0) for polygon in polygons]) + TOLERANCE
+    touching = np.zeros(len(polygons), dtype=bool)
+    for axis in range(2):
+        crossed = np.searchsorted(seams[axis], mins[:, axis]) != np.searchsorted(
+            seams[axis], maxs[:, axis]
+        )
+        touching |= crossed
+    if not touching.any():
+        return polygons
+    merged = gdspy.boolean(
+        [polygons[kk] for kk in np.flatnonzero(touching)],
+        [],
+        "or",
+        precision=TOLERANCE,
+        max_points=0,
+    )
+    kept = [polygons[kk] for kk in np.flatnonzero(~touching)]
+    return kept + ([] if merged is None else merged.polygons)
+
+
+def layer_polygons(tree, polygons, tile_size=None, processes=1, merge=False):
+    """
+    Evaluates a boolean expression on groups of polygons, with one boolean
+    pass per operation on whole groups.
+    tree: a key of polygons or a tuple (operation, left, right)
+    polygons: {key: list of polygons}, e.g. the polygons of each layer
+    tile_size: if given, the plane is cut in square tiles which are evaluated
+               on the polygons they overlap only, and clipped to the tile
+    processes: number of processes evaluating the tiles, None for one per
+               cpu, 1 evaluates them in the current process
+    merge: if True, the polygons cut by the seams of the tiles are united
+    Returns the list of resulting polygons.
+    """
+    if tile_size is None:
+        return _evaluate(tree, polygons)
+    tiles, seams = _tiles(polygons, tile_size)
+    if processes == 1 or len(tiles) < 2:
+        results = [_evaluate_tile(tree, *tile) for tile in tiles]
+    else:
+        processes = processes or os.cpu_count()
+        with ProcessPoolExecutor(processes) as pool:
+            chunksize = max(1, len(tiles) // (4 * processes))
+            results = list(
+                pool.map(
+                    _evaluate_tile,
+                    [tree] * len(tiles),
+                    *zip(*tiles),
+                    chunksize=chunksize,
+                )
+            )
+    result = [polygon for tile in results for polygon in tile]
+    if merge:
+        result = _merge_seams(result, seams)
+    return result
+
+
+class LayerBooleanRecipe(Recipe):
+    """A layer expression evaluated on the recipes of each layer."""
+
+    def __init__(self, tree, recipes, tiling, layer):
+        super().__init__(layer)
+        self.tree = tree
+        self.recipes = recipes  # {layer: [recipes]}
+        self.tiling = tiling  # keyword arguments of layer_polygons
+
+    def build(self, env, index):
+        polygons = {}
+        for layer, recipes in self.recipes.items():
+            polygons[layer] = []
+            for recipe in recipes:
+                polygons[layer] += built_polygons(recipe, env, index)
+        result = layer_polygons(self.tree, polygons, **self.tiling)
+        return gdspy.PolygonSet(result, layer=self.layer)
+
+
+def offset_polygons(polygons, distance):
+    # the polygons are united before being grown (distance > 0) or shrunk
+    if len(polygons) == 0:
+        return []
+    result = gdspy.offset(
+        polygons, distance, join="miter", join_first=True, precision=TOLERANCE, max_points=0
+    )
+    return [] if result is None else result.polygons
+
+
+class OffsetRecipe(Recipe):
+    """The recipes of layers grown or shrunk at once."""
+
+    def __init__(self, recipes, distance, layer):
+        super().__init__(layer)
+        self.recipes = recipes
+        self.distance = Coordinates([distance])
+
+    def build(self, env, index):
+        (distance,) = self.distance(env)[..., index]
+        polygons = []
+        for recipe in self.recipes:
+            polygons += built_polygons(recipe, env, index)
+        return gdspy.PolygonSet(offset_polygons(polygons, distance), layer=self.layer)
+
+
+class FilletRecipe(Recipe):
+    def __init__(self, recipe, radius, vertex_indices=None):
+        super().__init__(recipe.layer)
+        self.recipe = recipe
+        if vertex_indices is None:
+            self.radius = Coordinates([radius])
+        else:
+            self.radius = Coordinates(list(radius))
+        self.vertex_indices = vertex_indices
+
+    def build(self, env, index):
+        polygon = self.recipe.build(env, index)
+        radius = self.radius(env)[..., index]
+        if self.vertex_indices is None:
+            polygon.fillet(radius[0], max_points=0)
+        else:
+            radii = [0] * len(polygon.polygons[0])
+            for rad, indices in zip(radius, self.vertex_indices):
+                for vertex_index in indices:
+                    radii[vertex_index] = rad
+            polygon.fillet([radii], max_points=0, precision=TOLERANCE)
+        return polygon
@@ -13,6 +13,7 @@ from pint import UnitRegistry
 from sympy.parsing import sympy_parser
 from win32com.client import CDispatch, Dispatch
 
+from ..profiling import profiled_interface
 from ..utils import LENGTH_UNIT, Vector, coor2angle, parse_entry, val
 
 # extract_value_unit, \
@@ -955,6 +956,7 @@ class HfssReport(COMWrapper):
         return numpy.loadtxt(fn, skiprows=1, delimiter=",").transpose()
 
 
+@profiled_interface
 class HfssModeler(COMWrapper):
     def __init__(self, design, modeler, boundaries, mesh):
         """
@@ -1123,18 +1125,24 @@ class HfssModeler(COMWrapper):
     def get_coor_sys(self):
         return self._modeler.GetActiveCoordinateSystem()
 
-    def delete(self, entity):
-        objects = [
+    def get_objects(self):
+        return [
             self._modeler.GetObjectName(str(ii)) for ii in range(int(self._modeler.GetNumObjects()))
         ]
-        if entity.name in objects:
+
+    def delete(self, entity):
+        if entity.name in self.get_objects():
             self._modeler.Delete(["NAME:Selections", "Selections:=", entity.name])
 
     def delete_all_objects(self):
-        objects = [
-            self._modeler.GetObjectName(str(ii)) for ii in range(int(self._modeler.GetNumObjects()))
-        ]
-        self._modeler.Delete(self._selections_array(*objects))
+        self._modeler.Delete(self._selections_array(*self.get_objects()))
+
+    def delete_objects(self, names):
+        # single Delete call for all the listed objects that still exist
+        objects = self.get_objects()
+        names = [name for name in names if name in objects]
+        if names:
+            self._modeler.Delete(self._selections_array(*names))
 
     @assert_name
     def box(self, pos, size, **kwargs):
@@ -92,10 +92,10 @@ def draw_connector(self, pcb_track, pcb_gap, bond_length, tr_line=True, name="co
 
     if self.is_mask:
         self.rect(
-            [pcb_gap / 2 - self.is_mask, pcb_gap + pcb_track / 2 + self.is_mask],
+            [pcb_gap / 2 - self.gap_mask, pcb_gap + pcb_track / 2 + self.gap_mask],
             [
-                pcb_gap / 2 + bond_length + 2 * self.is_mask,
-                -(2 * pcb_gap + pcb_track + 2 * self.is_mask),
+                pcb_gap / 2 + bond_length + 2 * self.gap_mask,
+                -(2 * pcb_gap + pcb_track + 2 * self.gap_mask),
             ],
             layer=MASK,
             name=name + "_mask",
@@ -111,7 +111,11 @@ def draw_connector(self, pcb_track, pcb_gap, bond_length, tr_line=True, name="co
             layer=RLC,
             name=name + "_ohm",
         )
-        points = [(pcb_gap / 2 + self.overdev, 0), (pcb_gap - self.overdev, 0)]
+        if self.mode == "gds":
+            # the overdev is applied to the whole layers at export, see process_layers
+            points = [(pcb_gap / 2, 0), (pcb_gap, 0)]
+        else:
+            points = [(pcb_gap / 2 + self.overdev, 0), (pcb_gap - self.overdev, 0)]
         ohm.assign_lumped_RLC(points, ("50ohm", 0, 0))
         self.polyline(points, name=name + "_line", closed=False, layer=DEFAULT)
 
@@ -14,3 +14,13 @@ MASK = 3
 RLC = 4
 MESH = 5
 PORT = 6
+# names of the layers in the layer expressions of Modeler.layer_boolean
+LAYERS = dict(
+    DEFAULT=DEFAULT, TRACK=TRACK, GAP=GAP, MASK=MASK, RLC=RLC, MESH=MESH, PORT=PORT
+)
+
+# GEOMETRY OF THE BONDS DRAWN ALONG THE CABLES
+AIRBRIDGE = dict(
+    width=20e-6, length=100e-6, track=40e-6, gap=5e-6, foot_width=40e-6, foot_length=40e-6
+)
+BOND_DIAMETER = 20e-6
@@ -1,6 +1,7 @@
 import numpy as np
 
-from ..utils import Vector, val, way
+from ..profiling import profiled
+from ..utils import Vector, evaluated_with, val, variable_scope, way
 
 
 # useful function to find cable path
@@ -19,22 +20,93 @@ def cost_f(x):
         return 100
 
 
+def candidates(pointA, point1, point2, pointB, in_ori, out_ori, anti_parallel, index=None):
+    # corner paths between two ports, only the index-th one if index is given
+    points_choices = []
+    if anti_parallel:
+        middle_point = (point1 + point2) / 2
+        choice_in = next_point(point1, middle_point, in_ori)  # bon sens
+        choice_out = next_point(point2, middle_point, out_ori)  # à inverser
+        for c_in in choice_in:
+            for c_out in choice_out:
+                points_choices.append([pointA, *c_in, *c_out[:-1][::-1], pointB])
+    else:
+        choice_in = next_point(point1, point2, in_ori)
+        for c_in in choice_in:
+            points_choices.append([pointA, *c_in, pointB])
+    if index is not None:
+        return points_choices[index]
+    return points_choices
+
+
+def evaluate(points):
+    """
+    Evaluated points as an (N, 3) array, each distinct coordinate being
+    evaluated once.
+    """
+    memo = {}
+    values = np.zeros((len(points), 3))
+    for ii, point in enumerate(points):
+        for kk, coordinate in enumerate(point):
+            if isinstance(coordinate, (int, float, np.integer, np.floating)):
+                values[ii, kk] = coordinate
+            else:
+                if coordinate not in memo:
+                    memo[coordinate] = val(coordinate)
+                values[ii, kk] = memo[coordinate]
+    return values
+
+
+def directions(values):
+    """
+    Vectorized way: directions (N-1, 2) of the segments of the evaluated
+    points, [0, 0] for the slanted ones.
+    """
+    vecs = np.diff(values[:, :2], axis=0)
+    x, y = vecs[:, 0], vecs[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        along_y = (y != 0) & (np.abs(x / y) < 1e-2)
+        along_x = ~along_y & (x != 0) & (np.abs(y / x) < 1e-2)
+    result = np.zeros(vecs.shape, dtype=int)
+    result[along_y, 1] = np.sign(y[along_y])
+    result[along_x, 0] = np.sign(x[along_x])
+    return result
+
+
+def equal_points(values1, values2):
+    # vectorized equal_float on the coordinates of the points
+    abs1, abs2 = np.abs(values1), np.abs(values2)
+    scale = np.where(abs1 > 1e-10, abs1, abs2)
+    equal = (np.abs(values1 - values2) < 1e-5 * scale) | ((abs1 <= 1e-10) & (abs2 <= 1e-10))
+    return equal.all(axis=-1)
+
+
+def clean_indices(values, strict=False):
+    """
+    Vectorized Path.clean for the evaluated points (N, 3): returns the cost
+    of the path and the indices of the points kept, that is the first, the
+    last and the corners. If strict, raises if the path goes back on itself.
+    """
+    values = np.asarray(values, dtype=float)
+    kept = np.concatenate([[0], 1 + np.nonzero(~equal_points(values[1:], values[:-1]))[0]])
+    vecs = directions(values[kept])
+    straight = vecs.any(axis=1)
+    both = straight[1:] & straight[:-1]  # neither segment is slanted
+    dots = (vecs[1:] * vecs[:-1]).sum(axis=1)
+    if strict and np.any(both & (dots == -1)):
+        msg = "Provided path is invalid: the path goes back on \
+               itself, 180° corner"
+        raise ValueError(msg)
+    cost = np.where(dots == 1, 0, np.where(dots == 0, 1, 100))[both].sum()
+    corners = kept[1:-1][~both | (dots == 0)]
+    return cost, [kept[0], *corners, kept[-1]]
+
+
 def right_left(points):
     # tells if given point is turning left or right
-    vecs = []
-    A = points[0]
-    for B in points[1:]:
-        vecs.append(way(val(B - A)))
-        A = B
-    #    print(points)
-    #    print(vecs)
-    vecA = vecs[0]
-    r_l = [0]
-    for vecB in vecs[1:]:
-        r_l.append(vecA.scalar_cross(vecB))
-        vecA = vecB
-    r_l.append(0)
-    return r_l
+    vecs = directions(evaluate(points))
+    r_l = vecs[:-1, 0] * vecs[1:, 1] - vecs[:-1, 1] * vecs[1:, 0]
+    return [0] + r_l.tolist() + [0]
 
 
 def displace(points, rl, min_dist, displacement=0, offset=0, n_meander=-1):
@@ -149,8 +221,20 @@ def add_points(points, rl, min_dist, n_meander):
     return new_points, indices_corners, dist, ignore, n_add
 
 
+# the expressions of a path are evaluated with the variables of the modeler of its ports
+evaluated = evaluated_with(lambda path: path.port_in.body.pm.variables)
+
+
 class Path(object):
-    def __init__(self, name, port_in, port_out, fillet, points=[], is_slanted=False):
+    @profiled
+    def __init__(
+        self, name, port_in, port_out, fillet, points=[], is_slanted=False, router=None, width=0
+    ):
+        """
+        router: optional Router, if the path found between the ports crosses
+                one of its obstacles, the cable is routed around them
+        width: total width of the cable, used to keep it away from the obstacles
+        """
         self.name = name
         self.port_in = port_in
         self.port_out = port_out
@@ -158,56 +242,79 @@ class Path(object):
         self.points = points
         self.is_slanted = is_slanted
 
-        if points == []:
-            in_pos = Vector(port_in.pos)
-            in_ori = Vector(port_in.ori)
-            out_pos = Vector(port_out.pos)
-            out_ori = Vector(port_out.ori)
-            room_bonding = 0 * 100e-6  # SMPD MANU BOND SPACE
-
-            dist_y = (out_pos - in_pos).dot(in_ori.orth())
-            if (
-                in_ori.dot(out_ori) == -1
-                and abs(val(dist_y)) < val(2 * fillet)
-                and not is_slanted
-                and abs(val(dist_y)) > 1e-10
-            ):
-                print("SLANTED !")
-                self.points = self.auto_slanted(in_pos, out_pos, in_ori, out_ori, dist_y)
-                self.is_slanted = True
-            elif is_slanted:
-                dist = (out_pos - in_pos).dot(in_ori)
-                pointA = in_pos + in_ori * dist / 3  # first and last point
-                pointB = out_pos + out_ori * dist / 3
-                self.points = [in_pos, pointA, pointB, out_pos]
-            else:
-                pointA = in_pos + in_ori * room_bonding  # first and last point
-                pointB = out_pos + out_ori * room_bonding
-                point1 = in_pos + in_ori * (1.1 * fillet + room_bonding)  # after in
-                point2 = out_pos + out_ori * (1.1 * fillet + room_bonding)  # before out
-
-                points_choices = []
-                if in_ori.dot(out_ori) == -1:
-                    middle_point = (point1 + point2) / 2
-
-                    choice_in = next_point(point1, middle_point, in_ori)  # bon sens
-                    choice_out = next_point(point2, middle_point, out_ori)  # à inverser
-                    for c_in in choice_in:
-                        for c_out in choice_out:
-                            points_choices.append([pointA, *c_in, *c_out[:-1][::-1], pointB])
+        with variable_scope(port_in.body.pm.variables):
+            if points == []:
+                in_pos = Vector(port_in.pos)
+                in_ori = Vector(port_in.ori)
+                out_pos = Vector(port_out.pos)
+                out_ori = Vector(port_out.ori)
+                room_bonding = 0 * 100e-6  # SMPD MANU BOND SPACE
+
+                dist_y = (out_pos - in_pos).dot(in_ori.orth())
+                if (
+                    in_ori.dot(out_ori) == -1
+                    and abs(val(dist_y)) < val(2 * fillet)
+                    and not is_slanted
+                    and abs(val(dist_y)) > 1e-10
+                ):
+                    print("SLANTED !")
+                    self.points = self.auto_slanted(in_pos, out_pos, in_ori, out_ori, dist_y)
+                    self.is_slanted = True
+                elif is_slanted:
+                    dist = (out_pos - in_pos).dot(in_ori)
+                    pointA = in_pos + in_ori * dist / 3  # first and last point
+                    pointB = out_pos + out_ori * dist / 3
+                    self.points = [in_pos, pointA, pointB, out_pos]
                 else:
-                    choice_in = next_point(point1, point2, in_ori)
-                    for c_in in choice_in:
-                        points_choices.append([pointA, *c_in, pointB])
-
-                final_choice = None
-                cost = np.inf
-                for ii, choice in enumerate(points_choices):
-                    new_cost, new_choice = self.clean(points=choice)
-                    if new_cost < cost:
-                        final_choice = new_choice
-                        cost = new_cost
-                self.points = final_choice
+                    pointA = in_pos + in_ori * room_bonding  # first and last point
+                    pointB = out_pos + out_ori * room_bonding
+                    point1 = in_pos + in_ori * (1.1 * fillet + room_bonding)  # after in
+                    point2 = out_pos + out_ori * (1.1 * fillet + room_bonding)  # before out
+
+                    # the choices are compared on their evaluated points and only
+                    # the chosen one is built symbolically
+                    anti_parallel = in_ori.dot(out_ori) == -1
+                    evaluated = val(pointA, point1, point2, pointB, in_ori, out_ori)
+                    final_choice = None
+                    cost = np.inf
+                    for ii, choice in enumerate(candidates(*evaluated, anti_parallel)):
+                        new_cost, indices = clean_indices(choice)
+                        if new_cost < cost:
+                            final_choice = (ii, indices)
+                            cost = new_cost
+                    index, indices = final_choice
+                    choice = candidates(
+                        pointA, point1, point2, pointB, in_ori, out_ori, anti_parallel, index=index
+                    )
+                    self.points = [choice[ii] for ii in indices]
+
+                    if router is not None:
+                        if router.blocks(self.points, width):
+                            self.points = router.route(
+                                in_pos, in_ori, out_pos, out_ori, fillet, width
+                            )
+                            if self.points is None:
+                                raise ValueError("Could not route %s around the obstacles" % name)
+                        else:
+                            router.add_path(self.points, width)
+
+    @property
+    def points(self):
+        # list of the (symbolic) points, self.values holds their evaluation
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+        self._values = None
+
+    @property
+    @evaluated
+    def values(self):
+        """Evaluated points, (N, 3) array computed once per list of points."""
+        if self._values is None:
+            self._values = evaluate(self._points)
+        return self._values
 
     def __add__(self, other):
         assert isinstance(other, Path)
@@ -254,6 +361,7 @@ class Path(object):
         else:
             raise ValueError("Added path do not coincide on one point")
 
+    @evaluated
     def clean(self, points=None):
         # if nothing is given, cleans the path and raise an exception if the path
         # is invalid
@@ -263,46 +371,14 @@ class Path(object):
         # turn ie that there are no consecutive segments in the same direction.
 
         if points is None:
-            cleaning_only = True
-            points = self.points.copy()
-        else:
-            cleaning_only = False
-
-        prev_point = points[0]
-        _points = [points[0]]
-        vecs = []
-        for ii, point in enumerate(points):
-            if ii == 0:
-                pass
-            else:
-                if not point == prev_point:
-                    _points.append(point)
-                    vecs.append(way(val(point - prev_point)))
-                    prev_point = point
-
-        cost = 0
-        points = _points.copy()
-        new_points = [points[0]]
-        prev_vec = vecs[0]
-        for ii, curr_vec in enumerate(vecs[1:]):
-            if curr_vec is None or prev_vec is None:  # slanted path
-                new_points.append(points[ii + 1])
-                cost += 0
-            else:  # normal
-                if curr_vec.dot(prev_vec) == 0:
-                    new_points.append(points[ii + 1])
-                elif curr_vec.dot(prev_vec) == -1 and cleaning_only:
-                    msg = "Provided path is invalid: the path goes back on \
-                           itself, 180° corner"
-                    raise ValueError(msg)
-                cost += cost_f(curr_vec.dot(prev_vec))
-            prev_vec = curr_vec
-        new_points.append(points[-1])
-
-        if cleaning_only:
-            self.points = new_points
+            values = self.values
+            cost, indices = clean_indices(values, strict=True)
+            if len(indices) != len(values):
+                self.points = [self.points[ii] for ii in indices]
+                self._values = values[indices]
         else:
-            return cost, new_points
+            cost, indices = clean_indices(evaluate(points))
+            return cost, [points[ii] for ii in indices]
 
     # handling slanted parts
     def auto_slanted(self, in_pos, out_pos, in_ori, out_ori, dist_y):
@@ -321,25 +397,39 @@ class Path(object):
 
         return [in_pos, pointA, pointB, out_pos]
 
+    @evaluated
     def to_bond(self):
         points = self.points
         fillet = self.fillet
+        vecs = directions(self.values)
         # TODO slanted path should not have bond
         bonding_segments = [[points[0]]]
         for ii, point in enumerate(points[1:-1]):
-            index = ii + 1
-            p_vec = points[index - 1] - point
-            n_vec = points[index + 1] - point
-            bonding_segments[-1].append(point + way(val(p_vec)) * fillet)
-            bonding_segments.append([point + way(val(n_vec)) * fillet])
+            # towards the previous and the next points
+            bonding_segments[-1].append(point + Vector(-vecs[ii]) * fillet)
+            bonding_segments.append([point + Vector(vecs[ii + 1]) * fillet])
         bonding_segments[-1].append(points[-1])
         return bonding_segments
 
+    @profiled
+    @evaluated
     def meander(
-        self, to_meander, meander_length, meander_offset
+        self, to_meander, meander_length, meander_offset, target_length=None
     ):  # to_meander is list of segments to be meander
+        """
+        target_length: if given, meander_length is ignored and the amplitude of
+        the meanders is solved so that the length of the path is target_length
+        """
+        if target_length is not None:
+            to_meander, meander_length = self.solve_meander(
+                to_meander, target_length, meander_offset
+            )
+        self.points = self.meandered_points(to_meander, meander_length, meander_offset)[0]
+
+    def meandered_points(self, to_meander, meander_length, meander_offset):
+        # returns the meandered points and the number of added meanders
         min_dist = 2 * self.fillet
-        points = self.points.copy()
+        points = self.points
         n_points = len(points)
         n_to_meander = len(to_meander)
         if n_points - 1 > n_to_meander:
@@ -379,49 +469,86 @@ class Path(object):
 
         # VariableString.variables[meander_length_name] = 1.1*self.fillet
 
-        self.points = [self.points[0]] + left_p + [self.points[-1]]
+        return [self.points[0]] + left_p + [self.points[-1]], tot_add
+
+    def solve_meander(self, to_meander, target_length, meander_offset):
+        """
+        Returns the to_meander and meander_length giving a path of
+        target_length. Each meander lengthens its segment by twice the
+        amplitude, so that for a given number of meanders the length is
+        affine in the amplitude and the amplitude is solved in closed form
+        from the length at the minimal amplitude (1.1 * 2 * fillet). The
+        segments meandered automatically (-1) get as many meanders as fit,
+        fewer if the amplitude would be below its minimum.
+        The decision is taken on the evaluated points: the amplitude is a
+        value.
+        """
+        target = val(target_length)
+        if not any(to_meander):
+            raise ValueError("No segment of %s to meander" % self.name)
+        fillet = val(self.fillet)
+        min_amplitude = 1.1 * 2 * fillet
+        evaluated = Path(
+            self.name,
+            self.port_in,
+            self.port_out,
+            fillet,
+            points=[Vector(value) for value in self.values],
+        )
+        if target < evaluated.length():
+            raise ValueError(
+                "%s is already longer (%.3f mm) than the target length"
+                % (self.name, evaluated.length() * 1000)
+            )
+
+        max_meanders = None
+        shortest = np.inf
+        while max_meanders != 0:
+            if max_meanders is None:
+                candidate = list(to_meander)
+            else:
+                candidate = [max_meanders if isit == -1 else isit for isit in to_meander]
+            points, n_add = evaluated.meandered_points(candidate, min_amplitude, meander_offset)
+            try:
+                length = Path(
+                    self.name, self.port_in, self.port_out, fillet, points=points
+                ).length()
+            except ValueError:  # this number of meanders does not fit
+                length = None
+            if length is not None and n_add > 0:
+                shortest = min(shortest, length)
+                amplitude = min_amplitude + (target - length) / (2 * n_add)
+                if amplitude >= min_amplitude:
+                    return candidate, amplitude
+            if -1 not in to_meander:
+                break
+            # fewer meanders on the automatic segments
+            max_meanders = (n_add if max_meanders is None else max_meanders) - 1
+        if np.isinf(shortest):
+            raise ValueError("Could not meander %s" % self.name)
+        raise ValueError(
+            "%s cannot be meandered to less than %.3f mm" % (self.name, shortest * 1000)
+        )
 
     def working_points(self, points, min_dist, to_meander):
+        # the meanders start min_dist / 2 after the first segment longer than
+        # min_dist and end min_dist / 2 before the last one
         min_dist = min_dist * 1.1
-
-        left_p_start = [points[0]]
-        left_p_end = [points[-1]]
-
-        index_start = 0
-        for ii, point in enumerate(points[1:]):
-            A = left_p_start[-1]
-            B = point
-            AB = B - A
-            vec = way(val(B - A))
-            if val(AB).norm() > val(min_dist):
-                working_p_start = A + vec * min_dist / 2
-                index_start = ii + 1
-                break
-            else:
-                left_p_start.append(B)
-                to_meander.pop(0)
-        else:
+        values = self.values if points is self.points else evaluate(points)
+        vecs = directions(values)
+        long = np.nonzero(np.linalg.norm(np.diff(values, axis=0), axis=1) > val(min_dist))[0]
+        if len(long) == 0:
             print("Warning: Could not find points to elongate cable %s" % self.name)
-            left_p = left_p_start + left_p_end[::-1]
+            left_p = points + [points[-1]]
             return [], left_p, 0
+        index_start, index_end = long[0] + 1, len(points) - 1 - long[-1]
+        del to_meander[: index_start - 1]
+        del to_meander[len(to_meander) - index_end + 1 :]
 
-        index_end = 0
-        for ii, point in enumerate(points[::-1][1:]):
-            A = left_p_end[-1]
-            B = point
-            AB = B - A
-            vec = way(val(B - A))
-            if val(AB).norm() > val(min_dist):
-                working_p_end = A + vec * min_dist / 2
-                index_end = ii + 1
-                break
-            else:
-                left_p_end.append(B)
-                to_meander.pop(-1)
-        else:
-            print("Warning: Could not find points to elongate cable %s" % self.name)
-            left_p = left_p_start + left_p_end[::-1]
-            return [], left_p, 0
+        left_p_start = points[:index_start]
+        left_p_end = points[-index_end:][::-1]
+        working_p_start = left_p_start[-1] + Vector(vecs[long[0]]) * min_dist / 2
+        working_p_end = left_p_end[-1] + Vector(-vecs[long[-1]]) * min_dist / 2
 
         working_p = [working_p_start] + points[index_start:-index_end] + [working_p_end]
         index_insertion = len(left_p_start)
@@ -430,11 +557,19 @@ class Path(object):
         return working_p, left_p, index_insertion
 
     def length(self):
+        return self.lengths()[0]
+
+    @evaluated
+    def lengths(self):
+        """
+        Returns the length of the cable, the straight length of each segment
+        (without the parts replaced by the fillets) and the length of the arc
+        of each corner.
+        """
         self.clean()  # make sure each point is at a corner
-        points = self.points
-        value = 0
-        corner = val(self.fillet * (2 - np.pi / 2))
-        for ii in range(len(points) - 1):
-            value += val((points[ii + 1] - points[ii]).norm()) - corner
-        value += corner
-        return value
+        fillet = val(self.fillet)
+        straight = np.linalg.norm(np.diff(self.values, axis=0), axis=1)
+        straight[1:] -= fillet
+        straight[:-1] -= fillet
+        arcs = np.full(len(straight) - 1, np.pi / 2 * fillet)
+        return straight.sum() + arcs.sum(), straight, arcs
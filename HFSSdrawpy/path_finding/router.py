@@ -0,0 +1,408 @@
+"""
+Manhattan router for the cables.
+
+The cables are routed on the sparse (Hanan) grid spanned by the ports, the
+points at LEAD * fillet in front of them and the edges of the obstacles
+(axis aligned boxes grown by the clearance and half the cable width). An A*
+search goes from corner to corner: the straight segments between two corners
+are at least 2 * fillet long (LEAD * fillet for the first and the last ones)
+so that every bend can be rounded, and the cost of a path is its length plus
+bend_cost per corner. For each ray, all the obstacles are tested at once
+with numpy.
+
+Several cables are planned together by route_many: the cables in conflict
+are rerouted with a cost for overlapping the other cables, raised at each
+iteration (negotiated congestion), before being settled one after the other.
+
+The grid coordinates keep the expression they come from (port positions,
+fillet...) so that the routed points still follow the variables, only the
+coordinates coming from the obstacles are plain floats.
+"""
+import heapq
+
+import numpy as np
+
+from ..utils import Vector, parse_entry, val
+
+LEAD = 1.1  # as in Path, the cable goes straight for LEAD * fillet out of a port
+TOLERANCE = 1e-12
+DIRECTIONS = np.array([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0], [0.0, -1.0]])
+
+
+def direction_index(ori):
+    ori = np.asarray(val(ori), dtype=float)[:2]
+    for ii, direction in enumerate(DIRECTIONS):
+        if np.allclose(ori, direction, atol=1e-9):
+            return ii
+    raise ValueError("The router only handles ports oriented along x or y, not %s" % ori)
+
+
+class Obstacles:
+    """Axis aligned boxes [xmin, ymin, xmax, ymax]."""
+
+    def __init__(self, boxes=None):
+        if boxes is None:
+            boxes = np.zeros((0, 4))
+        self.boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def add(self, boxes):
+        self.boxes = np.vstack([self.boxes, np.array(boxes, dtype=float).reshape(-1, 4)])
+
+    def add_path(self, points, width):
+        """Adds the segments of a cable of the given width."""
+        points = np.asarray(points, dtype=float)[:, :2]
+        lower = np.minimum(points[:-1], points[1:]) - width / 2
+        upper = np.maximum(points[:-1], points[1:]) + width / 2
+        self.add(np.hstack([lower, upper]))
+
+    def grown(self, margin):
+        return Obstacles(self.boxes + margin * np.array([-1, -1, 1, 1]))
+
+    def without(self, *points):
+        """Obstacles which do not contain any of the points."""
+        keep = np.ones(len(self.boxes), dtype=bool)
+        for point in points:
+            keep &= ~self._contains(point)
+        return Obstacles(self.boxes[keep])
+
+    def _contains(self, point):
+        boxes = self.boxes
+        return (
+            (boxes[:, 0] < point[0] - TOLERANCE)
+            & (point[0] + TOLERANCE < boxes[:, 2])
+            & (boxes[:, 1] < point[1] - TOLERANCE)
+            & (point[1] + TOLERANCE < boxes[:, 3])
+        )
+
+    def free_length(self, point, direction):
+        """Distance from point to the first obstacle in the direction (index)."""
+        if len(self.boxes) == 0:
+            return np.inf
+        boxes = self.boxes
+        axis = direction % 2
+        across = 1 - axis
+        crossing = (boxes[:, across] < point[across] - TOLERANCE) & (
+            point[across] + TOLERANCE < boxes[:, across + 2]
+        )
+        if DIRECTIONS[direction][axis] > 0:
+            ahead = boxes[:, axis + 2] > point[axis] + TOLERANCE
+            distances = boxes[:, axis] - point[axis]
+        else:
+            ahead = boxes[:, axis] < point[axis] - TOLERANCE
+            distances = point[axis] - boxes[:, axis + 2]
+        distances = distances[crossing & ahead]
+        if len(distances) == 0:
+            return np.inf
+        return max(distances.min(), 0)
+
+    def overlap_lengths(self, point, direction, distances):
+        """
+        Length of the segments going from point in the direction (index) over
+        the given distances which lies inside the obstacles, for each distance.
+        """
+        distances = np.asarray(distances, dtype=float)
+        if len(self.boxes) == 0:
+            return np.zeros(len(distances))
+        boxes = self.boxes
+        axis = direction % 2
+        across = 1 - axis
+        crossing = (boxes[:, across] < point[across] - TOLERANCE) & (
+            point[across] + TOLERANCE < boxes[:, across + 2]
+        )
+        boxes = boxes[crossing]
+        if DIRECTIONS[direction][axis] > 0:
+            lower, upper = boxes[:, axis] - point[axis], boxes[:, axis + 2] - point[axis]
+        else:
+            lower, upper = point[axis] - boxes[:, axis + 2], point[axis] - boxes[:, axis]
+        inside = np.minimum(distances[:, np.newaxis], upper) - np.maximum(lower, 0)
+        return np.clip(inside, 0, None).sum(axis=1)
+
+    def blocks(self, points):
+        """True if one of the axis aligned segments of points crosses an obstacle."""
+        if len(self.boxes) == 0 or len(points) < 2:
+            return False
+        points = np.asarray(points, dtype=float)[:, :2]
+        lower = np.minimum(points[:-1], points[1:])[:, np.newaxis, :]
+        upper = np.maximum(points[:-1], points[1:])[:, np.newaxis, :]
+        boxes = self.boxes[np.newaxis]
+        # strict inequalities: a segment lying on the edge of a box is allowed
+        overlap = (lower < boxes[..., 2:] - TOLERANCE) & (upper > boxes[..., :2] + TOLERANCE)
+        return bool(overlap.all(axis=-1).any())
+
+
+class _Axis:
+    # sorted coordinates of the grid along x or y with their expressions
+    def __init__(self):
+        self.pairs = []
+
+    def add(self, value, expr=None):
+        self.pairs.append((float(value), value if expr is None else expr))
+
+    def build(self):
+        self.pairs.sort(key=lambda pair: pair[0])
+        values, exprs = [], []
+        for value, expr in self.pairs:
+            if values and abs(value - values[-1]) <= TOLERANCE * max(1, abs(value)):
+                continue
+            values.append(value)
+            exprs.append(expr)
+        self.values = np.array(values)
+        self.exprs = exprs
+
+    def index(self, value):
+        return int(np.argmin(np.abs(self.values - value)))
+
+
+class Router:
+    """
+    Routes cables on a Manhattan grid avoiding obstacles. The routed cables
+    are added to the obstacles so that the next cables avoid them.
+
+    obstacles: Obstacles or list of boxes [xmin, ymin, xmax, ymax]
+    clearance: distance kept between the edges of the cables and the obstacles
+    bend_cost: cost of a corner (in meter), 10 * fillet by default
+    """
+
+    def __init__(self, obstacles=None, clearance=0, bend_cost=None):
+        if not isinstance(obstacles, Obstacles):
+            obstacles = Obstacles(obstacles)
+        self.obstacles = obstacles
+        self.clearance = val(parse_entry(clearance))
+        self.bend_cost = bend_cost
+
+    def local_obstacles(self, start, end, width):
+        # the obstacles seen by a cable: the ones containing its ends are
+        # the elements the cable is connected to
+        margin = self.clearance + width / 2
+        return self.obstacles.grown(margin).without(start, end)
+
+    def blocks(self, points, width):
+        points = _evaluate(points)
+        return self.local_obstacles(points[0], points[-1], width).blocks(points)
+
+    def add_path(self, points, width):
+        self.obstacles.add_path(_evaluate(points), width)
+
+    def route_many(self, cables, preferred=None, iterations=4, congestion_cost=10):
+        """
+        Plans the cables together. Each cable is first given its preferred
+        points or routed on its own, then the cables crossing an obstacle or
+        another cable are rerouted, the last ones first, overlapping the other
+        cables costing congestion_cost per meter, doubled at each of the
+        iterations. The remaining conflicts are settled by routing the cables
+        in the given order, each one avoiding the previous ones.
+        cables: list of (start, start_ori, end, end_ori, fillet, width)
+        preferred: optional list of points (or None) tried first for each cable
+        Returns the list of the routed points, None for the cables that cannot
+        be routed.
+        """
+        cables = [_Cable(*cable) for cable in cables]
+        # the obstacles are grown once per cable and shared by all iterations
+        hard = [
+            self.local_obstacles(cable.start_value, cable.end_value, cable.width)
+            for cable in cables
+        ]
+        routes = [None] * len(cables)
+        for ii, cable in enumerate(cables):
+            if preferred is not None and preferred[ii] is not None:
+                routes[ii] = (preferred[ii], _evaluate(preferred[ii]))
+            else:
+                routes[ii] = self._search(cable, hard[ii])
+
+        def in_conflict(ii):
+            route = routes[ii]
+            return route is not None and (
+                hard[ii].blocks(route[1]) or self._others(cables, routes, ii).blocks(route[1])
+            )
+
+        for iteration in range(iterations):
+            conflicts = [ii for ii in range(len(cables)) if in_conflict(ii)]
+            if not conflicts:
+                break
+            # the first cables have the priority: the last ones move first
+            for ii in reversed(conflicts):
+                if not in_conflict(ii):
+                    continue
+                route = self._search(
+                    cables[ii],
+                    hard[ii],
+                    self._others(cables, routes, ii),
+                    congestion_cost * 2 ** iteration,
+                )
+                if route is not None:
+                    routes[ii] = route
+
+        planned = [None] * len(cables)
+        accepted = Obstacles()
+        for ii, cable in enumerate(cables):
+            margin = self.clearance + cable.width / 2
+            previous = accepted.grown(margin).without(cable.start_value, cable.end_value)
+            route = routes[ii]
+            if route is None or hard[ii].blocks(route[1]) or previous.blocks(route[1]):
+                obstacles = Obstacles(np.vstack([hard[ii].boxes, previous.boxes]))
+                route = self._search(cable, obstacles)
+            if route is not None:
+                accepted.add_path(route[1], cable.width)
+                planned[ii] = route[0]
+        self.obstacles.add(accepted.boxes)
+        return planned
+
+    def route(self, start, start_ori, end, end_ori, fillet, width=0):
+        """
+        start, end: positions of the ports (can be symbolic)
+        start_ori, end_ori: orientations of the ports, pointing to the cable
+        Returns the points [start, corners..., end] or None if the cable cannot
+        be routed. The routed cable becomes an obstacle for the next ones.
+        """
+        cable = _Cable(start, start_ori, end, end_ori, fillet, width)
+        route = self._search(
+            cable, self.local_obstacles(cable.start_value, cable.end_value, width)
+        )
+        if route is None:
+            return None
+        self.obstacles.add_path(route[1], width)
+        return route[0]
+
+    def _others(self, cables, routes, index):
+        # the other cables, as seen by the index-th one
+        cable = cables[index]
+        others = Obstacles()
+        for ii, route in enumerate(routes):
+            if ii != index and route is not None:
+                others.add_path(route[1], cables[ii].width)
+        margin = self.clearance + cable.width / 2
+        return others.grown(margin).without(cable.start_value, cable.end_value)
+
+    def _search(self, cable, obstacles, congestion=None, congestion_cost=0):
+        # A* from corner to corner, returns (points, evaluated points) or None
+        if congestion is None:
+            congestion = Obstacles()
+        fillet_value = float(val(cable.fillet))
+        bend_cost = 10 * fillet_value if self.bend_cost is None else self.bend_cost
+        start_value, end_value = cable.start_value, cable.end_value
+        start_dir = direction_index(cable.start_ori)
+        end_dir = (direction_index(cable.end_ori) + 2) % 4  # direction of the last segment
+
+        axes = self._grid(cable, obstacles, congestion)
+        end_node = (axes[0].index(end_value[0]), axes[1].index(end_value[1]))
+        lead = LEAD * fillet_value * (1 - 1e-9)
+        corner = 2 * fillet_value * (1 - 1e-9)
+
+        values_x, values_y = axes[0].values, axes[1].values
+
+        def ray(node, direction, min_length):
+            # indices of the nodes reachable from node going straight in
+            # direction, with the costs of the segments
+            point = np.array([values_x[node[0]], values_y[node[1]]])
+            axis = direction % 2
+            distances = (axes[axis].values - point[axis]) * DIRECTIONS[direction][axis]
+            free = obstacles.free_length(point, direction)
+            reachable = np.nonzero((distances >= min_length) & (distances <= free + TOLERANCE))[0]
+            costs = distances[reachable]
+            if congestion_cost and len(congestion):
+                costs = costs + congestion_cost * congestion.overlap_lengths(
+                    point, direction, costs
+                )
+            return axis, reachable, distances[reachable], costs
+
+        # states are (x index, y index, direction of the segment reaching the node)
+        best = np.full((len(values_x), len(values_y), 4), np.inf)
+        closed = np.zeros(best.shape, dtype=bool)
+        parents = {}
+        heap = []
+        counter = 0
+
+        def push(node, direction, min_length, cost, parent):
+            # pushes the corners at least min_length away from node and the end
+            nonlocal counter
+            axis, reachable, distances, costs = ray(node, direction, lead)
+            nodes = np.tile(node, (len(reachable), 1))
+            nodes[:, axis] = reachable
+            at_end = (nodes[:, 0] == end_node[0]) & (nodes[:, 1] == end_node[1])
+            if direction == end_dir and at_end.any():
+                end_cost = cost + costs[at_end][0]
+                heapq.heappush(heap, (end_cost, counter, end_cost, None, parent))
+                counter += 1
+            new_costs = cost + costs + bend_cost
+            ix, iy = nodes[:, 0], nodes[:, 1]
+            keep = ~at_end & (distances >= min_length)
+            keep &= (new_costs < best[ix, iy, direction]) & ~closed[ix, iy, direction]
+            ix, iy, new_costs = ix[keep], iy[keep], new_costs[keep]
+            best[ix, iy, direction] = new_costs
+            estimates = (
+                new_costs
+                + np.abs(values_x[ix] - end_value[0])
+                + np.abs(values_y[iy] - end_value[1])
+            )
+            for x, y, new_cost, estimate in zip(ix, iy, new_costs, estimates):
+                state = (x, y, direction)
+                parents[state] = parent
+                heapq.heappush(heap, (estimate, counter, new_cost, state, parent))
+                counter += 1
+
+        start_node = (axes[0].index(start_value[0]), axes[1].index(start_value[1]))
+        push(start_node, start_dir, lead, 0, None)
+
+        while heap:
+            _, _, cost, state, parent = heapq.heappop(heap)
+            if state is None:  # reached the end
+                corners = []
+                while parent is not None:
+                    corners.insert(0, parent[:2])
+                    parent = parents[parent]
+                values = [start_value]
+                values += [[values_x[ix], values_y[iy]] for ix, iy in corners]
+                values.append(end_value)
+                exprs = [Vector(axes[0].exprs[ix], axes[1].exprs[iy]) for ix, iy in corners]
+                return [cable.start, *exprs, cable.end], np.array(values)
+            if closed[state] or cost > best[state]:
+                continue
+            closed[state] = True
+            node, direction = state[:2], state[2]
+            for new_direction in ((direction + 1) % 4, (direction + 3) % 4):
+                push(node, new_direction, corner, cost, state)
+        return None
+
+    @staticmethod
+    def _grid(cable, obstacles, congestion):
+        axes = (_Axis(), _Axis())
+        point_in = cable.start + cable.start_ori * LEAD * cable.fillet
+        point_out = cable.end + cable.end_ori * LEAD * cable.fillet
+        middle = (point_in + point_out) / 2
+        for point in (cable.start, cable.end, point_in, point_out, middle):
+            for axis in (0, 1):
+                axes[axis].add(val(point[axis]), point[axis])
+                # room to turn twice next to the ports
+                for shift in (-2 * cable.fillet, 2 * cable.fillet):
+                    axes[axis].add(val(point[axis] + shift), point[axis] + shift)
+        for axis in (0, 1):
+            edges = np.concatenate([obstacles.boxes[:, axis], obstacles.boxes[:, axis + 2]])
+            for edge in edges:
+                axes[axis].add(edge)
+            # channels between the obstacles
+            edges = np.unique(edges)
+            for edge in (edges[1:] + edges[:-1]) / 2:
+                axes[axis].add(edge)
+            # the other cables can be followed along their edges
+            for edge in np.concatenate([congestion.boxes[:, axis], congestion.boxes[:, axis + 2]]):
+                axes[axis].add(edge)
+            axes[axis].build()
+        return axes
+
+
+class _Cable:
+    # ends of a cable to route, with their evaluated positions
+    def __init__(self, start, start_ori, end, end_ori, fillet, width=0):
+        self.start, self.end = Vector(start), Vector(end)
+        self.start_ori, self.end_ori = Vector(start_ori), Vector(end_ori)
+        self.fillet = fillet
+        self.width = width
+        self.start_value = np.asarray(val(self.start), dtype=float)[:2]
+        self.end_value = np.asarray(val(self.end), dtype=float)[:2]
+
+
+def _evaluate(points):
+    return np.array([val(point)[:2] for point in points], dtype=float)
@@ -0,0 +1,208 @@
+"""
+Opt-in instrumentation of the drawing operations.
+
+The Body drawing methods, the Modeler operations, the unit parsing, the
+sympy evaluation, the path finding and every method of the gds and hfss
+interfaces are decorated. The decorators do nothing unless a Profiler is
+active:
+
+    with Profiler() as profiler:
+        ... drawing script ...
+    profiler.print_stats()
+    profiler.to_json("profile.json")
+    profiler.to_folded("profile.folded")  # flamegraph.pl / speedscope input
+
+For each operation and each body, the profiler records the number of calls,
+the cumulative time (children included), the self time (children excluded)
+and the number of entities created.
+
+A profiler records the thread (or context) entering it only: the chips built
+by generate_many in other threads are not recorded, unless build_fn enters
+a profiler itself.
+"""
+import contextvars
+import inspect
+import json
+import time
+from collections import defaultdict
+from functools import wraps
+
+# the Profiler currently recording and its stack of calls, per thread
+_active = contextvars.ContextVar("profiler", default=None)
+_stack = contextvars.ContextVar("profiler_stack", default=())
+
+
+class _Frame:
+    __slots__ = ("operation", "body", "start", "children", "entities")
+
+    def __init__(self, operation, body):
+        self.operation = operation
+        self.body = body
+        self.start = time.perf_counter()
+        self.children = 0.0
+        self.entities = 0
+
+
+class Profiler:
+    def __init__(self):
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0, 0])  # calls, cumulative, self, entities
+        self.stacks = defaultdict(float)  # folded stack: self time
+        self.elapsed = 0.0
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append((_active.set(self), _stack.set([]), time.perf_counter()))
+        return self
+
+    def __exit__(self, *exc):
+        active, stack, start = self._tokens.pop()
+        _stack.reset(stack)
+        _active.reset(active)
+        self.elapsed += time.perf_counter() - start
+        return False
+
+    @property
+    def stack(self):
+        # the calls in progress in the current thread
+        return _stack.get()
+
+    def push(self, operation, body=None):
+        stack = _stack.get()
+        if body is None:
+            body = stack[-1].body if stack else "Global"
+        stack.append(_Frame(operation, body))
+
+    def pop(self):
+        stack = _stack.get()
+        frame = stack.pop()
+        elapsed = time.perf_counter() - frame.start
+        stats = self.stats[(frame.operation, frame.body)]
+        stats[0] += 1
+        # recursive calls are already accounted for by the outermost one
+        if all(parent.operation != frame.operation for parent in stack):
+            stats[1] += elapsed
+        stats[2] += elapsed - frame.children
+        stats[3] += frame.entities
+        folded = ";".join([frame.body] + [parent.operation for parent in stack])
+        self.stacks[folded + ";" + frame.operation] += elapsed - frame.children
+        if stack:
+            stack[-1].children += elapsed
+            stack[-1].entities += frame.entities
+
+    def count_entity(self):
+        stack = _stack.get()
+        if stack:
+            stack[-1].entities += 1
+
+    def operations(self):
+        """List of the stats of each (operation, body), by decreasing self time."""
+        operations = [
+            dict(
+                operation=operation,
+                body=body,
+                calls=calls,
+                cumulative=cumulative,
+                self=self_time,
+                entities=entities,
+            )
+            for (operation, body), (calls, cumulative, self_time, entities) in self.stats.items()
+        ]
+        return sorted(operations, key=lambda stats: -stats["self"])
+
+    def to_json(self, file=None):
+        profile = dict(elapsed=self.elapsed, operations=self.operations())
+        if file is not None:
+            with open(file, "w") as f:
+                json.dump(profile, f, indent=1)
+        return profile
+
+    def to_folded(self, file=None):
+        """
+        One line per call stack "body;operation;...;operation microseconds",
+        the format of flamegraph.pl, speedscope or inferno.
+        """
+        lines = [
+            "%s %d" % (stack, round(self_time * 1e6))
+            for stack, self_time in sorted(self.stacks.items())
+        ]
+        folded = "\n".join(lines) + "\n"
+        if file is not None:
+            with open(file, "w") as f:
+                f.write(folded)
+        return folded
+
+    def print_stats(self, number=20):
+        header = ("operation", "body", "calls", "cum ms", "self ms", "entities")
+        print("%-40s %-15s %8s %10s %10s %8s" % header)
+        for stats in self.operations()[:number]:
+            print(
+                "%-40s %-15s %8d %10.2f %10.2f %8d"
+                % (
+                    stats["operation"],
+                    stats["body"],
+                    stats["calls"],
+                    stats["cumulative"] * 1e3,
+                    stats["self"] * 1e3,
+                    stats["entities"],
+                )
+            )
+
+
+def profiled(func):
+    """
+    Decorator recording the calls of func in the active Profiler. The body is
+    the one of the first argument (a Body, or an Entity or Port of a body),
+    otherwise the one of the calling operation.
+    """
+    operation = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        body = None
+        if args:
+            owner = getattr(args[0], "body", args[0])
+            if hasattr(owner, "interface") and isinstance(getattr(owner, "name", None), str):
+                body = owner.name
+        profiler.push(operation, body)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.pop()
+
+    return wrapper
+
+
+def profiled_interface(cls):
+    """
+    Class decorator recording the calls of every public method of an
+    interface, which are attributed to the body of the calling operation.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(method):
+            continue
+        setattr(cls, name, _profiled_method(cls.__name__ + "." + name, method))
+    return cls
+
+
+def _profiled_method(operation, method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        profiler = _active.get()
+        if profiler is None:
+            return method(*args, **kwargs)
+        profiler.push(operation)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profiler.pop()
+
+    return wrapper
+
+
+def count_entity():
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.count_entity()
@@ -1,8 +1,17 @@
+import ast
+import contextvars
+import functools
+import linecache
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
 import numpy
 import sympy
 from pint import UnitRegistry
 from sympy.parsing import sympy_parser
 
+from .profiling import profiled
+
 ureg = UnitRegistry()
 Q = ureg.Quantity
 
@@ -131,7 +140,8 @@ def gen_name(name):
         return prefix + suffix
 
 
-def check_name(_class, name):
+def check_name(_class, name, instances):
+    # instances: the registry of the names of the _class objects of a modeler
     end = ""
     for ii, char in enumerate(name[::-1]):
         if char.isdigit():
@@ -147,7 +157,7 @@ def check_name(_class, name):
         radical = name[:-ii]
         number = int(end[::-1])
     new_name = name
-    while new_name in _class.dict_instances.keys():
+    while new_name in instances:
         number += 1
         new_name = radical + str(number)
     if new_name != name:
@@ -155,6 +165,51 @@ def check_name(_class, name):
     return new_name
 
 
+# filename -> (source lines, {line number: assigned name})
+_assignment_targets = {}
+
+
+def _map_assignment_targets(lines):
+    # every line spanned by a single-name assignment points to that name
+    targets = {}
+    try:
+        tree = ast.parse("".join(lines))
+    except SyntaxError:
+        return targets
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+        elif isinstance(node, ast.AnnAssign):
+            target = node.target
+        else:
+            continue
+        if isinstance(target, ast.Name):
+            for lineno in range(node.lineno, node.end_lineno + 1):
+                targets[lineno] = target.id
+    return targets
+
+
+def assigned_name(filename, lineno):
+    """
+    Returns the name of the variable assigned at line lineno of filename, or
+    None if it cannot be found.
+    The source comes from linecache (which also holds notebook cells and
+    registered exec'd code) and is parsed only once per file version, so that
+    repeated calls are O(1).
+    """
+    linecache.checkcache(filename)  # only a stat, reloads edited scripts
+    lines = linecache.getlines(filename)
+    cached = _assignment_targets.get(filename)
+    if cached is None or cached[0] is not lines:
+        cached = (lines, _map_assignment_targets(lines))
+        _assignment_targets[filename] = cached
+    name = cached[1].get(lineno)
+    if name is None and 0 < lineno <= len(lines) and "=" in lines[lineno - 1]:
+        # e.g. the script is not valid python as a whole
+        name = lines[lineno - 1].split("=")[0].strip()
+    return name
+
+
 ### Litteral Expressions
 
 
@@ -185,12 +240,32 @@ def simplify_arith_expr(expr):
         raise
 
 
+@profiled
 def extract_value_unit(expr, units):
     """
     :type expr: str
     :type units: str
     :return: float
     """
+    # plain numbers and symbolic expressions do not need pint
+    if isinstance(expr, (int, float, numpy.integer, numpy.floating)):
+        return float(expr)
+    if isinstance(expr, sympy.Basic):
+        return float(expr) if expr.is_number else expr
+    if isinstance(expr, str):
+        return _extract_value_unit_str(expr, units)
+    try:
+        return Q(expr).to(units).magnitude
+    except Exception:
+        try:
+            return float(expr)
+        except Exception:
+            return expr
+
+
+@functools.lru_cache(maxsize=None)
+def _extract_value_unit_str(expr, units):
+    # the same few strings ('20um', '0.3mm') are parsed again and again
     try:
         return Q(expr).to(units).magnitude
     except Exception:
@@ -237,11 +312,15 @@ def rem_unit(other):
         return other
 
 
+@profiled
 def _val(elt):
     if isinstance(elt, (int, float, numpy.int64, numpy.float64, numpy.int32, numpy.float32)):
         return elt
-    else:
-        return float(elt.evalf(subs=variables))
+    scope = _scope.get()
+    if isinstance(elt, sympy.Symbol):
+        return scope.value(elt)
+    # only the variables used by elt are substituted
+    return float(elt.xreplace({symbol: scope.value(symbol) for symbol in elt.free_symbols}))
 
 
 def val(*entries, marker=True):
@@ -280,10 +359,165 @@ def way(vec):
                 return Vector(-1, 0)
 
 
-variables = {}
+class Variables(dict):
+    """
+    {symbol: value in SI} of the variables of a modeler, a value being a
+    number or an expression of other variables.
+    The evaluated values are cached, a variable changing value invalidating
+    the variables depending on it only. revision changes when a variable
+    changes value, revisions[symbol] being the last revision changing symbol
+    (directly or through the variables it depends on), see revision_of.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.revision = 0
+        self.revisions = {}
+        self.dependents = {}  # {symbol: variables whose expression uses symbol}
+        self._values = {}
+
+    def store(self, symbol, value):
+        """Returns True if the variable existed and changed value."""
+        value = si_value(value)
+        changed = symbol in self
+        if changed:
+            if self[symbol] == value:
+                return False
+            self.revision += 1
+            self._invalidate(symbol, set())
+            for used in getattr(self[symbol], "free_symbols", ()):
+                self.dependents[used].discard(symbol)
+        for used in getattr(value, "free_symbols", ()):
+            self.dependents.setdefault(used, set()).add(symbol)
+        self[symbol] = value
+        return changed
+
+    def _invalidate(self, symbol, seen):
+        if symbol in seen:
+            return
+        seen.add(symbol)
+        self.revisions[symbol] = self.revision
+        self._values.pop(symbol, None)
+        for dependent in self.dependents.get(symbol, ()):
+            self._invalidate(dependent, seen)
+
+    def value(self, symbol):
+        """Evaluated value of the variable symbol."""
+        if symbol in self._values:
+            return self._values[symbol]
+        if symbol not in self:
+            raise ValueError("No value for the variable %s" % symbol)
+        value = self[symbol]
+        if isinstance(value, sympy.Basic):
+            value = float(value.evalf(subs={used: self.value(used) for used in value.free_symbols}))
+        self._values[symbol] = value
+        return value
+
+    def dependent_variables(self, symbols):
+        """The variables symbols and the ones defined from them."""
+        dependents = set()
+        symbols = list(symbols)
+        while symbols:
+            symbol = symbols.pop()
+            if symbol not in dependents:
+                dependents.add(symbol)
+                symbols.extend(self.dependents.get(symbol, ()))
+        return dependents
+
+    def revision_of(self, symbols):
+        """Changes when one of the variables symbols changes value."""
+        return max((self.revisions.get(symbol, 0) for symbol in symbols), default=0)
+
+
+# the variables used by val, set by each Modeler for the thread (or context)
+# which creates it, see variable_scope
+_scope = contextvars.ContextVar("variables", default=Variables())
+
+
+def current_variables():
+    return _scope.get()
+
+
+def use_variables(scope):
+    """Makes scope (Variables) the variables used by val in this thread."""
+    _scope.set(scope)
+
+
+@contextmanager
+def variable_scope(scope):
+    """Makes scope (Variables) the variables used by val within the block."""
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def evaluated_with(variables_of):
+    """
+    Decorator of the methods evaluating expressions: they run in the
+    variable_scope of variables_of(self), the variables of the modeler the
+    object belongs to, whatever the scope of the thread.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def evaluated(self, *args, **kwargs):
+            token = _scope.set(variables_of(self))
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                _scope.reset(token)
+
+        return evaluated
+
+    return decorator
+
+
+class _CurrentVariables(MutableMapping):
+    # the variables of the current scope, for the code importing variables
+    def __getitem__(self, symbol):
+        return _scope.get()[symbol]
+
+    def __setitem__(self, symbol, value):
+        _scope.get()[symbol] = value
+
+    def __delitem__(self, symbol):
+        del _scope.get()[symbol]
+
+    def __iter__(self):
+        return iter(_scope.get())
+
+    def __len__(self):
+        return len(_scope.get())
+
+
+variables = _CurrentVariables()
+
+
+def free_symbols(*entries):
+    """
+    Variables used by entries: expressions, lists, tuples or arrays of them
+    and objects (Entity, Port) with symbols.
+    """
+    symbols = set()
+    for entry in entries:
+        if isinstance(entry, sympy.Basic):
+            symbols |= entry.free_symbols
+        elif isinstance(entry, (list, tuple)) or (
+            isinstance(entry, numpy.ndarray) and entry.dtype == object
+        ):
+            symbols |= free_symbols(*entry)
+        elif hasattr(entry, "symbols"):
+            symbols |= entry.symbols
+    return symbols
 
 
 def store_variable(symbol, value):  # put value in SI
+    _scope.get().store(symbol, value)
+
+
+def si_value(value):
     if isinstance(value, str):
         if LENGTH == extract_value_dim(value):
             unit = LENGTH_UNIT
@@ -296,7 +530,7 @@ def store_variable(symbol, value):  # put value in SI
         if DIMENSIONLESS == extract_value_dim(value):
             unit = DIMENSIONLESS_UNIT
         value = extract_value_unit(value, unit)
-    variables[symbol] = value
+    return value
 
 
 class Vector(numpy.ndarray):
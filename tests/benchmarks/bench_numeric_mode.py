@@ -0,0 +1,63 @@
+"""
+Compares the drawing time of the same chip in gds mode with symbolic
+variables (default) and with Modeler('gds', numeric=True), in which
+set_variable returns floats and sympy is never evaluated.
+
+usage: python tests/benchmarks/bench_numeric_mode.py [n_cables] [repeat]
+"""
+import sys
+import time
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.parameters import GAP, TRACK
+
+
+def draw_chip(pm, n_cables):
+    # examples/draw_cable_test.py-like chip with n_cables meandered cables
+    chip = Body(pm, "chip")
+    track = pm.set_variable("20um", name="track")
+    gap = pm.set_variable("10um", name="gap")
+    pitch = pm.set_variable("0.5mm", name="pitch")
+    shift = pm.set_variable("0.3mm", name="shift")
+    length = pm.set_variable("3mm", name="length")
+
+    for ii in range(n_cables):
+        with chip([0, ii * pitch], [1, 0]):
+            (port_in,) = elt.create_port(chip, [track, track + 2 * gap], name="in_%d" % ii)
+        with chip([length, ii * pitch + shift], [-1, 0]):
+            (port_out,) = elt.create_port(chip, [track, track + 2 * gap], name="out_%d" % ii)
+        chip.draw_cable(
+            port_in,
+            port_out,
+            fillet="50um",
+            to_meander=[0, 1, 0],
+            meander_length="150um",
+            name="cable_%d" % ii,
+        )
+
+    ground_plane = chip.rect(
+        [0, -pitch], [length, (n_cables + 1) * pitch], layer=TRACK, name="ground_plane"
+    )
+    ground_plane.subtract(chip.entities[GAP])
+    return ground_plane
+
+
+def bench(numeric, n_cables, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pm = Modeler("gds", numeric=numeric)
+        draw_chip(pm, n_cables)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    n_cables = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    symbolic = bench(False, n_cables, repeat)
+    numeric = bench(True, n_cables, repeat)
+    print("%d cables, best of %d" % (n_cables, repeat))
+    print("symbolic: %.3f s" % symbolic)
+    print("numeric : %.3f s (x%.1f)" % (numeric, symbolic / numeric))
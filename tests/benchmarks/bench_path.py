@@ -0,0 +1,53 @@
+"""
+Times the processing of the points of a long meandered cable by Path
+(clean, length, to_bond) once the meanders are drawn, with symbolic
+variables and in numeric mode.
+
+usage: python tests/benchmarks/bench_path.py [length_mm] [repeat]
+"""
+import sys
+import time
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.path_finding.path_finder import Path
+
+
+def meandered_path(pm, length):
+    chip = Body(pm, "chip")
+    fillet = pm.set_variable("50um", name="fillet")
+    x = pm.set_variable("%gmm" % length, name="x")
+    with chip(["0mm", "0mm"], [1, 0]):
+        (port_in,) = elt.create_port(chip, ["20um", "40um"], name="in")
+    with chip([x, "0.5mm"], [-1, 0]):
+        (port_out,) = elt.create_port(chip, ["20um", "40um"], name="out")
+    path = Path("cable", port_in, port_out, fillet)
+    path.clean()
+    path.meander([-1, 0, -1], 4 * fillet, 0)
+    return path
+
+
+def bench(numeric, length, repeat):
+    pm = Modeler("gds", numeric=numeric)
+    path = meandered_path(pm, length)
+    points = path.points
+    timings = []
+    for _ in range(repeat):
+        path.points = points  # forgets the evaluated points
+        start = time.perf_counter()
+        path.clean()
+        path.length()
+        path.to_bond()
+        timings.append(time.perf_counter() - start)
+    return len(path.points), min(timings)
+
+
+if __name__ == "__main__":
+    length = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    for numeric in (False, True):
+        n_points, elapsed = bench(numeric, length, repeat)
+        print(
+            "%-9s %4d points: clean + length + to_bond in %.3f ms"
+            % ("numeric" if numeric else "symbolic", n_points, elapsed * 1e3)
+        )
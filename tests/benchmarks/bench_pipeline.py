@@ -0,0 +1,326 @@
+"""
+Cost model of the drawing pipeline.
+
+Synthetic chips of increasing size are drawn in gds mode and the time and
+peak memory spent in each stage of the pipeline are reported:
+    parse     set_variable and unit parsing
+    draw      primitives, ports, cables (meanders), body moves
+    boolean   unite / subtract
+    fillet    Entity.fillet
+    fracture  GdsModeler.fracture
+    write     GdsModeler.write_gds
+The gds interface is replaced by a recording one which counts and times the
+calls reaching the backend, so that the time spent in the drawing front end
+(sympy, Port, Path...) can be told apart from the time spent in gdspy.
+
+Scenarios:
+    rects     n rectangles, filleted and united
+    cables    n meandered cables cut out of a ground plane
+    booleans  n holes subtracted from n/4 plates
+    nested    n rectangles in with body(...) blocks nested n deep
+    holes     n x n grid of holes (rect_array) cut out of a ground plane
+
+usage:
+    python tests/benchmarks/bench_pipeline.py [--sizes 10 20 40] [--scenarios rects ...]
+                                              [--save results.json] [--compare results.json]
+                                              [--threshold 1.5]
+                                              [--tile-size 1mm] [--processes 4]
+With --compare, exits with 1 if a stage got slower than threshold times the
+stored one.
+With --tile-size, the booleans are tiled (Modeler.set_tiling) and evaluated by
+--processes processes, to be compared with a report saved without tiling.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.interfaces.gds_modeler import GdsModeler
+from HFSSdrawpy.parameters import GAP, TRACK
+from HFSSdrawpy.utils import parse_entry
+
+STAGES = ["parse", "draw", "boolean", "fillet", "fracture", "write"]
+
+
+class RecordingGdsModeler(GdsModeler):
+    """GdsModeler counting and timing the calls it receives."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self.elapsed = 0.0
+        self._depth = 0  # calls made by the interface itself are not counted
+        self.by_method = defaultdict(lambda: [0, 0.0])
+        for method in dir(GdsModeler):
+            if not method.startswith("_") and callable(getattr(GdsModeler, method)):
+                setattr(self, method, self._record(method, getattr(self, method)))
+
+    def _record(self, method, function):
+        def recorded(*args, **kwargs):
+            if self._depth > 0:
+                return function(*args, **kwargs)
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._depth -= 1
+                self.calls += 1
+                self.elapsed += elapsed
+                self.by_method[method][0] += 1
+                self.by_method[method][1] += elapsed
+
+        return recorded
+
+
+class Stages:
+    def __init__(self, interface, memory):
+        self.interface = interface
+        self.memory = memory
+        self.results = {stage: dict(time=0.0, peak=0, calls=0, backend=0.0) for stage in STAGES}
+
+    @contextmanager
+    def __call__(self, stage):
+        result = self.results[stage]
+        if self.memory:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+        calls, backend = self.interface.calls, self.interface.elapsed
+        start = time.perf_counter()
+        yield
+        result["time"] += time.perf_counter() - start
+        result["calls"] += self.interface.calls - calls
+        result["backend"] += self.interface.elapsed - backend
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1] - current
+            result["peak"] = max(result["peak"], peak)
+
+
+def scenario_rects(pm, chip, n, stage):
+    with stage("parse"):
+        sizes = [pm.set_variable("%dum" % (20 + ii % 10), name="size_%d" % ii) for ii in range(n)]
+        pitch = parse_entry("50um")
+    with stage("draw"):
+        rects = [
+            chip.rect([ii * pitch, 0], [sizes[ii], sizes[ii]], layer=TRACK, name="rect_%d" % ii)
+            for ii in range(n)
+        ]
+    with stage("fillet"):
+        for rect in rects:
+            rect.fillet("2um")
+    with stage("boolean"):
+        pm.unite(rects)
+
+
+def scenario_cables(pm, chip, n, stage):
+    with stage("parse"):
+        track = pm.set_variable("20um", name="track")
+        gap = pm.set_variable("10um", name="gap")
+        pitch = pm.set_variable("0.5mm", name="pitch")
+        length = pm.set_variable("3mm", name="length")
+        shift = parse_entry("0.3mm")
+    with stage("draw"):
+        for ii in range(n):
+            with chip([0, ii * pitch], [1, 0]):
+                (port_in,) = elt.create_port(chip, [track, track + 2 * gap], name="in_%d" % ii)
+            with chip([length, ii * pitch + shift], [-1, 0]):
+                (port_out,) = elt.create_port(chip, [track, track + 2 * gap], name="out_%d" % ii)
+            chip.draw_cable(
+                port_in,
+                port_out,
+                fillet="50um",
+                to_meander=[0, 1, 0],
+                meander_length="150um",
+                name="cable_%d" % ii,
+            )
+        ground_plane = chip.rect(
+            [0, -pitch], [length, (n + 1) * pitch], layer=TRACK, name="ground_plane"
+        )
+    with stage("boolean"):
+        ground_plane.subtract(chip.entities[GAP])
+
+
+def scenario_booleans(pm, chip, n, stage):
+    with stage("parse"):
+        hole = pm.set_variable("10um", name="hole")
+        pitch = parse_entry("40um")
+    n_plates = max(1, n // 4)
+    with stage("draw"):
+        plates = [
+            chip.rect(
+                [0, jj * 5 * pitch], [n * pitch, 4 * pitch], layer=TRACK, name="plate_%d" % jj
+            )
+            for jj in range(n_plates)
+        ]
+        holes = [
+            chip.rect(
+                [ii * pitch, (ii % n_plates) * 5 * pitch + pitch],
+                [hole, hole],
+                layer=GAP,
+                name="hole_%d" % ii,
+            )
+            for ii in range(n)
+        ]
+    with stage("boolean"):
+        for plate in plates:
+            plate.subtract(holes, keep_originals=True)
+
+
+def scenario_nested(pm, chip, n, stage):
+    with stage("parse"):
+        step = pm.set_variable("30um", name="step")
+        size = parse_entry("10um")
+
+    def nest(depth):
+        if depth == n:
+            return
+        with chip([step, 0], [0, 1]):
+            chip.rect([0, 0], [size, size], layer=TRACK, name="nested_%d" % depth)
+            nest(depth + 1)
+
+    with stage("draw"):
+        nest(0)
+
+
+def scenario_holes(pm, chip, n, stage):
+    with stage("parse"):
+        hole = pm.set_variable("10um", name="hole")
+        pitch = parse_entry("50um")
+    with stage("draw"):
+        holes = chip.rect_array([0, 0], [hole, hole], n, n, [pitch, pitch], layer=GAP, name="holes")
+        ground_plane = chip.rect([-pitch, -pitch], [(n + 1) * pitch] * 2, layer=TRACK, name="plane")
+    with stage("boolean"):
+        ground_plane.subtract([holes])
+
+
+SCENARIOS = {
+    "rects": scenario_rects,
+    "cables": scenario_cables,
+    "booleans": scenario_booleans,
+    "nested": scenario_nested,
+    "holes": scenario_holes,
+}
+
+
+def run(scenario, n, memory=False, tiling=None):
+    """
+    Draws and writes one chip, returns {stage: results} and the backend record.
+    tiling: None or the arguments of Modeler.set_tiling
+    """
+    pm = Modeler("gds")
+    pm.interface = RecordingGdsModeler()
+    if tiling is not None:
+        pm.set_tiling(*tiling)
+    stage = Stages(pm.interface, memory)
+    if memory:
+        tracemalloc.start()
+    try:
+        chip = Body(pm, "chip")
+        SCENARIOS[scenario](pm, chip, n, stage)
+        with stage("fracture"):
+            pm.interface.fracture(0)
+        with tempfile.TemporaryDirectory() as folder:
+            with stage("write"):
+                pm.interface.write_gds(os.path.join(folder, scenario))
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return stage.results, pm.interface
+
+
+def bench(scenarios, sizes, repeat=3, tiling=None):
+    """Returns {scenario: {size: {stage: results}}}, best time of repeat runs."""
+    report = {}
+    for scenario in scenarios:
+        report[scenario] = {}
+        for n in sizes:
+            best = None
+            for _ in range(repeat):
+                results, _ = run(scenario, n, tiling=tiling)
+                if best is None:
+                    best = results
+                else:
+                    for stage in STAGES:
+                        if results[stage]["time"] < best[stage]["time"]:
+                            best[stage].update(results[stage])
+            # tracemalloc slows the drawing down, memory is measured apart
+            results, _ = run(scenario, n, memory=True, tiling=tiling)
+            for stage in STAGES:
+                best[stage]["peak"] = results[stage]["peak"]
+            report[scenario][str(n)] = best
+    return report
+
+
+def print_report(report):
+    header = ("scenario", "n", "stage", "time ms", "backend", "calls", "peak kB")
+    print("%-9s %5s %-9s %10s %10s %7s %10s" % header)
+    for scenario, sizes in report.items():
+        for n, results in sizes.items():
+            for stage in STAGES:
+                result = results[stage]
+                if result["time"] == 0:
+                    continue
+                print(
+                    "%-9s %5s %-9s %10.2f %10.2f %7d %10.1f"
+                    % (
+                        scenario,
+                        n,
+                        stage,
+                        result["time"] * 1e3,
+                        result["backend"] * 1e3,
+                        result["calls"],
+                        result["peak"] / 1024,
+                    )
+                )
+
+
+def compare(report, reference, threshold):
+    """Returns the list of (scenario, n, stage, ratio) slower than threshold."""
+    regressions = []
+    for scenario, sizes in report.items():
+        for n, results in sizes.items():
+            stored = reference.get(scenario, {}).get(n)
+            if stored is None:
+                continue
+            for stage in STAGES:
+                # stages shorter than a millisecond are too noisy to compare
+                if stored[stage]["time"] < 1e-3:
+                    continue
+                ratio = results[stage]["time"] / stored[stage]["time"]
+                if ratio > threshold:
+                    regressions.append((scenario, n, stage, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 40])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--tile-size")
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+
+    tiling = None if args.tile_size is None else (args.tile_size, args.processes)
+    report = bench(args.scenarios, args.sizes, args.repeat, tiling)
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for scenario, n, stage, ratio in regressions:
+            print("REGRESSION %s n=%s %s: x%.2f" % (scenario, n, stage, ratio))
+        sys.exit(1 if regressions else 0)
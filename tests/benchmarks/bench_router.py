@@ -0,0 +1,123 @@
+"""
+Compares the time Path takes to choose the corners of a cable with the time
+the previous selection took (every candidate cleaned symbolically), on the
+port configurations of test_find_path.py (every pair of orientations), and
+times the Router on a chip where n cables cross a row of obstacles and on a
+bus of n cables whose straightforward paths all overlap.
+
+usage: python tests/benchmarks/bench_router.py [n_cables] [repeat]
+"""
+import sys
+import time
+
+import numpy as np
+
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.path_finding.path_finder import Path, candidates
+from HFSSdrawpy.path_finding.router import Router
+from HFSSdrawpy.utils import Vector
+
+FILLET = 50e-6
+ORIENTATIONS = [[1, 0], [0, 1], [-1, 0], [0, -1]]
+
+
+def legacy_points(path):
+    # corners chosen by Path before the candidates were compared numerically
+    in_pos, in_ori = Vector(path.port_in.pos), Vector(path.port_in.ori)
+    out_pos, out_ori = Vector(path.port_out.pos), Vector(path.port_out.ori)
+    point1 = in_pos + in_ori * (1.1 * path.fillet)
+    point2 = out_pos + out_ori * (1.1 * path.fillet)
+    pointA, pointB = in_pos + in_ori * 0.0, out_pos + out_ori * 0.0
+    choices = candidates(pointA, point1, point2, pointB, in_ori, out_ori, in_ori.dot(out_ori) == -1)
+    final_choice, cost = None, np.inf
+    for choice in choices:
+        new_cost, new_choice = path.clean(points=choice)
+        if new_cost < cost:
+            final_choice, cost = new_choice, new_cost
+    return final_choice
+
+
+def port_pairs(pm, chip):
+    # test_find_path.py-like cases: every orientation of both ports
+    x = pm.set_variable("1mm", name="x")
+    pairs = []
+    for in_ori in ORIENTATIONS:
+        for out_ori in ORIENTATIONS:
+            for out_pos in ([x, 0.7e-3], [0.2e-3, x], [-x, -0.5e-3]):
+                (port_in,) = chip.port(widths=[10e-6], name="in")
+                (port_out,) = chip.port(widths=[10e-6], name="out")
+                port_in.pos, port_in.ori = Vector([0, 0]), Vector(in_ori)
+                port_out.pos, port_out.ori = Vector(out_pos), Vector(out_ori)
+                pairs.append((port_in, port_out))
+    return pairs
+
+
+def bench_path(repeat):
+    pm = Modeler("gds")
+    chip = Body(pm, "bench_router")
+    pairs = port_pairs(pm, chip)
+    paths = [Path("cable", port_in, port_out, FILLET) for port_in, port_out in pairs]
+    paths = [path for path in paths if not path.is_slanted]
+
+    timings = {"legacy": [], "path": []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            legacy_points(path)
+        timings["legacy"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for path in paths:
+            Path("cable", path.port_in, path.port_out, FILLET)
+        timings["path"].append(time.perf_counter() - start)
+    return len(paths), min(timings["legacy"]), min(timings["path"])
+
+
+def bench_router(n_cables, repeat):
+    # n cables going right across a row of obstacles with openings
+    obstacles = [
+        [0.5e-3, ii * 0.2e-3 + 0.05e-3, 0.7e-3, ii * 0.2e-3 + 0.15e-3] for ii in range(n_cables)
+    ]
+    cables = [
+        ([0, ii * 0.2e-3 + 0.1e-3], [1, 0], [1.5e-3, ii * 0.2e-3], [-1, 0], 20e-6, 10e-6)
+        for ii in range(n_cables)
+    ]
+    timings = []
+    for _ in range(repeat):
+        router = Router(obstacles, clearance=5e-6)
+        start = time.perf_counter()
+        routes = router.route_many(cables)
+        timings.append(time.perf_counter() - start)
+    return sum(route is not None for route in routes), min(timings)
+
+
+def bench_bus(n_cables, repeat):
+    # n cables shifted up by the same amount: the vertical segments of their
+    # default paths overlap in the middle of the bus
+    cables = [
+        ([0, ii * 0.1e-3], [1, 0], [3e-3, 2e-3 + ii * 0.1e-3], [-1, 0], 20e-6, 10e-6)
+        for ii in range(n_cables)
+    ]
+    preferred = [
+        [Vector(start), Vector([1.5e-3, start[1]]), Vector([1.5e-3, end[1]]), Vector(end)]
+        for start, _, end, *_ in cables
+    ]
+    timings = []
+    for _ in range(repeat):
+        router = Router(clearance=5e-6)
+        start = time.perf_counter()
+        routes = router.route_many(cables, preferred=preferred)
+        timings.append(time.perf_counter() - start)
+    return sum(route is not None for route in routes), min(timings)
+
+
+if __name__ == "__main__":
+    n_cables = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    n_paths, legacy, path = bench_path(repeat)
+    print("%d port pairs, best of %d" % (n_paths, repeat))
+    print("legacy choice: %.3f s" % legacy)
+    print("Path         : %.3f s (x%.1f)" % (path, legacy / path))
+    routed, elapsed = bench_router(n_cables, repeat)
+    print("Router: %d/%d cables routed around obstacles in %.3f s" % (routed, n_cables, elapsed))
+    routed, elapsed = bench_bus(n_cables, repeat)
+    print("Router: %d/%d cables of a bus planned in %.3f s" % (routed, n_cables, elapsed))
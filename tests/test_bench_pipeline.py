@@ -0,0 +1,18 @@
+from benchmarks.bench_pipeline import SCENARIOS, STAGES, compare, run
+
+
+def test_scenarios_report_every_stage():
+    for scenario in SCENARIOS:
+        results, interface = run(scenario, 2, memory=True)
+        assert set(results) == set(STAGES)
+        assert results["draw"]["calls"] > 0
+        assert results["write"]["time"] > 0
+        assert results["draw"]["peak"] > 0
+        assert sum(count for count, _ in interface.by_method.values()) == interface.calls
+
+
+def test_compare_flags_slower_stages():
+    reference = {"rects": {"2": {stage: dict(time=0.01) for stage in STAGES}}}
+    report = {"rects": {"2": {stage: dict(time=0.01) for stage in STAGES}}}
+    report["rects"]["2"]["boolean"]["time"] = 0.03
+    assert compare(report, reference, 1.5) == [("rects", "2", "boolean", 3.0)]
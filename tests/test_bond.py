@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import sympy
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.interfaces.gds_recipes import Environment
+from HFSSdrawpy.parameters import DEFAULT, RLC
+from HFSSdrawpy.utils import Vector, variables
+
+
+def draw(airbridge, individual, length_value="3mm"):
+    pm = Modeler("gds")
+    chip = Body(pm, "chip")
+    length = pm.set_variable(length_value, name="length")
+    with chip([0, 0], [1, 0]):
+        (port_in,) = elt.create_port(chip, ["20um", "40um"], name="in")
+    with chip([length, "1mm"], [-1, 0]):
+        (port_out,) = elt.create_port(chip, ["20um", "40um"], name="out")
+    chip.draw_cable(port_in, port_out, fillet="50um", name="cable")
+    segments = [
+        [Vector(0, 0, 0), Vector(length / 2, 0, 0)],
+        [Vector(length / 2, 1e-3, 0), Vector(length, 1e-3, 0)],
+    ]
+    chip.draw_bond(
+        segments, "20um", "-20um", airbridge=airbridge, name=bond_name(airbridge, individual), individual=individual
+    )
+    return pm, chip
+
+
+def bond_name(airbridge, individual):
+    # the entities of all the modelers share the same names
+    return ("ab_" if airbridge else "wb_") + ("individual" if individual else "batched")
+
+
+def polygons(pm, chip, layer, name, env=None):
+    # sorted vertices of the polygons of the bonds on a layer, drawn or
+    # rebuilt from their recipes for the values of env
+    found = []
+    for entity in chip.entities.get(layer, []):
+        if entity.name.startswith(name):
+            if env is None:
+                obj = pm.interface.gds_object_instances[entity.name]
+            else:
+                obj = pm.interface.recipes[entity.name].build(env, 0)
+            for polygon in obj.polygons:
+                found.append(tuple(np.round(np.sort(polygon.ravel()), 12)))
+    return sorted(found)
+
+
+@pytest.mark.parametrize("airbridge", [True, False])
+def test_batched_bonds_match_individual(airbridge):
+    pm, chip = draw(airbridge, individual=False)
+    n_batched = sum(len(entities) for entities in chip.entities.values())
+    name = bond_name(airbridge, False)
+    batched = [polygons(pm, chip, layer, name) for layer in (DEFAULT, RLC)]
+    pm, chip = draw(airbridge, individual=True)
+    n_individual = sum(len(entities) for entities in chip.entities.values())
+    # 8 bonds: 3 rectangles per airbridge, 2 pads per wire bond, one entity per layer when batched
+    assert n_individual - n_batched == (3 * 8 - 2 if airbridge else 2 * 8 - 1)
+    name = bond_name(airbridge, True)
+    assert batched == [polygons(pm, chip, layer, name) for layer in (DEFAULT, RLC)]
+    assert [len(found) for found in batched] == ([8, 16] if airbridge else [16, 0])
+
+
+def test_batched_bonds_follow_variables():
+    pm, chip = draw(True, individual=False)
+    # the number of bonds does not change from 3mm to 3.4mm
+    env = Environment({sympy.Symbol("length"): np.array([3.4e-3])}, variables, 1)
+    name = bond_name(True, False)
+    swept = [polygons(pm, chip, layer, name, env) for layer in (DEFAULT, RLC)]
+    pm, chip = draw(True, individual=False, length_value="3.4mm")
+    assert swept == [polygons(pm, chip, layer, name) for layer in (DEFAULT, RLC)]
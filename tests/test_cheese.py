@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.interfaces.gds_modeler import reference_polygons
+from HFSSdrawpy.interfaces.gds_recipes import Environment, lattice_inside
+from HFSSdrawpy.parameters import GAP, TRACK
+from HFSSdrawpy.utils import variables
+
+HOLES = 7
+
+
+def draw(name):
+    pm = Modeler("gds")
+    chip = Body(pm, name)
+    plane = chip.rect([0, 0], ["1mm", "1mm"], layer=TRACK, name="plane")
+    chip.rect(["0.4mm", 0], ["0.2mm", "1mm"], layer=GAP, name="strip")
+    return pm, chip, plane
+
+
+def test_cheese_avoids_keepouts():
+    pm, chip, plane = draw("cheese_chip")
+    holes = chip.cheese(plane, "10um", "50um", keepout_margin="20um", layer=HOLES)
+    assert holes.layer == HOLES
+    # centers at 50um..950um, those at 400um..600um are closer than 20um to the strip
+    polygons = reference_polygons(pm.interface.gds_object_instances[holes.name])
+    centers = np.array([np.mean(polygon, axis=0) for polygon in polygons])
+    assert len(centers) == 14 * 19
+    assert np.allclose(np.unique(np.round(centers[:, 1], 9)), np.arange(1, 20) * 50e-6)
+    columns = np.unique(np.round(centers[:, 0], 9))
+    assert np.allclose(columns, [x * 50e-6 for x in range(1, 20) if not 8 <= x <= 12])
+    # the rows of the two blocks are referenced by two arrays
+    cell = pm.interface.gds_object_instances[holes.name].ref_cell
+    assert len(cell.references) == 2
+
+    # the recipe gives back the same holes
+    env = Environment({}, variables, 1)
+    rebuilt = pm.interface.recipes[holes.name].build(env, 0).polygons
+    key = lambda polygon: tuple(np.round(polygon, 12).ravel())  # noqa: E731
+    assert np.allclose(sorted(rebuilt, key=key), sorted(polygons, key=key))
+
+
+def test_cheese_outside_of_body_moves():
+    pm, chip, plane = draw("cheese_moved_chip")
+    with chip([0, 0], [0, 1]):
+        with pytest.raises(ValueError):
+            chip.cheese(plane, "10um", "50um")
+
+
+def test_lattice_inside_even_odd():
+    square = np.array([[0, 0], [4, 0], [4, 4], [0, 4]], dtype=float)
+    hole = np.array([[1, 1], [1, 3], [3, 3], [3, 1]], dtype=float) + 0.5
+    xs = ys = np.arange(5) + 0.25
+    inside = lattice_inside([square, hole], xs, ys)
+    grid = np.meshgrid(xs, ys)
+    in_square = (grid[0] < 4) & (grid[1] < 4)
+    in_hole = (grid[0] > 1.5) & (grid[0] < 3.5) & (grid[1] > 1.5) & (grid[1] < 3.5)
+    assert np.array_equal(inside, in_square & ~in_hole)
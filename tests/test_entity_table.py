@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.core.entity import EntityList
+from HFSSdrawpy.parameters import DEFAULT, GAP, TRACK
+
+
+def draw(name):
+    pm = Modeler("gds")
+    chip = Body(pm, name)
+    rects = [
+        chip.rect(["%dum" % (20 * ii), 0], ["10um", "10um"], layer=TRACK, name="%s_%d" % (name, ii))
+        for ii in range(5)
+    ]
+    gap = chip.rect([0, 0], ["100um", "10um"], layer=GAP, name=name + "_gap")
+    return pm, chip, rects, gap
+
+
+def test_layer_entities_behave_as_lists():
+    pm, chip, rects, gap = draw("table_chip")
+    track = chip.entities[TRACK]
+    assert isinstance(track, EntityList)
+    assert track == rects and len(track) == 5
+    assert track[1] is rects[1] and track[-1] is rects[-1] and track[1:3] == rects[1:3]
+    assert chip.entities[DEFAULT] == []
+
+    rects[2].delete()
+    assert track == rects[:2] + rects[3:]
+    assert rects[2] not in track and rects[3] in track
+    with pytest.raises(ValueError):
+        track.remove(rects[2])
+    with pytest.raises(IndexError):
+        track[4]
+
+    # the entities of a layer can be used as tools, and are then deleted
+    rects[0].subtract(chip.entities[GAP])
+    assert chip.entities[GAP] == []
+    assert not hasattr(gap, "__dict__")
+
+
+def test_indexing_follows_appends_and_removals():
+    entities = EntityList(range(1000))
+    assert entities[500] == 500
+    entities.append(1000)
+    assert entities[-1] == 1000 and entities[1000] == 1000
+    entities.remove(0)
+    assert entities[0] == 1 and entities[-1] == 1000 and entities[998:] == [999, 1000]
+    # appending an entity of the list keeps its place
+    entities.append(5)
+    assert entities[-1] == 1000 and len(entities) == 1000
+
+
+def test_columns():
+    pm, chip, rects, gap = draw("columns_chip")
+    rects[1].fillet("2um")
+    columns = chip.entities.columns()
+    assert list(columns["name"]) == [entity.name for entity in rects + [gap]]
+    assert list(columns["entity"][columns["is_fillet"]]) == [rects[1]]
+    assert list(columns["entity"][columns["layer"] == GAP]) == [gap]
+    columns = chip.entities.columns([GAP])
+    assert np.all(columns["dimension"] == 2) and len(columns["entity"]) == 1
@@ -0,0 +1,94 @@
+import os
+
+import gdspy
+import numpy as np
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler, generate_many
+from HFSSdrawpy.parameters import GAP, TRACK
+from HFSSdrawpy.profiling import Profiler
+from HFSSdrawpy.utils import Variables, val, variable_scope
+
+
+def build(pm, width, n_holes):
+    chip = Body(pm, "chip")
+    width = pm.set_variable(width, name="width")
+    plane = chip.rect([0, 0], ["1mm", "1mm"], layer=TRACK, name="plane")
+    holes = [
+        chip.rect(["%dum" % (100 * ii), "0.5mm"], [width, width], layer=GAP)
+        for ii in range(n_holes)
+    ]
+    plane.subtract(holes)
+
+
+def area(file):
+    library = gdspy.GdsLibrary(infile=file + "_chip.gds")
+    return library.cells["chip"].area()
+
+
+def test_threads_match_sequential_builds(tmp_path):
+    param_sets = [dict(width="%dum" % (10 + 5 * ii), n_holes=ii + 1) for ii in range(6)]
+    sequential = generate_many(build, param_sets, str(tmp_path), "sequential", workers=1)
+    threaded = generate_many(build, param_sets, str(tmp_path), "threaded", workers=3)
+    for ii, (report, threaded_report) in enumerate(zip(sequential, threaded)):
+        assert report["file"] == os.path.join(str(tmp_path), "sequential_%d" % ii)
+        assert threaded_report["params"] == param_sets[ii]
+        assert report["draw"] > 0 and report["write"] > 0
+        # each chip is evaluated with its own width
+        width = (10 + 5 * ii) * 1e-6
+        expected = 1e-6 - (ii + 1) * width**2
+        assert np.isclose(area(report["file"]), expected)
+        assert np.isclose(area(threaded_report["file"]), expected)
+
+
+def test_variable_scopes():
+    pms = [Modeler("gds"), Modeler("gds")]
+    lengths = [pm.set_variable(value, name="length") for pm, value in zip(pms, ["1mm", "2mm"])]
+    chips = [Body(pm, "chip") for pm in pms]
+    # each chip is drawn with the variables of its own modeler
+    for pm, chip, length, area in zip(pms, chips, lengths, [1e-6, 2e-6]):
+        rect = chip.rect([0, 0], [length, "1mm"], layer=TRACK)
+        assert np.isclose(pm.interface.gds_object_instances[rect.name].area(), area)
+        with chip([length, 0], [1, 0]):
+            (port,) = elt.create_port(chip, [length / 100], name="in")
+        assert np.allclose(port.val().pos[:2], [area * 1e3, 0])
+    # the script evaluates with the last modeler setting a variable unless told otherwise
+    assert val(lengths[0]) == 2e-3
+    with pms[0].variable_scope():
+        assert val(lengths[0]) == 1e-3
+    pms[0].set_variable("10um", name="width")
+    assert val(lengths[0]) == 1e-3
+
+
+def profiled_build(pm, width, n_holes, profiles):
+    with Profiler() as profiler:
+        build(pm, width, n_holes)
+    profiles[n_holes] = profiler
+
+
+def test_profilers_are_per_thread(tmp_path):
+    profiles = {}
+    param_sets = [dict(width="10um", n_holes=ii + 1, profiles=profiles) for ii in range(6)]
+    with Profiler() as profiler:
+        generate_many(profiled_build, param_sets, str(tmp_path), workers=3)
+        assert profiler.stack == []
+    # the chips built in the worker threads are recorded by their own profiler
+    assert not any(stats["operation"] == "Body.rect" for stats in profiler.operations())
+    for n_holes, chip_profiler in profiles.items():
+        operations = {stats["operation"]: stats for stats in chip_profiler.operations()}
+        assert operations["Body.rect"]["calls"] == n_holes + 1
+
+
+def test_port_cache_follows_the_variables():
+    pm = Modeler("gds")
+    chip = Body(pm, "chip")
+    track = pm.set_variable("10um", name="cached_track")
+    (port,) = elt.create_port(chip, [track], name="in")
+    assert np.isclose(port.val().widths[0], 10e-6)
+    # the port is evaluated with its modeler whatever the scope of the thread
+    other = Variables()
+    other.store(track, "20um")
+    with variable_scope(other):
+        assert np.isclose(port.val().widths[0], 10e-6)
+    pm.set_variable("30um", name="cached_track")
+    assert np.isclose(port.val().widths[0], 30e-6)
@@ -0,0 +1,161 @@
+import os
+from types import SimpleNamespace
+
+from HFSSdrawpy.core.incremental import IncrementalInterface
+
+
+class StandInInterface:
+    # records what reaches the model instead of driving HFSS
+    def __init__(self, objects=()):
+        self.calls = []
+        self.objects = list(objects)  # names of the objects in the model
+        self.listings = 0
+
+    def get_objects(self):
+        self.listings += 1
+        return list(self.objects)
+
+    def delete_all_objects(self):
+        self.calls.append(("delete_all_objects",))
+        self.objects = []
+
+    def delete_objects(self, names):
+        self.calls.append(("delete_objects", tuple(names)))
+        self.objects = [name for name in self.objects if name not in names]
+
+    def set_coor_sys(self, coor_sys):
+        pass
+
+    def rect(self, pos, size, **kwargs):
+        self.calls.append(("rect", kwargs["name"]))
+        self.objects.append(kwargs["name"])
+        return kwargs["name"]
+
+    def delete(self, entity):
+        self.calls.append(("delete", entity.name))
+        self.objects.remove(entity.name)
+
+    def subtract(self, blank_entities, tool_entities, keep_originals=False):
+        self.calls.append(("subtract", tuple(entity.name for entity in blank_entities)))
+
+    def copy(self, entity):
+        # the pasted object gets the first free name, as in HFSS
+        index = 1
+        while "%s_%d" % (entity.name, index) in self.objects:
+            index += 1
+        name = "%s_%d" % (entity.name, index)
+        self.calls.append(("copy", name))
+        self.objects.append(name)
+        return name
+
+    def unite(self, entities, keep_originals=False):
+        self.calls.append(("unite", tuple(entity.name for entity in entities)))
+        blank_entity = entities.pop(0)
+        if not keep_originals:
+            tool_names = [entity.name for entity in entities]
+            self.objects = [name for name in self.objects if name not in tool_names]
+        return blank_entity
+
+    def translate(self, entities, vector):
+        self.calls.append(("translate", tuple(entity.name for entity in entities)))
+
+
+def run(record_file, size_b, objects=()):
+    interface = StandInInterface(objects)
+    incremental = IncrementalInterface(interface, record_file)
+    for body_name, size in (("A", 1), ("B", size_b)):
+        body = SimpleNamespace(name=body_name)
+        incremental.set_coor_sys(body_name)
+        incremental.rect([0, 0], [size, size], name=body_name + "_rect")
+        entity = SimpleNamespace(name=body_name + "_rect", body=body)
+        incremental.translate([entity], [1, 0, 0])
+    incremental.commit()
+    return interface.calls
+
+
+def run_unite(record_file, size, objects=()):
+    # the body pastes a copy of a rectangle and unites the original with it
+    interface = StandInInterface(objects)
+    incremental = IncrementalInterface(interface, record_file)
+    body = SimpleNamespace(name="C")
+    incremental.set_coor_sys("C")
+    incremental.rect([0, 0], [size, size], name="C_rect")
+    rect = SimpleNamespace(name="C_rect", body=body)
+    pasted = SimpleNamespace(name=incremental.copy(rect), body=body)
+    entities = [rect, pasted]
+    united = incremental.unite(entities, keep_originals=True)
+    assert united is rect and entities == [pasted]
+    incremental.commit()
+    return interface
+
+
+def test_only_changed_bodies_are_redrawn(tmp_path):
+    record_file = os.path.join(tmp_path, "design.drawpy.json")
+    first = run(record_file, 1)
+    assert first[0] == ("delete_all_objects",)
+    assert ("rect", "A_rect") in first and ("rect", "B_rect") in first
+
+    assert run(record_file, 1) == []
+
+    third = run(record_file, 2)
+    assert third == [
+        ("delete_objects", ("B_rect",)),
+        ("rect", "B_rect"),
+        ("translate", ("B_rect",)),
+    ]
+
+
+def run_cross(record_file, hole_size, objects=()):
+    # body A cuts the hole of body B out of its plane
+    interface = StandInInterface(objects)
+    incremental = IncrementalInterface(interface, record_file)
+    body_a, body_b = SimpleNamespace(name="A"), SimpleNamespace(name="B")
+    incremental.set_coor_sys("B")
+    incremental.rect([0, 0], [hole_size, hole_size], name="hole")
+    hole = SimpleNamespace(name="hole", body=body_b)
+    incremental.set_coor_sys("A")
+    incremental.rect([0, 0], [10, 10], name="plane")
+    plane = SimpleNamespace(name="plane", body=body_a)
+    incremental.subtract([plane], [hole], keep_originals=True)
+    incremental.delete(hole)
+    incremental.commit()
+    return interface
+
+
+def test_bodies_follow_the_entities_they_use(tmp_path):
+    record_file = os.path.join(tmp_path, "design.drawpy.json")
+    first = run_cross(record_file, 1)
+    second = run_cross(record_file, 1, objects=first.objects)
+    assert second.calls == []
+
+    third = run_cross(record_file, 2, objects=second.objects)
+    assert third.calls == [
+        ("delete_objects", ()),
+        ("rect", "hole"),
+        ("delete_objects", ("plane",)),
+        ("rect", "plane"),
+        ("subtract", ("plane",)),
+        ("delete", "hole"),
+    ]
+    # the model is only listed for the objects named by the modeler
+    assert third.listings == 0
+
+
+def test_replay_reads_created_names_from_the_model(tmp_path):
+    record_file = os.path.join(tmp_path, "design.drawpy.json")
+    first = run_unite(record_file, 1)
+    assert first.objects == ["C_rect", "C_rect_1"]
+
+    # the skipped unite still hands the blank entity back to the modeler
+    second = run_unite(record_file, 1, objects=first.objects)
+    assert second.calls == []
+
+    # the pasted object is deleted under the name the modeler gave it
+    third = run_unite(record_file, 2, objects=second.objects)
+    assert third.calls == [
+        ("delete_objects", ("C_rect", "C_rect_1")),
+        ("rect", "C_rect"),
+        ("copy", "C_rect_1"),
+        ("unite", ("C_rect", "C_rect_1")),
+    ]
+    assert third.objects == ["C_rect", "C_rect_1"]
@@ -0,0 +1,125 @@
+import os
+
+import gdspy
+import numpy as np
+import sympy
+
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.interfaces.gds_modeler import REFERENCES, reference_polygons
+from HFSSdrawpy.interfaces.gds_recipes import Environment
+from HFSSdrawpy.parameters import GAP, TRACK
+from HFSSdrawpy.utils import variables
+
+POSITIONS = [["0.1mm", 0], ["0.3mm", "0.1mm"], ["0.5mm", 0], ["0.7mm", "-0.1mm"]]
+ORIENTATIONS = [[1, 0], [0, 1], [-1, 0], [0, -1]]
+
+
+def cross(body, size):
+    body.rect([0, 0], [size, "10um"], layer=TRACK, name="arm_x")
+    body.rect([0, 0], ["10um", size], layer=GAP, name="arm_y")
+
+
+def draw(instanced, name):
+    pm = Modeler("gds")
+    chip = Body(pm, name)
+    size = pm.set_variable("50um", name="cross_size")
+    with chip(["1mm", 0], [0, 1]):
+        if instanced:
+            chip.instance(cross, POSITIONS, ORIENTATIONS, size=size)
+        else:
+            for pos, ori in zip(POSITIONS, ORIENTATIONS):
+                with chip(pos, ori):
+                    cross(chip, size)
+    return pm, chip
+
+
+def polygons(pm, chip, layer, env=None):
+    # sorted vertices of the polygons of a layer, drawn or rebuilt from the recipes
+    found = []
+    for entity in chip.entities.get(layer, []):
+        if env is None:
+            obj = pm.interface.gds_object_instances[entity.name]
+            obj_polygons = obj.get_polygons() if isinstance(obj, REFERENCES) else obj.polygons
+        else:
+            obj_polygons = pm.interface.recipes[entity.name].build(env, 0).polygons
+        for polygon in obj_polygons:
+            found.append(tuple(np.round(np.sort(polygon.ravel()), 12)))
+    return sorted(found)
+
+
+def test_instances_match_flat_drawing():
+    pm, chip = draw(True, "instance_chip")
+    assert [len(chip.entities[layer]) for layer in (TRACK, GAP)] == [4, 4]
+    flat_pm, flat_chip = draw(False, "flat_chip")
+    for layer in (TRACK, GAP):
+        assert polygons(pm, chip, layer) == polygons(flat_pm, flat_chip, layer)
+
+    # the references are rebuilt as flat polygons for other values
+    env = Environment({sympy.Symbol("cross_size"): np.array([80e-6])}, variables, 1)
+    rebuilt = polygons(pm, chip, TRACK, env)
+    flat_pm, flat_chip = draw(False, "flat_chip")
+    flat_pm.set_variable("80um", name="cross_size")
+    assert rebuilt != polygons(flat_pm, flat_chip, TRACK)  # drawn for 50um
+    assert rebuilt == polygons(flat_pm, flat_chip, TRACK, env)
+
+
+def test_instances_in_booleans():
+    areas = []
+    for instanced, name in [(True, "boolean_chip"), (False, "boolean_flat_chip")]:
+        pm, chip = draw(instanced, name)
+        plane = chip.rect([0, "-1mm"], ["2mm", "2mm"], layer=TRACK, name="plane")
+        plane.subtract(chip.entities[GAP])
+        areas.append(pm.interface.gds_object_instances[plane.name].area())
+    assert np.isclose(areas[0], areas[1])
+
+
+def test_instances_written_once(tmp_path):
+    pm, chip = draw(True, "written_chip")
+    pm.generate_gds(str(tmp_path), "instances")
+    library = gdspy.GdsLibrary(infile=os.path.join(str(tmp_path), "instances_written_chip.gds"))
+    cell = library.cells["written_chip"]
+    assert len(cell.polygons) == 0
+    assert len(cell.references) == 8
+    # each arm is stored once
+    assert sum(len(cell.polygons) for cell in library.cells.values()) == 2
+    assert len(cell.get_polygons()) == 8
+
+
+def test_rect_array_stays_an_array():
+    pm = Modeler("gds")
+    chip = Body(pm, "array_chip")
+    with chip(["1mm", 0], [0, 1]):
+        holes = chip.rect_array([0, 0], ["10um", "10um"], 30, 20, ["50um", "40um"], layer=GAP)
+    array = pm.interface.gds_object_instances[holes.name]
+    assert isinstance(array, gdspy.CellArray)
+    assert not any(name.startswith("cell_to_copy") for name in pm.interface.gds_cells)
+
+    key = lambda polygon: tuple(np.round(polygon, 12).ravel())  # noqa: E731
+    flat = sorted(reference_polygons(array), key=key)
+    assert len(flat) == 600
+    assert np.allclose(flat, sorted(array.get_polygons(), key=key), atol=1e-15)
+
+    plane = chip.rect([0, 0], ["2mm", "2mm"], layer=TRACK, name="array_plane")
+    plane.subtract([holes])
+    area = pm.interface.gds_object_instances[plane.name].area()
+    assert np.isclose(area, 4e-6 - 600 * 1e-10)
+    # the unit cell is released with the array
+    assert pm.interface.component_cells == {}
+
+
+def test_array_cell_released_with_its_last_reference(tmp_path):
+    pm = Modeler("gds")
+    chip = Body(pm, "released_chip")
+    holes = chip.rect_array([0, 0], ["10um", "10um"], 3, 2, ["50um", "40um"], layer=GAP)
+    copied = holes.copy()
+    unit_cell = "cell_to_copy_" + holes.name
+    holes.delete()
+    assert unit_cell in pm.interface.component_cells
+    copied.fillet("1um")  # flattens the copy
+    assert unit_cell not in pm.interface.component_cells
+
+    chip.rect_array([0, 0], ["10um", "10um"], 3, 2, ["50um", "40um"], layer=GAP)
+    chip.entities[GAP][-1].delete()
+    pm.generate_gds(str(tmp_path), "released")
+    library = gdspy.GdsLibrary(infile=os.path.join(str(tmp_path), "released_released_chip.gds"))
+    assert list(library.cells) == ["released_chip"]
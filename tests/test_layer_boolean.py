@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+import sympy
+
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.core.modeler import parse_layer_expression
+from HFSSdrawpy.interfaces.gds_recipes import Environment
+from HFSSdrawpy.parameters import DEFAULT, GAP, MASK, TRACK
+from HFSSdrawpy.utils import variables
+
+
+def draw(name):
+    # a ground plane with a row of gaps, two of them joined by a track
+    pm = Modeler("gds")
+    chip = Body(pm, name)
+    gap = pm.set_variable("40um", name="layer_gap")
+    chip.rect([0, 0], ["2mm", "1mm"], layer=TRACK, name=name + "_plane")
+    for ii in range(10):
+        chip.rect(["%dum" % (100 + 150 * ii), "0.3mm"], [gap, "0.4mm"], layer=GAP)
+    chip.rect(["0.1mm", "0.45mm"], ["0.2mm", "0.1mm"], layer=TRACK, name=name + "_track")
+    return pm, chip
+
+
+def area(pm, entity, env=None):
+    if env is None:
+        return pm.interface.gds_object_instances[entity.name].area()
+    return pm.interface.recipes[entity.name].build(env, 0).area()
+
+
+def test_layer_expression():
+    assert parse_layer_expression(TRACK) == TRACK
+    assert parse_layer_expression("DEFAULT - GAP + TRACK") == (
+        "or",
+        ("not", DEFAULT, GAP),
+        TRACK,
+    )
+    assert parse_layer_expression("TRACK & (MASK ^ 7)") == ("and", TRACK, ("xor", MASK, 7))
+    for expr in ["TRACK * GAP", "TRACKS - GAP", "TRACK -", "-TRACK"]:
+        with pytest.raises(ValueError):
+            parse_layer_expression(expr)
+
+
+@pytest.mark.parametrize("tile_size", [None, "0.3mm"])
+def test_layer_boolean_matches_subtract(tile_size):
+    name = "layer_chip" if tile_size is None else "tiled_layer_chip"
+    pm, chip = draw(name + "_subtract")
+    plane = chip.entities[TRACK][0]
+    plane.subtract(chip.entities[GAP])
+    expected = area(pm, plane)
+    assert np.isclose(expected, 2e-6 - 10 * 40e-6 * 0.4e-3)
+
+    pm, chip = draw(name)
+    # the track lies on the plane, the layer is cut by the gaps only
+    (result,) = pm.layer_boolean(TRACK, "TRACK - GAP", tile_size=tile_size)
+    assert chip.entities[TRACK] == [result]
+    assert chip.entities[GAP] == []
+    assert np.isclose(area(pm, result), expected)
+    (result,) = pm.layer_boolean(DEFAULT, "TRACK + GAP", tile_size=tile_size)
+    assert np.isclose(area(pm, result), expected)
+
+    pm, chip = draw(name + "_kept")
+    (result,) = pm.layer_boolean(MASK, "TRACK - GAP", keep_originals=True, tile_size=tile_size)
+    assert len(chip.entities[TRACK]) == 2 and len(chip.entities[GAP]) == 10
+    assert np.isclose(area(pm, result), 2e-6 - 10 * 40e-6 * 0.4e-3)
+
+    # the result follows the variables
+    env = Environment({sympy.Symbol("layer_gap"): np.array([60e-6])}, variables, 1)
+    assert np.isclose(area(pm, result, env), 2e-6 - 10 * 60e-6 * 0.4e-3)
+
+
+def test_layer_boolean_outside_of_with_blocks():
+    pm, chip = draw("with_layer_chip")
+    with chip(["1mm", 0], [0, 1]):
+        with pytest.raises(ValueError):
+            pm.layer_boolean(TRACK, "TRACK - GAP")
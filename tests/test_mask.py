@@ -0,0 +1,74 @@
+import gdspy
+import numpy as np
+import pytest
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.parameters import GAP, MASK, TRACK
+
+
+def draw(name):
+    # two touching gaps around a track
+    pm = Modeler("gds")
+    chip = Body(pm, name)
+    chip.rect([0, "-10um"], ["100um", "20um"], layer=TRACK, name=name + "_track")
+    chip.rect([0, "-20um"], ["100um", "20um"], layer=GAP, name=name + "_gap_low")
+    chip.rect([0, 0], ["100um", "20um"], layer=GAP, name=name + "_gap_high")
+    return pm, chip
+
+
+def areas(file, cell_name):
+    # {layer: area} of a written cell
+    library = gdspy.GdsLibrary(infile=file + "_%s.gds" % cell_name)
+    polygons = library.cells[cell_name].get_polygons(by_spec=True)
+    return {layer: gdspy.PolygonSet(polygons[layer, 0]).area() for layer, _ in polygons}
+
+
+def test_mask_survives_the_subtracted_gaps(tmp_path):
+    pm = Modeler("gds")
+    chip = Body(pm, "mask_chip")
+    chip.is_mask = True
+    chip.gap_mask = pm.set_variable("5um", name="gap_mask")
+    with chip([0, 0], [1, 0]):
+        (port_in,) = elt.create_port(chip, ["20um", "40um"], name="in")
+    with chip(["1mm", 0], [-1, 0]):
+        (port_out,) = elt.create_port(chip, ["20um", "40um"], name="out")
+    chip.draw_cable(port_in, port_out, name="cable")
+    plane = chip.rect([0, "-0.5mm"], ["1mm", "1mm"], layer=TRACK, name="plane")
+    plane.subtract(chip.entities[GAP])
+    file = str(tmp_path / "mask")
+    pm.generate_gds(str(tmp_path), "mask")
+    # the mask is drawn with the cable, wider than its gap by gap_mask
+    assert np.isclose(areas(file, "mask_chip")[MASK], 1e-3 * 50e-6)
+
+    (file,) = pm.sweep_gds(str(tmp_path), "swept", {"gap_mask": ["10um"]})
+    assert np.isclose(areas(file, "mask_chip")[MASK], 1e-3 * 60e-6)
+
+
+def test_lumped_line_left_to_the_layer_overdev():
+    pm = Modeler("gds")
+    chip = Body(pm, "line_chip")
+    chip.overdev = 1e-6
+    elt.draw_connector(chip, "20um", "10um", "100um", name="connector")
+    line = pm.interface.gds_object_instances["connector_line"]
+    assert np.allclose(line.points, [[5e-6, 0], [10e-6, 0]])
+
+
+def test_overdev_grows_tracks_and_shrinks_gaps(tmp_path):
+    pm, chip = draw("overdev_chip")
+    pm.is_overdev = True
+    pm.overdev = 1e-6
+    for _ in range(2):
+        pm.generate_gds(str(tmp_path), "overdev")
+        layers = areas(str(tmp_path / "overdev"), "overdev_chip")
+        assert set(layers) == {TRACK, GAP}
+        assert np.isclose(layers[TRACK], 102e-6 * 22e-6)
+        assert np.isclose(layers[GAP], 98e-6 * 38e-6)
+    assert [entity.name for entity in chip.entities[TRACK]] == ["overdev_chip_track"]
+
+
+def test_offset_layers_outside_of_with_blocks():
+    pm, chip = draw("with_mask_chip")
+    with chip(["1mm", 0], [0, 1]):
+        with pytest.raises(ValueError):
+            pm.offset_layers(GAP, "5um", out_layer=MASK)
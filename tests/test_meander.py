@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.path_finding.path_finder import Path
+
+
+def ports(chip, suffix, out_pos="3mm", out_ori=[-1, 0]):
+    with chip(["0mm", "0mm"], [1, 0]):
+        (port_in,) = elt.create_port(chip, ["20um", "40um"], name="in_" + suffix)
+    with chip([out_pos, "0.5mm"], out_ori):
+        (port_out,) = elt.create_port(chip, ["20um", "40um"], name="out_" + suffix)
+    return port_in, port_out
+
+
+@pytest.mark.parametrize(
+    "to_meander, target",
+    [([1, 0, 1], 6e-3), ([1, 0, 1], 4.5e-3), ([0, 0, 1], 8e-3), ([-1, 0, 0], 5e-3)],
+)
+def test_path_reaches_target_length(to_meander, target):
+    pm = Modeler("gds")
+    chip = Body(pm, "meander_chip")
+    port_in, port_out = ports(chip, "path")
+    path = Path("cable", port_in, port_out, 50e-6)
+    path.clean()
+    path.meander(to_meander, 0, 0, target_length=target)
+    path.clean()
+    assert np.isclose(path.length(), target, rtol=1e-9)
+
+
+def test_target_too_short():
+    pm = Modeler("gds")
+    chip = Body(pm, "meander_chip")
+    port_in, port_out = ports(chip, "short")
+    path = Path("cable", port_in, port_out, 50e-6)
+    path.clean()
+    with pytest.raises(ValueError):
+        path.meander([1, 0, 1], 0, 0, target_length=1e-3)
+
+
+def test_draw_cable_target_length():
+    pm = Modeler("gds")
+    chip = Body(pm, "meander_chip")
+    port_in, port_out = ports(chip, "cable")
+    length = chip.draw_cable(
+        port_in, port_out, fillet="50um", to_meander=[1, 0, 1], target_length="7mm", name="cable"
+    )
+    assert np.isclose(length, 7e-3, rtol=1e-9)
+
+
+def test_path_values_follow_points():
+    pm = Modeler("gds")
+    chip = Body(pm, "meander_chip")
+    port_in, port_out = ports(chip, "values")
+    path = Path("cable", port_in, port_out, 50e-6)
+    path.points = path.points[:1] + path.points + path.points[-1:]  # duplicated ends
+    assert path.values.shape == (len(path.points), 3)
+    path.clean()
+    corners = [[0, 0, 0], [1.5e-3, 0, 0], [1.5e-3, 0.5e-3, 0], [3e-3, 0.5e-3, 0]]
+    assert np.allclose(path.values, corners)
+    path.meander([1, 0, 1], 200e-6, 0)
+    assert len(path.values) == len(path.points) > 4
+
+
+def test_cable_lengths_report():
+    pm = Modeler("gds")
+    chip = Body(pm, "meander_chip")
+    port_in, port_out = ports(chip, "report")
+    length = chip.draw_cable(
+        port_in, port_out, fillet="50um", to_meander=[1, 0, 1], meander_length="0.3mm", name="rep"
+    )
+    report = chip.cable_lengths("rep")
+    assert report["length"] == length
+    assert np.isclose(report["straight"].sum() + report["arcs"].sum() + report["adaptor"], length)
+    assert len(report["arcs"]) == len(report["straight"]) - 1
+    assert np.all(report["straight"] >= 0)
+    assert np.allclose(report["arcs"], np.pi / 2 * 50e-6)
+    assert list(chip.cable_lengths()) == ["rep"]
+    with pytest.raises(ValueError):
+        chip.cable_lengths("missing")
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import sympy
+
+from benchmarks.bench_numeric_mode import draw_chip
+from HFSSdrawpy import Body, Modeler
+
+
+def draw(numeric):
+    pm = Modeler("gds", numeric=numeric)
+    ground_plane = draw_chip(pm, 2)
+    polygons = pm.interface.gds_object_instances[ground_plane.name]
+    return pm, polygons.area()
+
+
+def test_numeric_matches_symbolic():
+    pm, area = draw(False)
+    pm_numeric, area_numeric = draw(True)
+    assert np.isclose(area, area_numeric, rtol=1e-9)
+    assert isinstance(pm_numeric.set_variable("1um", name="width"), float)
+
+
+def test_numeric_is_gds_only():
+    with pytest.raises(ValueError):
+        Modeler("hfss", numeric=True)
+
+
+def test_body_set_variable():
+    for numeric in (False, True):
+        pm = Modeler("gds", numeric=numeric)
+        chip = Body(pm, "chip")
+        width = chip.set_variable("1um", name="width")
+        assert isinstance(width, float) == numeric
+        assert float(pm.variables[sympy.Symbol("width")]) == 1e-6
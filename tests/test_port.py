@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.core.port import Port
+from HFSSdrawpy.utils import Vector
+
+
+def test_val_is_cached_until_the_port_changes():
+    pm = Modeler("gds")
+    chip = Body(pm, "port_chip")
+    track = pm.set_variable("20um", name="port_track")
+    with chip(["1mm", "0mm"], [0, 1]):
+        (port,) = elt.create_port(chip, [track, track + 20e-6], name="cached")
+    evaluated = port.val()
+    assert port.val() is evaluated
+    assert np.allclose(evaluated.pos, [1e-3, 0, 0])
+    assert np.allclose(evaluated.widths, [20e-6, 40e-6])
+
+    Port.translate_ports([port], [1e-3, 0, 0])
+    assert np.allclose(port.val().pos, [2e-3, 0, 0])
+    Port.rotate_ports([port], 90)
+    assert np.allclose(port.val().ori, [-1, 0, 0])
+
+    port.widths.append(60e-6)  # in place, as for the mask
+    port.offsets.append(0)
+    port.N += 1
+    assert np.allclose(port.val().widths, [20e-6, 40e-6, 60e-6])
+
+    evaluated = port.val()
+    pm.set_variable("30um", name="port_track")
+    assert port.val() is not evaluated
+    assert np.allclose(port.val().widths[:2], [30e-6, 50e-6])
+    pm.set_variable("30um", name="port_track")  # same value
+    assert port.val() is port.val()
+
+
+def test_snapshot_is_not_moved_with_the_body():
+    pm = Modeler("gds")
+    chip = Body(pm, "port_chip")
+    (port,) = elt.create_port(chip, ["20um", "40um"], name="outside")
+    with chip(["1mm", "0mm"], [1, 0]):
+        evaluated = port.val()
+    assert port.val() is evaluated
+    assert np.allclose(evaluated.pos, [0, 0, 0])
+
+
+def legacy_move(port, angle, vector):
+    # per port rotation and translation done before move_ports
+    rad = angle / 180 * np.pi
+    rotate_matrix = np.array([[np.cos(rad), np.sin(-rad)], [np.sin(rad), np.cos(rad)]])
+    ori = rotate_matrix.dot(port.ori[0:2])
+    posx = port.pos[0] * math.cos(rad) + port.pos[1] * math.sin(-rad)
+    posy = port.pos[0] * math.sin(rad) + port.pos[1] * math.cos(rad)
+    return Vector([posx, posy]) + Vector(vector), ori
+
+
+def test_move_ports_matches_per_port_moves():
+    pm = Modeler("gds")
+    chip = Body(pm, "port_chip")
+    x = pm.set_variable("1mm", name="port_x")
+    positions = [[0, 0], [x, 2e-4], [3e-4, -x], [1e-4, 5e-4]]
+    ports = [
+        Port(chip, "moved", pos, [1, 0], [1e-5], ["track"], [1], [0], False) for pos in positions
+    ]
+    for angle, vector in ((90, [x, 0, 0]), (30, [1e-3, 2e-3, 0]), (-45, [0, x, 0])):
+        expected = [legacy_move(port, angle, vector) for port in ports]
+        Port.move_ports(ports, angle, vector)
+        for port, (pos, ori) in zip(ports, expected):
+            assert str(port.pos) == str(pos)
+            assert np.allclose(port.ori, ori, rtol=0, atol=1e-15)
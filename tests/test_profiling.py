@@ -0,0 +1,39 @@
+import json
+import os
+
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.parameters import TRACK
+from HFSSdrawpy.profiling import Profiler
+
+
+def draw(pm, body_name):
+    body = Body(pm, body_name)
+    size = pm.set_variable("10um", name="size")
+    rects = [body.rect([ii * size, 0], [size, size], layer=TRACK, name="rect") for ii in range(3)]
+    body.unite(rects)
+
+
+def test_operations_are_recorded_per_body(tmp_path):
+    pm = Modeler("gds")
+    with Profiler() as profiler:
+        draw(pm, "profiled")
+    draw(pm, "not_profiled")
+
+    stats = {(op["operation"], op["body"]): op for op in profiler.operations()}
+    rect = stats[("Body.rect", "profiled")]
+    assert rect["calls"] == 3 and rect["entities"] == 3
+    assert rect["cumulative"] >= rect["self"] > 0
+    # the interface calls are attributed to the body of the calling operation
+    assert stats[("GdsModeler.rect", "profiled")]["calls"] == 3
+    assert all(op["body"] != "not_profiled" for op in profiler.operations())
+
+    file = os.path.join(tmp_path, "profile.json")
+    profiler.to_json(file)
+    with open(file) as f:
+        assert len(json.load(f)["operations"]) == len(stats)
+
+    for line in profiler.to_folded().splitlines():
+        stack, microseconds = line.rsplit(" ", 1)
+        assert stack.split(";")[0] in ("profiled", "Global")
+        assert int(microseconds) >= 0
+    assert "profiled;Body.rect;GdsModeler.rect" in profiler.stacks
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.parameters import GAP, TRACK
+
+
+def draw(pm, hole_size="20um"):
+    chip = Body(pm, "chip")
+    hole = pm.set_variable(hole_size, name="redraw_hole")
+    shift = pm.set_variable("1mm", name="redraw_shift")
+    track = pm.set_variable("10um", name="redraw_track")
+    pitch = pm.set_variable(5 * hole, name="redraw_pitch")
+    plane = chip.rect([0, 0], ["1mm", "1mm"], layer=TRACK, name="plane")
+    holes = chip.rect_array(["50um", "50um"], [hole, hole], 3, 3, [pitch, pitch], layer=GAP)
+    plane.subtract([holes])
+    with chip([shift, 0], [1, 0]):
+        chip.rect([0, 0], ["0.1mm", "0.1mm"], layer=TRACK, name="moved")
+        elt.create_port(chip, [track, 2 * track], name="in")
+    chip.rect([0, "2mm"], ["0.1mm", "0.1mm"], layer=TRACK, name="fixed")
+    return chip
+
+
+def areas(pm):
+    objects = pm.interface.gds_object_instances
+    return {name: objects[name].area() for name in ["plane", "moved", "fixed"]}
+
+
+def test_affected_by():
+    pm = Modeler("gds")
+    draw(pm)
+    entities, ports = pm.affected_by("redraw_hole")
+    # the holes are deleted, the plane they were subtracted from remains
+    assert [entity.name for entity in entities] == ["plane"] and ports == []
+    entities, ports = pm.affected_by(["redraw_track"])
+    assert {entity.name for entity in entities} == {"_in_track", "_in_gap"}
+    assert {port.name for port in ports} == {"in", "in_r"}
+    entities, _ = pm.affected_by("redraw_shift")
+    assert {entity.name for entity in entities} == {"moved", "_in_track", "_in_gap"}
+    assert pm.affected_by("redraw_pitch")[0] == pm.affected_by("redraw_hole")[0]
+
+
+def test_regenerate_matches_a_new_drawing():
+    pm = Modeler("gds", regenerate=True)
+    draw(pm)
+    objects = dict(pm.interface.gds_object_instances)
+    pm.set_variable("40um", name="redraw_hole")
+    pm.set_variable("2mm", name="redraw_shift")
+    expected = Modeler("gds")
+    draw(expected, "40um")
+    expected.set_variable("2mm", name="redraw_shift")
+    expected.redraw("redraw_shift")
+    for name, area in areas(expected).items():
+        assert np.isclose(areas(pm)[name], area)
+    assert np.isclose(areas(pm)["plane"], 1e-6 - 9 * 40e-6**2)
+    # the other entities are left untouched
+    assert pm.interface.gds_object_instances["fixed"] is objects["fixed"]
+    assert pm.interface.gds_object_instances["moved"] is not objects["moved"]
+    bounding_box = pm.interface.gds_object_instances["moved"].get_bounding_box()
+    assert np.allclose(bounding_box[0], [2e-3, 0])
+
+
+def test_redraw_is_gds_only():
+    with pytest.raises(ValueError):
+        Modeler("gds", numeric=True, regenerate=True)
+    with pytest.raises(ValueError):
+        Modeler("gds", numeric=True).redraw("redraw_hole")
@@ -0,0 +1,64 @@
+import gc
+import weakref
+
+import gdspy
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.parameters import GAP, TRACK
+
+
+def draw(pm):
+    chip = Body(pm, "chip")
+    with chip([0, 0], [1, 0]):
+        (port_in,) = elt.create_port(chip, ["20um", "40um"], name="in")
+    with chip(["1mm", 0], [-1, 0]):
+        (port_out,) = elt.create_port(chip, ["20um", "40um"], name="out")
+    chip.draw_cable(port_in, port_out, name="cable")
+    plane = chip.rect([0, "-0.5mm"], ["1mm", "1mm"], layer=TRACK, name="plane")
+    plane.subtract(chip.entities[GAP])
+    return chip, plane
+
+
+def test_modelers_are_independent():
+    libraries = gdspy.current_library
+    pms = [Modeler("gds"), Modeler("gds")]
+    planes = [draw(pm)[1] for pm in pms]
+    # the same names are used by both modelers
+    assert [plane.name for plane in planes] == ["plane", "plane"]
+    assert set(pms[0].port_instances) == {"in", "in_r", "out", "out_r"}
+    for pm, plane in zip(pms, planes):
+        assert pm.entity_instances["plane"] is plane
+        assert pm.interface.gds_object_instances["plane"] is not None
+    assert pms[0].interface.gds_cells["chip"] is not pms[1].interface.gds_cells["chip"]
+    # the gdspy global library is left untouched
+    assert gdspy.current_library is libraries
+    assert "chip" not in gdspy.current_library.cells
+
+
+def test_reset_releases_the_layout():
+    pm = Modeler("gds")
+    chip, plane = draw(pm)
+    # the entities and ports keep their body alive
+    reference = weakref.ref(chip)
+    del chip, plane
+    pm.reset()
+    gc.collect()
+    assert reference() is None
+    assert not pm.entity_instances and not pm.port_instances and not pm.body_instances
+    assert not pm.interface.gds_object_instances and not pm.interface.recipes
+
+    # the modeler draws the same layout again, with the same names
+    chip, plane = draw(pm)
+    assert plane.name == "plane" and pm.bodies == [chip]
+
+
+def test_split_replaces_the_reversed_port():
+    pm = Modeler("gds")
+    chip = Body(pm, "chip")
+    (port,) = elt.create_port(chip, ["10um", "30um"], subnames=["track", "gap"], name="in")
+    old_reversed = port.r
+    (track,) = port.split(["track"])
+    assert port.subnames == ["gap"] and port.r is not old_reversed
+    assert pm.port_instances["in_r"] is port.r
+    assert set(pm.port_instances) == {"in", "in_r", "in_track", "in_track_r"}
@@ -0,0 +1,126 @@
+import gdspy
+import numpy as np
+
+import HFSSdrawpy.libraries.example_elements as elt
+from benchmarks.bench_router import legacy_points
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.parameters import TRACK
+from HFSSdrawpy.path_finding.path_finder import Path
+from HFSSdrawpy.path_finding.router import LEAD, Obstacles, Router
+from HFSSdrawpy.utils import Vector, val
+
+FILLET = 50e-6
+
+
+def check_route(points, obstacles, fillet=FILLET):
+    values = np.array([val(point)[:2] for point in points], dtype=float)
+    segments = np.abs(np.diff(values, axis=0))
+    assert np.all(segments.min(axis=1) < 1e-12), "not a Manhattan path"
+    lengths = segments.max(axis=1)
+    assert lengths[0] >= LEAD * fillet * (1 - 1e-9) and lengths[-1] >= LEAD * fillet * (1 - 1e-9)
+    assert np.all(lengths[1:-1] >= 2 * fillet * (1 - 1e-9))
+    assert not obstacles.blocks(values)
+
+
+def test_route_around_box():
+    box = [0.4e-3, -0.2e-3, 0.6e-3, 0.2e-3]
+    router = Router([box])
+    points = router.route([0, 0], [1, 0], [1e-3, 0], [-1, 0], FILLET, width=20e-6)
+    assert points is not None
+    check_route(points, Obstacles([box]).grown(10e-6))
+
+
+def test_route_many_avoids_previous_cables():
+    router = Router(clearance=10e-6)
+    first, second = router.route_many(
+        [
+            ([0, 0], [1, 0], [1e-3, 0], [-1, 0], FILLET, 20e-6),
+            ([0.5e-3, -0.5e-3], [0, 1], [0.5e-3, 0.5e-3], [0, -1], FILLET, 20e-6),
+        ]
+    )
+    assert len(first) == 2  # straight
+    cable = Obstacles()
+    cable.add_path(np.array([val(point)[:2] for point in first], dtype=float), 20e-6)
+    check_route(second, cable.grown(20e-6))
+
+
+def test_route_keeps_expressions():
+    pm = Modeler("gds")
+    x = pm.set_variable("1mm", name="router_x")
+    router = Router([[0.4e-3, -0.2e-3, 0.6e-3, 0.2e-3]])
+    points = router.route([0, 0], [1, 0], [x, 0], [-1, 0], FILLET)
+    assert any("router_x" in str(point) for point in points[1:-1])
+
+
+def test_path_choice_unchanged():
+    pm = Modeler("gds")
+    chip = Body(pm, "router_chip")
+    x = pm.set_variable("1mm", name="x")
+    orientations = [[1, 0], [0, 1], [-1, 0], [0, -1]]
+    for in_ori in orientations:
+        for out_ori in orientations:
+            for out_pos in ([x, 0.7e-3], [0.2e-3, x], [-x, -0.5e-3]):
+                (port_in,) = chip.port(widths=[10e-6], name="in")
+                (port_out,) = chip.port(widths=[10e-6], name="out")
+                port_in.pos, port_in.ori = Vector([0, 0]), Vector(in_ori)
+                port_out.pos, port_out.ori = Vector(out_pos), Vector(out_ori)
+                path = Path("cable", port_in, port_out, FILLET)
+                if path.is_slanted:
+                    continue
+                legacy = legacy_points(path)
+                assert [str(point) for point in path.points] == [str(point) for point in legacy]
+
+
+def test_draw_cable_avoids_entities():
+    pm = Modeler("gds")
+    chip = Body(pm, "avoid_chip")
+    track, gap = "20um", "10um"
+    with chip(["0mm", "0mm"], [1, 0]):
+        (port_in,) = elt.create_port(chip, [track, "40um"], name="avoid_in")
+    with chip(["2mm", "0.1mm"], [-1, 0]):
+        (port_out,) = elt.create_port(chip, [track, "40um"], name="avoid_out")
+    obstacle = chip.rect(["0.8mm", "-0.5mm"], ["0.4mm", "1mm"], layer=TRACK, name="obstacle")
+    chip.draw_cable(
+        port_in, port_out, fillet="50um", avoid=[obstacle], clearance=gap, name="avoiding"
+    )
+    cable = pm.interface.gds_object_instances["avoiding_gap"]
+    box = pm.interface.gds_object_instances[obstacle.name]
+    assert gdspy.boolean(cable, box, "and") is None
+
+
+def test_route_many_untangles_congestion():
+    # the straight forward paths of the three cables overlap in the middle
+    router = Router(clearance=10e-6)
+    cables = [
+        ([0, ii * 0.2e-3], [1, 0], [2e-3, 1e-3 + ii * 0.2e-3], [-1, 0], FILLET, 20e-6)
+        for ii in range(3)
+    ]
+    preferred = [
+        [Vector(start), Vector([1e-3, start[1]]), Vector([1e-3, end[1]]), Vector(end)]
+        for start, _, end, *_ in cables
+    ]
+    routes = router.route_many(cables, preferred=preferred)
+    for ii, route in enumerate(routes):
+        others = Obstacles()
+        for jj, other in enumerate(routes):
+            if jj != ii:
+                others.add_path(np.array([val(point)[:2] for point in other]), 20e-6)
+        check_route(route, others.grown(20e-6))
+
+
+def test_draw_cables_do_not_overlap():
+    pm = Modeler("gds")
+    chip = Body(pm, "bus_chip")
+    pairs = []
+    for ii in range(3):
+        with chip(["0mm", "%fmm" % (0.2 * ii)], [1, 0]):
+            (port_in,) = elt.create_port(chip, ["20um", "40um"], name="bus_in_%d" % ii)
+        with chip(["2mm", "%fmm" % (1 + 0.2 * ii)], [-1, 0]):
+            (port_out,) = elt.create_port(chip, ["20um", "40um"], name="bus_out_%d" % ii)
+        pairs.append((port_in, port_out))
+    lengths = chip.draw_cables(pairs, fillet="50um", clearance="10um", name="bus")
+    assert len(lengths) == 3
+    cables = [pm.interface.gds_object_instances["bus_%d_gap" % ii] for ii in range(3)]
+    for ii in range(3):
+        for jj in range(ii + 1, 3):
+            assert gdspy.boolean(cables[ii], cables[jj], "and") is None
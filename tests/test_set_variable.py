@@ -0,0 +1,30 @@
+import linecache
+
+from HFSSdrawpy import Modeler
+from HFSSdrawpy.utils import assigned_name, val
+
+pm = Modeler("gds")
+
+
+def test_name_inference():
+    track = pm.set_variable("20um")
+    long_gap = pm.set_variable(
+        "10um"
+    )
+    assert str(track) == "track"
+    assert str(long_gap) == "long_gap"
+    assert abs(val(track + long_gap) - 30e-6) < 1e-12
+
+
+def test_name_inference_exec():
+    source = "bond = pm.set_variable('100um')\n"
+    filename = "<drawpy-exec-test>"
+    # notebooks register their cells in linecache the same way
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = {"pm": pm}
+    exec(compile(source, filename, "exec"), namespace)
+    assert str(namespace["bond"]) == "bond"
+
+
+def test_assigned_name_unknown_source():
+    assert assigned_name("<no-such-source>", 1) is None
@@ -0,0 +1,78 @@
+import os
+
+import gdspy
+import numpy as np
+import pytest
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.parameters import GAP, TRACK
+
+
+def draw(length_value):
+    pm = Modeler("gds")
+    chip = Body(pm, "chip")
+    track = pm.set_variable("20um", name="track")
+    gap = pm.set_variable("10um", name="gap")
+    length = pm.set_variable(length_value, name="length")
+
+    with chip([0, 0], [1, 0]):
+        (port_in,) = elt.create_port(chip, [track, track + 2 * gap], name="in")
+    with chip([length, 0.2e-3], [-1, 0]):
+        (port_out,) = elt.create_port(chip, [track, track + 2 * gap], name="out")
+    chip.draw_cable(port_in, port_out, fillet="50um", name="cable")
+
+    ground_plane = chip.rect([0, -0.5e-3], [length, 1e-3], layer=TRACK, name="ground_plane")
+    ground_plane.subtract(chip.entities[GAP])
+    return pm
+
+
+def area(file):
+    library = gdspy.GdsLibrary(infile=file + "_chip.gds")
+    return library.cells["chip"].area()
+
+
+def test_sweep_matches_redraw(tmp_path):
+    pm = draw("3mm")
+    files = pm.sweep_gds(str(tmp_path), "sweep", {"length": ["3mm", "3.5mm"]})
+    assert files == [os.path.join(str(tmp_path), "sweep_%d" % ii) for ii in range(2)]
+
+    for file, length_value in zip(files, ["3mm", "3.5mm"]):
+        reference = draw(length_value)
+        reference.generate_gds(str(tmp_path), "reference")
+        assert np.isclose(area(file), area(os.path.join(str(tmp_path), "reference")), rtol=1e-6)
+    assert not np.isclose(area(files[0]), area(files[1]))
+
+
+def test_generate_gds_subs(tmp_path):
+    pm = draw("3mm")
+    pm.generate_gds(str(tmp_path), "subs", subs={"gap": "12um"})
+    pm.generate_gds(str(tmp_path), "nominal")
+    # wider gaps leave less metal
+    assert area(os.path.join(str(tmp_path), "subs")) < area(os.path.join(str(tmp_path), "nominal"))
+
+
+def test_sweep_lengths_mismatch(tmp_path):
+    pm = draw("3mm")
+    with pytest.raises(ValueError):
+        pm.sweep_gds(str(tmp_path), "sweep", {"length": ["3mm"], "gap": ["1um", "2um"]})
+
+
+
+def draw_slot(width_value):
+    pm = Modeler("gds")
+    chip = Body(pm, "chip")
+    width = pm.set_variable(width_value, name="width")
+    # open polylines are kept as paths in gds mode
+    slot = chip.polyline([[0, 0], [width, 0]], closed=False, layer=GAP, name="slot")
+    side = chip.polyline([[width, 0], [width, "1mm"]], closed=False, layer=GAP, name="side")
+    slot.unite([side])
+    return pm, slot
+
+
+def test_sweep_open_polylines(tmp_path):
+    pm, slot = draw_slot("1mm")
+    (file,) = pm.sweep_gds(str(tmp_path), "slot", {"width": ["1.5mm"]})
+    reference, _ = draw_slot("1.5mm")
+    reference.generate_gds(str(tmp_path), "reference")
+    assert np.isclose(area(file), area(os.path.join(str(tmp_path), "reference")), rtol=1e-9)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import sympy
+
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.interfaces.gds_recipes import Environment
+from HFSSdrawpy.parameters import GAP, TRACK
+from HFSSdrawpy.utils import variables
+
+
+def draw(name, tiling=None):
+    # a ground plane with holes and a long slot crossing the tiles
+    pm = Modeler("gds")
+    if tiling is not None:
+        pm.set_tiling(*tiling)
+    chip = Body(pm, name)
+    hole = pm.set_variable("20um", name="tiled_hole")
+    plane = chip.rect([0, 0], ["1mm", "1mm"], layer=TRACK, name=name + "_plane")
+    holes = chip.rect_array(["50um", "50um"], [hole, hole], 10, 10, ["100um", "100um"], layer=GAP)
+    slot = chip.rect(["25um", "0.5mm"], ["0.95mm", "10um"], layer=GAP, name=name + "_slot")
+    plane.subtract([holes, slot])
+    return pm, plane
+
+
+def polygons(pm, plane, env=None):
+    if env is None:
+        obj = pm.interface.gds_object_instances[plane.name]
+    else:
+        obj = pm.interface.recipes[plane.name].build(env, 0)
+    return obj.area(), len(obj.polygons)
+
+
+def test_tiled_subtract_matches_subtract():
+    pm, plane = draw("untiled_chip")
+    area, n_polygons = polygons(pm, plane)
+    assert np.isclose(area, 1e-6 - 100 * 4e-10 - 0.95e-3 * 1e-5)
+
+    # the seams run along the holes and cut the slot
+    pm, plane = draw("tiled_chip", ("0.25mm", 1, False))
+    tiled_area, tiled_n_polygons = polygons(pm, plane)
+    assert np.isclose(tiled_area, area)
+    assert tiled_n_polygons > n_polygons
+
+    pm, plane = draw("merged_chip", ("0.25mm", 1, True))
+    merged_area, merged_n_polygons = polygons(pm, plane)
+    assert np.isclose(merged_area, area)
+    assert merged_n_polygons == n_polygons
+
+    # the recipe is evaluated with the same tiling
+    env = Environment({sympy.Symbol("tiled_hole"): np.array([30e-6])}, variables, 1)
+    swept_area, swept_n_polygons = polygons(pm, plane, env)
+    assert np.isclose(swept_area, 1e-6 - 100 * 9e-10 - 0.95e-3 * 1e-5)
+    assert swept_n_polygons == n_polygons
+
+
+@pytest.mark.parametrize("merge", [False, True])
+def test_tiles_in_processes(merge):
+    key = lambda polygon: tuple(np.round(polygon, 12).ravel())  # noqa: E731
+    results = []
+    for processes in [1, 2]:
+        pm, plane = draw("process_chip", ("0.25mm", processes, merge))
+        obj = pm.interface.gds_object_instances[plane.name]
+        results.append(sorted(obj.polygons, key=key))
+    assert len(results[0]) == len(results[1])
+    assert all(np.allclose(a, b) for a, b in zip(*results))
+
+
+def test_layer_boolean_uses_tiling():
+    pm = Modeler("gds")
+    pm.set_tiling("0.3mm", merge=False)
+    chip = Body(pm, "tiled_layer_chip_2")
+    chip.rect([0, 0], ["1mm", "1mm"], layer=TRACK, name="tiled_layer_plane")
+    (result,) = pm.layer_boolean(GAP, "TRACK")
+    assert len(pm.interface.gds_object_instances[result.name].polygons) == 16
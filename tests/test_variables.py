@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+import sympy
+
+import HFSSdrawpy.libraries.example_elements as elt
+from HFSSdrawpy import Body, Modeler
+from HFSSdrawpy.utils import val
+
+
+def test_dependent_variables():
+    pm = Modeler("gds")
+    width = pm.set_variable("10um", name="dependent_width")
+    gap = pm.set_variable("5um", name="dependent_gap")
+    pitch = pm.set_variable(width + 2 * gap, name="dependent_pitch")
+    assert np.isclose(val(3 * pitch), 60e-6)
+
+    revisions = [pm.variables.revision_of([symbol]) for symbol in [width, gap, pitch]]
+    pm.set_variable("10um", name="dependent_gap")
+    assert np.isclose(val(pitch), 30e-6)
+    # the pitch depends on the gap, not the width
+    assert pm.variables.revision_of([width]) == revisions[0]
+    assert pm.variables.revision_of([gap]) != revisions[1]
+    assert pm.variables.revision_of([pitch]) != revisions[2]
+
+    with pytest.raises(ValueError):
+        val(pitch + sympy.Symbol("undefined_variable"))
+
+
+def test_port_depends_on_its_variables_only():
+    pm = Modeler("gds")
+    chip = Body(pm, "dependency_chip")
+    track = pm.set_variable("20um", name="dependency_track")
+    length = pm.set_variable("1mm", name="dependency_length")
+    with chip([0, 0], [1, 0]):
+        (port,) = elt.create_port(chip, [track], name="dependency_port")
+    evaluated = port.val()
+    pm.set_variable("2mm", name="dependency_length")
+    assert port.val() is evaluated
+    pm.set_variable("30um", name="dependency_track")
+    assert np.allclose(port.val().widths, [30e-6])
+    assert np.isclose(val(length), 2e-3)